@@ -188,10 +188,37 @@ check_applies_to()
     fi
 }
 
+# looks up lines of log file $2 by preup.fact_store, which asks the fact
+# server of preupg if it runs and reads an index or the log file otherwise
+# $1 is one of line|first|prefix, $3 is searched line or prefix
+# prints found lines, returns 1 if no line was found and 2 on error
+_fact_query()
+{
+    python -m preup.fact_store query "$1" "$2" "$3"
+}
+
 is_pkg_installed()
 {
-    grep -q "^$1[[:space:]]" $VALUE_RPM_QA || return 1
-    return 0
+    _fact_query first "$VALUE_RPM_QA" "$(printf '%s\t' "$1")" >/dev/null
+}
+
+# returns true if file in $1 is owned by any installed package
+is_file_rpm_tracked()
+{
+    _fact_query line "$VALUE_RPMTRACKEDFILES" "$1" >/dev/null
+}
+
+# returns true if file in $1 is listed in $VALUE_EXECUTABLES
+is_executable_tracked()
+{
+    _fact_query line "$VALUE_EXECUTABLES" "$1" >/dev/null
+}
+
+# prints files from $VALUE_ALLMYFILES stored under directory $1
+files_under()
+{
+    _fact_query prefix "$VALUE_ALLMYFILES" "${1%/}/"
+    [ $? -ne 2 ]
 }
 
 check_rpm_to()
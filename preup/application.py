@@ -8,7 +8,10 @@ import shutil
 import datetime
 import os
 import sys
+import threading
+import tempfile
 import six
+from six.moves import queue
 from distutils import dir_util
 
 try:
@@ -16,14 +19,17 @@ try:
 except ImportError:
     from xmlrpc.client import Fault
 
-from preup import xccdf, xml_manager, remediate, utils, settings
+from preup import xccdf, xml_manager, remediate, utils, settings, text_report, report_pages
 from preup.common import Common
-from preup.scanning import ScanProgress, format_rules_to_table
+from preup.scanning import ScanProgress, format_rules_to_table, format_timings_to_table
 from preup.utils import check_xml, get_file_content, check_or_create_temp_dir
 from preup.utils import run_subprocess, get_assessment_version, get_message
 from preup.utils import tarball_result_dir
 from preup.logger import log_message, logging, set_level
 from preup.report_parser import ReportParser
+from preup.rule_cache import RuleCache
+from preup.profiling import CheckProfiler
+from preup.fact_server import start_fact_server
 from preup.kickstart import KickstartGenerator
 from preuputils.compose import XCCDFCompose
 from preup.version import VERSION
@@ -51,6 +57,12 @@ def list_contents(source_dir):
     return content_dict
 
 
+def get_shard_name(file_name, index):
+    """Function returns a file name used by shard with index"""
+    base_name, extension = os.path.splitext(file_name)
+    return "%s.shard%d%s" % (base_name, index, extension)
+
+
 def show_message(message):
     """
     Prints message out on stdout message (kind of yes/no) and return answer.
@@ -85,10 +97,17 @@ class Application(object):
         self.report_parser = None
         self.third_party = ""
         self.report_data = {}
-        self.text_convertor = ""
+        self.profiler = None
+        # rule cache, cached results and selected rules of the last scan
+        self.rule_cache_replay = None
+        self.timings_data = {}
         self.common = None
         self._devel_mode = 0
         self._dist_mode = None
+        self.rule_cache = utils.get_preupg_config_file(settings.PREUPG_CONFIG_FILE,
+                                                       'rule_cache') == 'enabled'
+        self.report_layout = utils.get_preupg_config_file(settings.PREUPG_CONFIG_FILE,
+                                                          'report_layout')
         if self.conf.debug is None:
             set_level(logging.INFO)
         else:
@@ -114,6 +133,11 @@ class Application(object):
         return os.path.join(self.conf.result_dir,
                             self.get_third_party_name() + self.conf.html_result_name)
 
+    def get_default_timings_path(self):
+        """Returns full path to file with timings of checks"""
+        return os.path.join(self.conf.result_dir,
+                            self.get_third_party_name() + settings.timings_name)
+
     def get_default_tarball_path(self):
         """Returns full tarball path"""
         return os.path.join(self.conf.result_dir, self.conf.tarball_name)
@@ -157,8 +181,13 @@ class Application(object):
         command.append(check_xml(xml_file))
         return command
 
-    def build_command(self):
-        """create command from configuration"""
+    def build_command(self, content=None, result_file=None):
+        """
+        create command from configuration
+
+        content and result_file override self.content and
+        the default XML result path (used by sharded scans)
+        """
         self.result_file = self.get_default_xml_result_path()
         command = self.get_binary()
         report = self.get_default_html_result_path()
@@ -168,8 +197,8 @@ class Application(object):
 
         # take name of content and create report: <content_name>.html
         #command.extend(('--report', report))
-        command.extend(("--results", self.result_file))
-        command.append(check_xml(self.content))
+        command.extend(("--results", result_file or self.result_file))
+        command.append(check_xml(content or self.content))
         return command
 
     def upload_results(self, tarball_path=None):
@@ -274,20 +303,52 @@ class Application(object):
         self.report_parser.modify_result_path(self.conf.result_dir,
                                               self.get_proper_scenario(self.get_scenario()),
                                               self.conf.mode)
+        names = self.report_parser.get_name_of_checks()
+        selected = [x.get('idref') for x in self.report_parser.get_allowed_selected_rules()]
+        rule_cache = None
+        cached = {}
+        if self.rule_cache and not self.conf.no_cache:
+            rule_cache = RuleCache(os.path.join(self.conf.cache_dir, settings.rule_cache_name),
+                                   os.path.join(self.conf.cache_dir, settings.common_name),
+                                   self.report_parser,
+                                   prefix=self.get_third_party_name())
+            cached = rule_cache.get_cached_results(selected)
+            if cached:
+                # Only rules which are not cached are executed by oscap
+                self.report_parser.select_rules([x for x in selected if x not in cached])
         # Execute assessment
+        # Sampling of peak RSS is not for free, it is done only on request
+        self.profiler = CheckProfiler(names, sample_rss=bool(self.conf.profile_checks))
         self.scanning_progress = ScanProgress(self.get_total_check(), self.conf.debug)
-        self.scanning_progress.set_names(self.report_parser.get_name_of_checks())
+        self.scanning_progress.set_names(names)
         log_message('%s:' % settings.assessment_text,
                     new_line=True,
                     log=False)
-        log_message('%.3d/%.3d ...running (%s)' % (
-                    1,
-                    self.get_total_check(),
-                    self.scanning_progress.get_full_name(0)),
-                    new_line=False,
-                    log=False)
+        if cached:
+            log_message('%d checks are unchanged, their results are taken from cache' % len(cached),
+                        log=False)
+        if self.get_total_check():
+            log_message('%.3d/%.3d ...running (%s)' % (
+                        1,
+                        self.get_total_check(),
+                        self.scanning_progress.get_full_name(0)),
+                        new_line=False,
+                        log=False)
         start_time = datetime.datetime.now()
-        self.run_scan(function=self.scanning_progress.show_progress)
+        # Checks query common logs from the fact server while oscap runs
+        fact_server = start_fact_server(os.path.join(self.conf.result_dir,
+                                                     self.get_proper_scenario(self.get_scenario())),
+                                        os.path.join(self.conf.cache_dir, settings.common_name))
+        try:
+            self.run_scan(function=self.scanning_progress.show_progress)
+        finally:
+            if fact_server is not None:
+                fact_server.stop()
+        # Cached results and timings are put into XML result
+        # by prepare_xml_for_html, XML result is written only there
+        if rule_cache is not None:
+            self.rule_cache_replay = (rule_cache, cached, selected)
+        self.store_timings()
         end_time = datetime.datetime.now()
         diff = end_time - start_time
         log_message(
@@ -296,15 +357,122 @@ class Application(object):
             log=False
         )
 
+    def replay_rule_cache(self, rule_cache, cached, selected):
+        """
+        Function stores results of executed rules into the rule cache
+        and puts results of cached rules into the XML result
+        loaded in self.report_parser
+        """
+        rule_cache.store_results(self.report_parser.target_tree)
+        if cached:
+            rule_results = rule_cache.replay(cached)
+            self.report_parser.update_rule_results(rule_results, selected)
+            for rule_result in rule_results:
+                self.scanning_progress.add_data(rule_result.get('idref'),
+                                                self.report_parser.get_nodes_text(rule_result, 'result'),
+                                                state='reused')
+        self.scanning_progress.mark_data('executed')
+
+    def store_timings(self):
+        """
+        Function stores timings of executed checks into JSON file
+        next to XML result file, prepare_xml_for_html adds them to XML
+        """
+        if not os.path.exists(self.get_default_xml_result_path()):
+            return
+        self.profiler.write_timings(self.get_default_timings_path())
+
+    def run_oscap(self, cmd, function=None):
+        """
+        Function runs oscap command and measures checks
+        reported by oscap progress output
+        """
+        if self.profiler is None:
+            return run_subprocess(cmd, print_output=False, function=function)
+        profile = self.profiler.get_process_profile(function)
+        return run_subprocess(cmd,
+                              print_output=False,
+                              function=profile.progress,
+                              process_function=profile.start)
+
+    def get_jobs(self):
+        """Function returns a number of parallel oscap processes"""
+        try:
+            return max(int(self.conf.jobs), 1)
+        except (TypeError, ValueError):
+            return 1
+
     def run_scan(self, function=None):
         """
         The function is used for either scanning system or
         for applying changes on the target system
         """
+        if self.get_jobs() > 1:
+            return self.run_sharded_scan(self.get_jobs(), function=function)
         cmd = self.build_command()
         #log(self.conf.verbose, "running command:\n%s", ' '.join(cmd))
         # fail if openscap wasn't successful; if debug, continue
-        return run_subprocess(cmd, print_output=False, function=function)
+        return self.run_oscap(cmd, function=function)
+
+    def run_sharded_scan(self, jobs, function=None):
+        """
+        The function splits selected rules into shards which are
+        assessed by concurrent oscap processes.
+
+        Every shard has its own content and result file in a temporary
+        directory. Results are
+        merged back to the default XML result file afterwards.
+        """
+        report_parser = self.report_parser
+        if report_parser is None:
+            report_parser = ReportParser(self.content)
+        selected = [x.get('idref') for x in report_parser.get_allowed_selected_rules()]
+        jobs = min(jobs, len(selected))
+        if jobs < 2:
+            return self.run_oscap(self.build_command(), function=function)
+
+        lock = threading.Lock()
+
+        def shard_progress(stdout_data):
+            # oscap progress lines of all shards go to one ScanProgress
+            lock.acquire()
+            try:
+                function(stdout_data)
+            finally:
+                lock.release()
+
+        self.result_file = self.get_default_xml_result_path()
+        shard_dir = tempfile.mkdtemp(prefix='preupg-shards-')
+        shard_results = []
+        return_codes = [0] * jobs
+        threads = []
+
+        def run_shard(index, cmd):
+            return_codes[index] = self.run_oscap(cmd,
+                                                 function=shard_progress if function else None)
+
+        try:
+            for index in range(jobs):
+                shard_content = os.path.join(shard_dir, get_shard_name(os.path.basename(self.content), index))
+                shard_result = os.path.join(shard_dir, get_shard_name(os.path.basename(self.result_file), index))
+                report_parser.write_shard_content(selected[index::jobs], shard_content)
+                shard_results.append(shard_result)
+                cmd = self.build_command(content=shard_content, result_file=shard_result)
+                thread = threading.Thread(target=run_shard, args=(index, cmd))
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+            shard_results = [x for x in shard_results if os.path.exists(x)]
+            if shard_results:
+                merged = ReportParser(shard_results[0])
+                merged.merge_test_results(shard_results[1:], selected, self.result_file)
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        # oscap returns 0 (pass), 2 (some rule failed) or 1 (error)
+        if 1 in return_codes:
+            return 1
+        return max(return_codes)
 
     def run_generate(self, xml_file, html_file):
         """
@@ -314,6 +482,33 @@ class Application(object):
         cmd = self.build_generate_command(xml_file, html_file)
         return run_subprocess(cmd, print_output=True)
 
+    def get_required_logs(self):
+        """
+        Function returns common log files needed by rules selected
+        by --mode or --select-rules options or None if all common
+        log files have to be gathered.
+        """
+        if not (self.conf.mode or self.conf.select_rules):
+            return None
+        if not self.content or not os.path.exists(self.content):
+            return None
+        try:
+            report_parser = ReportParser(self.content)
+        except IOError:
+            return None
+        rules = [x.get('idref') for x in report_parser.get_allowed_selected_rules()]
+        if self.conf.mode:
+            try:
+                rules = [i.rstrip() for i in get_file_content(os.path.join(os.path.dirname(self.content),
+                                                                           self.conf.mode),
+                                                              'rb',
+                                                              method=True)]
+            except IOError:
+                return None
+        if self.conf.select_rules:
+            rules = [i.strip() for i in self.conf.select_rules.split(',')]
+        return report_parser.get_required_logs(rules)
+
     def get_scenario(self):
         """The function returns scenario"""
         scenario = None
@@ -343,6 +538,10 @@ class Application(object):
                               settings.tarball_result_dir]
         for dir_name in clean_directories:
             utils.clean_directory(dir_name, '*.log')
+        utils.clean_directory(os.path.join(settings.cache_dir, settings.common_name), settings.log_cache_name)
+        utils.clean_directory(os.path.join(settings.cache_dir, settings.common_name), settings.dist_native_name)
+        utils.clean_directory(os.path.join(settings.cache_dir, settings.common_name), '*' + settings.index_suffix)
+        utils.clean_directory(os.path.join(settings.cache_dir, settings.rule_cache_name), '*.json')
         for dir_name in delete_directories:
             if os.path.isdir(dir_name):
                 shutil.rmtree(dir_name)
@@ -357,47 +556,162 @@ class Application(object):
         if os.path.isdir(self.conf.result_dir):
             shutil.rmtree(self.conf.result_dir)
 
-    def prepare_for_generation(self):
-        """Function prepares the XML file for conversion to HTML format"""
-        for report in self._get_reports():
-            ReportParser.write_xccdf_version(report, direction=True)
-            self.run_generate(report, report.replace('.xml', '.html'))
-            # Switching back namespace
-            ReportParser.write_xccdf_version(report)
+    def generate_html(self, report):
+        """
+        Function generates HTML file of the XML report
+
+        oscap gets a temporary copy of the report with XCCDF 1.1
+        namespace, the report itself is not rewritten.
+        """
+        html_file = report.replace('.xml', '.html')
+        temp_dir = tempfile.mkdtemp(dir=os.path.dirname(report))
+        try:
+            xccdf_copy = os.path.join(temp_dir, os.path.basename(report))
+            ReportParser.write_xccdf_version(report, direction=True, target=xccdf_copy)
+            return self.run_generate(xccdf_copy, html_file)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def prepare_for_generation(self, reports):
+        """
+        Function converts the XML files to HTML format
+
+        Reports are generated by concurrent oscap processes. Worker
+        threads only wait for them, so no process pool is needed.
+        Reports of each 3rd party content are generated right after
+        its scan, because the rest of prepare_xml_for_html needs them.
+        """
+        pending = queue.Queue()
+        for report in reports:
+            pending.put(report)
+        errors = []
+
+        def generate():
+            while True:
+                try:
+                    report = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self.generate_html(report)
+                except (IOError, OSError) as err:
+                    errors.append(err)
+
+        threads = []
+        for dummy in range(min(settings.generate_workers, len(reports))):
+            thread = threading.Thread(target=generate)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
 
     def prepare_xml_for_html(self):
-        """The function prepares a XML file for HTML creation"""
+        """
+        The function prepares a XML file for HTML creation
+
+        XML file is parsed once, all updates are done in memory
+        and each report is written once.
+        """
         # Reload XML file
         self.report_parser.reload_xml(self.get_default_xml_result_path())
+        # Results of cached rules are processed like results of executed rules
+        if self.rule_cache_replay is not None:
+            self.replay_rule_cache(*self.rule_cache_replay)
+            self.rule_cache_replay = None
+        if self.profiler is not None:
+            self.report_parser.add_rule_timings(self.profiler.get_timings(), write=False)
         # Replace fail in case of none or slight risk with needs_inspection
-        self.report_parser.replace_inplace_risk(scanning_results=self.scanning_progress)
+        self.report_parser.replace_inplace_risk(scanning_results=self.scanning_progress, write=False)
         if not self.conf.debug:
-            self.report_parser.remove_debug_info()
-        self.report_parser.reload_xml(self.get_default_xml_result_path())
-        self.report_parser.update_check_description()
-        self.prepare_for_generation()
+            self.report_parser.remove_debug_info(write=False)
+        self.report_parser.update_check_description(write=False)
+        self.report_parser.write_xml(reload=False)
+        reports = self._get_reports()
+        self.prepare_for_generation(reports)
 
-        if not self.conf.verbose:
-            self.xml_mgr.remove_html_information()
         # This function finalize XML operations
-        self.finalize_xml_files()
+        self.finalize_xml_files(reports)
+        if self.report_layout == 'split':
+            self.write_report_pages()
+        # Risks are stored after the last update of XML file,
+        # they are used by summary and by risk check instead of XML
+        self.report_parser.write_risks()
         if self.conf.text:
-            run_subprocess(self.get_cmd_convertor(),
-                           print_output=False,
-                           shell=True)
+            self.write_text_reports(reports)
+
+    def write_report_pages(self, group_ids=None):
+        """
+        Function writes split HTML report, an index page with summary
+        of top-level groups and a page of each group
+
+        Pages are generated from partial XML reports of groups, which are
+        removed then, and updated by XmlManager like other HTML reports.
+
+        :param group_ids: only pages of these groups are written,
+                          all of them by default
+        """
+        prefix = os.path.join(self.conf.result_dir,
+                              self.get_third_party_name() + settings.report_group_prefix)
+        groups = self.report_parser.get_group_results()
+        pages = []
+        for group_id, dummy_title, dummy_counts in groups:
+            if group_ids is None or group_id in group_ids:
+                pages.append((group_id, report_pages.get_page_name(prefix, group_id) + '.xml'))
+        try:
+            self.report_parser.write_group_reports(pages)
+            self.prepare_for_generation([path for dummy_group_id, path in pages])
+        finally:
+            for dummy_group_id, path in pages:
+                if os.path.exists(path):
+                    os.unlink(path)
+        solution_files = self.xml_mgr.find_text_files()
+        for dummy_group_id, path in pages:
+            result_name = os.path.splitext(path)[0]
+            self.xml_mgr.update_html(result_name, solution_files)
+            xml_manager.clean_html(result_name + '.html', remove_details=not self.conf.verbose)
+        index_path = os.path.join(self.conf.result_dir,
+                                  self.get_third_party_name() + settings.report_index_name)
+        title = self.report_parser.get_nodes_text(self.report_parser.target_tree, 'title')
+        report_pages.write_index(index_path, title, groups, prefix)
+
+    def write_text_reports(self, reports):
+        """
+        Function writes text form of reports next to them
+
+        The first report contains all rules, the others are partial
+        reports named result-<type>.xml. Text is rendered from
+        the document in memory, see preup.text_report.
+        """
+        prefix = settings.result_name + '-'
+        text_reports = []
+        for report in reports:
+            name = os.path.splitext(os.path.basename(report))[0]
+            report_type = None
+            if report != reports[0] and name.startswith(prefix):
+                report_type = name[len(prefix):]
+            text_reports.append((os.path.splitext(report)[0] + '.txt', report_type))
+        solution_texts = self.xml_mgr.get_solution_texts(self.xml_mgr.find_text_files())
+        text_report.write_text_reports(self.report_parser, text_reports, solution_texts)
+
+    def get_report_types(self):
+        """
+        Function returns types of partial reports, which can be
+        configured by report_types option in PREUPG_CONFIG_FILE
+        """
+        report_types = utils.get_preupg_config_file(settings.PREUPG_CONFIG_FILE, 'report_types')
+        if report_types:
+            report_types = [x.strip() for x in report_types.split(',') if x.strip()]
+        return report_types or settings.REPORTS
 
     def _get_reports(self):
         reports = [self.get_default_xml_result_path()]
-        report_admin = self.report_parser.get_report_type(settings.REPORTS[0])
-        if report_admin:
-            reports.append(report_admin)
-        # We separate user contents
-        report_user = self.report_parser.get_report_type(settings.REPORTS[1])
-        if report_user:
-            reports.append(report_user)
+        # Admin, user and other partial reports are written at once
+        reports.extend(self.report_parser.get_report_types(self.get_report_types()))
         return reports
 
-    def finalize_xml_files(self):
+    def finalize_xml_files(self, reports):
         """
         Function copies postupgrade scripts and creates hash postupgrade file.
         It finds solution files and update XML file.
@@ -407,8 +721,12 @@ class Application(object):
         remediate.hash_postupgrade_file(self.conf.verbose,
                                         self.get_postupgrade_dir())
         solution_files = self.report_parser.get_solution_files()
-        for report in self._get_reports():
-            self.xml_mgr.find_solution_files(report.split('.')[0], solution_files)
+        for report in reports:
+            # Details are removed only from the main HTML report
+            remove_details = not self.conf.verbose and \
+                os.path.basename(report) == self.conf.xml_result_name
+            self.xml_mgr.find_solution_files(report.split('.')[0], solution_files,
+                                             remove_details=remove_details)
         remediate.copy_modified_config_files(self.conf.result_dir)
 
     def run_third_party_modules(self, dir_name):
@@ -425,20 +743,12 @@ class Application(object):
             self.content = content
             self.run_scan_process()
             self.report_data[third_party_name] = self.scanning_progress.get_output_data()
+            self.timings_data[third_party_name] = self.profiler.get_timings()
             # This function prepare XML and generate HTML
             self.prepare_xml_for_html()
 
         self.third_party = ""
 
-    def get_cmd_convertor(self):
-        """Function returns cmd with text convertor string"""
-        cmd = settings.text_converters[self.text_convertor].format(
-            self.text_convertor,
-            self.get_default_html_result_path(),
-            self.get_default_txt_result_path()
-        )
-        return cmd
-
     def get_proper_scenario(self, scenario):
         if not self.conf.contents:
             return scenario
@@ -529,6 +839,7 @@ class Application(object):
             self.report_parser.select_rules(lines)
         self.run_scan_process()
         main_report = self.scanning_progress.get_output_data()
+        main_timings = self.profiler.get_timings()
         # This function prepare XML and generate HTML
         self.prepare_xml_for_html()
 
@@ -542,6 +853,10 @@ class Application(object):
         format_rules_to_table(main_report, "main contents")
         for target, report in six.iteritems(self.report_data):
             format_rules_to_table(report, "3rdparty content " + target)
+        if self.conf.profile_checks:
+            format_timings_to_table(main_timings, self.conf.profile_checks, "main contents")
+            for target, timings in six.iteritems(self.timings_data):
+                format_timings_to_table(timings, self.conf.profile_checks, "3rdparty content " + target)
 
         tar_ball_name = tarball_result_dir(self.conf.tarball_name, self.conf.result_dir, self.conf.verbose)
         log_message("Tarball with results is stored here %s ." % tar_ball_name)
@@ -569,7 +884,7 @@ class Application(object):
             if report_dict[int(return_value)]:
                 log_message('Summary information:')
                 log_message(report_dict[int(return_value)])
-            for report_type in settings.REPORTS:
+            for report_type in self.get_report_types():
                 file_name = settings.result_name + '-' + report_type + '.html'
                 report_name = os.path.join(os.path.dirname(self.report_parser.get_path()), file_name)
                 if os.path.exists(report_name):
@@ -642,18 +957,6 @@ If you would like to use this tool, you have to specify correct upgrade path par
                 # We do not want to continue
                 return 0
 
-        if self.conf.text:
-            # Test whether w3m, lynx and elinks packages are installed
-            found = False
-            for pkg in utils.get_convertors():
-                if xml_manager.get_package_version(pkg):
-                    self.text_convertor = pkg
-                    found = True
-                    break
-            if not found:
-                log_message(settings.converter_message.format(' '.join(utils.get_convertors())))
-                return 0
-
         if os.geteuid() != 0:
             print("Need to be root", end="\n")
             if not self.conf.debug:
@@ -700,7 +1003,7 @@ If you would like to use this tool, you have to specify correct upgrade path par
 
         self.common = Common(self.conf)
         if not self.conf.skip_common:
-            if not self.common.common_results():
+            if not self.common.common_results(self.get_required_logs()):
                 return 1
 
         if self.conf.scan or self.conf.contents:
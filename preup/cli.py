@@ -117,7 +117,7 @@ will used -- http://127.0.0.1:8099/submit/)"
             "--text",
             action="store_true",
             default=False,
-            help="Convert HTML results to text form by elinks, lynx or w3m"
+            help="Write results in text form as well"
         )
         self.parser.add_option(
             "-v",
@@ -156,6 +156,24 @@ will used -- http://127.0.0.1:8099/submit/)"
             default=False,
             help="List available contents"
         )
+        self.parser.add_option(
+            "-j",
+            "--jobs",
+            type=int,
+            metavar="N",
+            help="Split selected rules into N parts assessed by parallel oscap processes"
+        )
+        self.parser.add_option(
+            "--no-cache",
+            action="store_true",
+            help="Execute all checks and gather all common logs even if they are cached from previous assessment"
+        )
+        self.parser.add_option(
+            "--profile-checks",
+            type=int,
+            metavar="N",
+            help="Print N checks with the longest execution time"
+        )
         self.parser.add_option(
             "--version",
             action="store_true",
@@ -9,10 +9,14 @@ import os
 import platform
 import datetime
 import shutil
+import threading
 from distutils import dir_util
+from six.moves import queue
 from preup import utils
-from preup.logger import log_message
+from preup.logger import log_message, logging
 from preup import settings
+from preup.log_cache import LogCache, write_gathered_logs, get_gathered_logs
+from preup import rpm_verify, fact_store
 
 
 def get_add_on_name(filename, add_on):
@@ -20,6 +24,75 @@ def get_add_on_name(filename, add_on):
     return filename + "-" + add_on
 
 
+def parse_script_line(line):
+    """
+    Function parses a line from scripts.txt file
+
+    Format of the line is:
+    command=log_file=variable=name=YES|NO[=kickstart_name][=depends:log_file,...]
+
+    depends field lists log files which have to be gathered
+    before the command is executed.
+    Returns dictionary or None in case of comment or empty line.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    cmd, log_file, variable, name, values = line.split("=", 4)
+    values = values.split("=")
+    step = {'cmd': cmd,
+            'log_file': log_file,
+            'variable': variable,
+            'name': name,
+            'kickstart': values[0] == "YES",
+            'kickstart_name': None,
+            'depends': [],
+            }
+    for value in values[1:]:
+        if value.startswith(settings.common_depends):
+            depends = value[len(settings.common_depends):].split(',')
+            step['depends'] = [x.strip() for x in depends if x.strip()]
+        else:
+            step['kickstart_name'] = value
+    return step
+
+
+def get_dependencies(steps):
+    """
+    Function returns dictionary with log file and log files
+    it depends on.
+
+    Besides explicit depends field, a command which mentions
+    log file gathered by one of previous lines depends on it.
+    """
+    log_files = [x['log_file'] for x in steps]
+    dependencies = {}
+    for index, step in enumerate(steps):
+        depends = [x for x in step['depends'] if x in log_files]
+        for log_file in log_files[:index]:
+            if log_file in step['cmd'] and log_file not in depends:
+                depends.append(log_file)
+        dependencies[step['log_file']] = depends
+    return dependencies
+
+
+def get_required_steps(steps, required):
+    """
+    Function returns steps which gather required log files
+    together with steps gathering log files they depend on.
+    """
+    dependencies = get_dependencies(steps)
+    needed = set()
+    pending = [x for x in required if x in dependencies]
+    while pending:
+        log_file = pending.pop()
+        if log_file in needed:
+            continue
+        needed.add(log_file)
+        pending.extend(dependencies[log_file])
+    return [x for x in steps if x['log_file'] in needed]
+
+
 class Common(object):
 
     """Class handles with common log files"""
@@ -29,6 +102,8 @@ class Common(object):
         self.cwd = ""
         self.lines = utils.get_file_content(self.conf.common_script, "rb", method=True)
         self.common_result_dir = ""
+        self.native_verify = utils.get_preupg_config_file(settings.PREUPG_CONFIG_FILE,
+                                                          'native_rpm_verify') == 'enabled'
 
     def common_logfiles(self, filename):
         """build path for provided filename"""
@@ -50,57 +125,151 @@ class Common(object):
         """Function switch back to self.cwd"""
         os.chdir(self.cwd)
 
-    def common_results(self):
-        """run common scripts"""
+    def get_steps(self):
+        """Function returns parsed lines of scripts.txt file"""
+        steps = []
+        for line in self.lines:
+            step = parse_script_line(line)
+            if step is not None:
+                steps.append(step)
+        return steps
+
+    def run_step(self, step, finished, log_cache):
+        """Function gathers one log file and reports it to finished queue"""
+        start_time = datetime.datetime.now()
+        error = None
+        try:
+            if step['log_file'] not in log_cache.fingerprints:
+                # Not checked by is_reusable with --no-cache,
+                # stored so that next assessment can reuse the log file
+                log_cache.set_fingerprint(step)
+            if self.native_verify and step['cmd'] == settings.rpm_verify_command:
+                # the verifier forks a pool of processes, which is not safe
+                # from this threaded process, so it is started in a new one
+                utils.run_subprocess(rpm_verify.get_verify_command(self.common_logfiles(step['log_file'])))
+            else:
+                utils.run_subprocess(step['cmd'],
+                                     output=self.common_logfiles(step['log_file']),
+                                     shell=True)
+        except Exception as err:
+            # every failure has to be reported, common_results waits for the step
+            error = err
+        finished.put((step, datetime.datetime.now() - start_time, error))
+
+    def is_reusable(self, log_cache, step, depends, reused):
+        """
+        Function returns True if log file from previous assessment
+        can be used. All log files it depends on have to be reused as well.
+        """
+        if self.conf.no_cache:
+            return False
+        return log_cache.is_valid(step) and not [x for x in depends if x not in reused]
+
+    def common_results(self, required=None):
+        """
+        run common scripts
+
+        Commands are executed by settings.common_workers parallel workers.
+        A command is started once all log files it depends on are gathered.
+        Log files whose inputs did not change since the previous
+        assessment are not gathered again, see preup.log_cache.
+
+        If required is a list of log files, only these log files and
+        log files they depend on are gathered.
+        """
         log_message("Gathering logs used by preupgrade assistant:")
-        self.switch_dir()
+        steps = self.get_steps()
+        if required is not None:
+            all_steps = len(steps)
+            steps = get_required_steps(steps, required)
+            log_message("%d of %d logs are needed by selected rules" % (len(steps), all_steps),
+                        log=False)
+        if not steps:
+            return 1
+        dependencies = get_dependencies(steps)
+        max_length = max(max([len(x['name']) for x in steps]), len(settings.assessment_text))
         try:
-            max_length = max(max([len(x.split("=", 4)[3]) for x in self.lines]), len(settings.assessment_text))
-            # Log files which will not be updated
-            # when RPM database is not changed
-            for counter, line in enumerate(self.lines):
-                line = line.strip()
-                if line.startswith("#"):
-                    continue
-                cmd, log_file, dummy_bash_value, name, values = line.split("=", 4)
-                log_message("%s : %.2d/%d ...running" % (name.ljust(max_length),
-                                                         counter+1,
-                                                         len(self.lines)),
-                            new_line=False, log=False)
-                start_time = datetime.datetime.now()
-                common_file_path = self.common_logfiles(log_file)
-                utils.run_subprocess(cmd, output=common_file_path, shell=True)
-                end_time = datetime.datetime.now()
-                diff = end_time - start_time
-                log_message(" %sfinished (time %.2d:%.2ds)" % ('\b' * 8,
-                                                               diff.seconds / 60,
-                                                               diff.seconds % 60),
-                            log=False)
-                # os.chmod(common_file_path, 0640)
-            self.switch_back_dir()
+            self.switch_dir()
         except IOError:
             return 0
-        else:
-            return 1
+        log_cache = LogCache(self.get_common_dir())
+        finished = queue.Queue()
+        pending = list(steps)
+        gathered = []
+        reused = []
+        running = 0
+        failed = False
+        while pending or running:
+            if not failed:
+                ready = [x for x in pending
+                         if not [y for y in dependencies[x['log_file']] if y not in gathered]]
+                if not ready and not running:
+                    # Cyclic dependencies, continue in order of scripts.txt
+                    ready = pending[:1]
+                for step in ready:
+                    if running >= settings.common_workers:
+                        break
+                    pending.remove(step)
+                    if self.is_reusable(log_cache, step, dependencies[step['log_file']], reused):
+                        reused.append(step['log_file'])
+                        gathered.append(step['log_file'])
+                        log_message("%s : %.2d/%d unchanged, taken from cache" % (step['name'].ljust(max_length),
+                                                                                  len(gathered),
+                                                                                  len(steps)),
+                                    log=False)
+                        continue
+                    thread = threading.Thread(target=self.run_step, args=(step, finished, log_cache))
+                    thread.start()
+                    running += 1
+            if not running:
+                if failed:
+                    break
+                continue
+            step, diff, error = finished.get()
+            running -= 1
+            if error is not None:
+                log_message("Gathering of %s failed: %s" % (step['log_file'], error),
+                            level=logging.ERROR)
+                failed = True
+                continue
+            gathered.append(step['log_file'])
+            log_cache.update(step['log_file'])
+            log_message("%s : %.2d/%d finished (time %.2d:%.2ds)" % (step['name'].ljust(max_length),
+                                                                     len(gathered),
+                                                                     len(steps),
+                                                                     diff.seconds / 60,
+                                                                     diff.seconds % 60),
+                        log=False)
+        log_cache.store()
+        write_gathered_logs(self.get_common_dir(), gathered)
+        fact_store.build_indexes(self.get_common_dir())
+        self.switch_back_dir()
+        if failed:
+            return 0
+        return 1
 
     def copy_common_files(self):
         """run common scripts"""
         self.switch_dir()
+        gathered = get_gathered_logs(self.get_common_dir())
 
         try:
-            for line in self.lines:
-                if line.strip().startswith("#"):
-                    continue
-                values = line.strip().split("=", 5)
-                if values[4] == "YES":
-                    shutil.copyfile(values[1],
+            for step in self.get_steps():
+                if step['kickstart']:
+                    # Log files not needed by selected rules may not be gathered
+                    # or they may be left from older assessments
+                    if not os.path.exists(step['log_file']):
+                        continue
+                    if gathered is not None and step['log_file'] not in gathered:
+                        continue
+                    shutil.copyfile(step['log_file'],
                                     os.path.join(self.conf.result_dir,
                                                  "kickstart",
-                                                 values[5]))
+                                                 step['kickstart_name']))
                 else:
                     if os.path.exists(os.path.join(self.conf.result_dir,
-                                                   values[1])):
-                        os.remove(values[1])
+                                                   step['log_file'])):
+                        os.remove(step['log_file'])
         except IOError:
             return 0
         else:
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+The module serves lookups into common log files during assessment.
+
+FactServer listens on a Unix socket in the report directory while oscap
+runs the checks. Common log files are parsed once, kept sorted in memory
+and searched by binary search. Checks query the server by functions from
+preup.fact_store, python checks through script_api and bash checks through
+'python -m preup.fact_store query' in common.sh. The functions fall back
+to the log files if the server is not running.
+
+Protocol is line oriented. A request is
+    <operation>\\t<log file>\\t<argument>\\n
+where operation is one of 'line', 'first' and 'prefix'. A reply is
+a number of lines followed by the lines themselves. A negative number
+means the request can not be served. Request 'quit' closes connection.
+"""
+
+from __future__ import unicode_literals
+import os
+import bisect
+import threading
+from six.moves import socketserver
+
+from preup import settings
+from preup.logger import log_message, logging
+
+
+def get_socket_path(report_dir):
+    """Function returns path to fact server socket in report_dir"""
+    return os.path.join(report_dir, settings.fact_socket_name)
+
+
+class FactStore(object):
+
+    """
+    Class keeps sorted lines of common log files in memory
+
+    Common log files are gathered before the scan and don't change
+    while the server runs, so a log file is loaded on its first request
+    and never changed afterwards. No lock is needed: if two requests
+    load the same log file at once, both get equal lines.
+    """
+
+    def __init__(self, common_dir):
+        self.common_dir = os.path.realpath(common_dir)
+        self.logs = {}
+
+    def get_lines(self, log_file):
+        """
+        Function returns sorted lines of log_file or None
+        if the log file is not a common log file.
+        """
+        log_file = os.path.realpath(log_file)
+        lines = self.logs.get(log_file)
+        if lines is not None:
+            return lines
+        if os.path.dirname(log_file) != self.common_dir:
+            return None
+        try:
+            f = open(log_file, 'rb')
+        except IOError:
+            return None
+        try:
+            lines = sorted([line.rstrip(b'\n') for line in f])
+        finally:
+            f.close()
+        self.logs[log_file] = lines
+        return lines
+
+    def query(self, operation, log_file, argument):
+        """Function returns list of lines answering the request or None"""
+        if operation not in (b'line', b'first', b'prefix'):
+            return None
+        lines = self.get_lines(log_file)
+        if lines is None:
+            return None
+        index = bisect.bisect_left(lines, argument)
+        if operation == b'line':
+            if index < len(lines) and lines[index] == argument:
+                return [argument]
+            return []
+        result = []
+        for line in lines[index:]:
+            if not line.startswith(argument):
+                break
+            result.append(line)
+            if operation == b'first':
+                break
+        return result
+
+
+class FactRequestHandler(socketserver.StreamRequestHandler):
+
+    """Class handles requests of one check"""
+
+    def handle(self):
+        for request in iter(self.rfile.readline, b''):
+            request = request.rstrip(b'\n')
+            if request == b'quit':
+                break
+            try:
+                operation, log_file, argument = request.split(b'\t', 2)
+                result = self.server.facts.query(operation, log_file.decode(settings.defenc), argument)
+            except (ValueError, IOError, UnicodeError):
+                result = None
+            if result is None:
+                self.wfile.write(b'-1\n')
+            else:
+                self.wfile.write(('%d\n' % len(result)).encode(settings.defenc))
+                for line in result:
+                    self.wfile.write(line + b'\n')
+            self.wfile.flush()
+
+
+class FactServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    """Class serves common log files on Unix socket in a thread"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, common_dir):
+        self.socket_path = socket_path
+        self.facts = FactStore(common_dir)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path, FactRequestHandler)
+        os.chmod(socket_path, 0o600)
+        self.thread = None
+
+    def start(self):
+        """Function starts serving requests in a thread"""
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Function stops the server and removes its socket"""
+        if self.thread is not None:
+            self.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def start_fact_server(report_dir, common_dir):
+    """
+    Function starts FactServer for checks whose XCCDF_VALUE_REPORT_DIR
+    is report_dir and returns it or None if it can not be started.
+    """
+    try:
+        server = FactServer(get_socket_path(report_dir), common_dir)
+    except (IOError, OSError) as err:
+        log_message("Fact server could not be started: %s" % err,
+                    print_output=0, level=logging.WARNING)
+        return None
+    server.start()
+    return server
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+The module provides fast lookups into common log files.
+
+A common log file like rpm_qa.log is sorted once into an index
+file stored next to the log. The index is memory mapped and lines
+are searched by binary search, so a lookup does not read the whole
+log file.
+
+An index is valid only while its mtime (in seconds) is equal to mtime
+of the log.
+Callers fall back to reading the log file if no valid index exists.
+
+During assessment lookups are served by preup.fact_server if it runs.
+
+common.sh uses the module as a command:
+
+python -m preup.fact_store query line|first|prefix LOG_FILE ARGUMENT
+
+It prints found lines and returns 0 if any line was found, 1 if none
+was found and 2 if the log file can not be read.
+"""
+
+from __future__ import unicode_literals
+import os
+import sys
+import mmap
+
+from preup import settings
+
+
+def get_index_path(log_file):
+    """Function returns path to index of log_file"""
+    return log_file + settings.index_suffix
+
+
+def build_index(log_file):
+    """
+    Function sorts lines of log_file into index file
+
+    Index is written to a temporary file and renamed,
+    so concurrent readers never see a partial index.
+    """
+    # imported here, the module is used by script_api in every check
+    import tempfile
+    f = open(log_file, 'rb')
+    try:
+        lines = [line.rstrip(b'\n') for line in f]
+        log_mtime = int(os.fstat(f.fileno()).st_mtime)
+    finally:
+        f.close()
+    lines.sort()
+    index_path = get_index_path(log_file)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(index_path))
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            for line in lines:
+                f.write(line + b'\n')
+        finally:
+            f.close()
+        os.chmod(temp_path, 0o644)
+        os.utime(temp_path, (log_mtime, log_mtime))
+        os.rename(temp_path, index_path)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return index_path
+
+
+def is_index_valid(log_file):
+    """Function returns True if index of log_file is up to date"""
+    try:
+        return int(os.stat(get_index_path(log_file)).st_mtime) == int(os.stat(log_file).st_mtime)
+    except OSError:
+        return False
+
+
+class SortedIndex(object):
+
+    """Class searches lines in sorted index file"""
+
+    def __init__(self, index_path):
+        self.data = b''
+        f = open(index_path, 'rb')
+        try:
+            if os.fstat(f.fileno()).st_size:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+    def lower_bound(self, key):
+        """Function returns offset of the first line which is not lower than key"""
+        low, high = 0, len(self.data)
+        while low < high:
+            middle = (low + high) // 2
+            start = self.data.rfind(b'\n', 0, middle) + 1
+            end = self.data.find(b'\n', start)
+            if end == -1:
+                end = len(self.data)
+            if self.data[start:end] < key:
+                low = end + 1
+            else:
+                high = start
+        return low
+
+    def iter_prefix(self, prefix):
+        """Function yields all lines starting with prefix"""
+        offset = self.lower_bound(prefix)
+        while offset < len(self.data):
+            end = self.data.find(b'\n', offset)
+            if end == -1:
+                end = len(self.data)
+            line = self.data[offset:end]
+            if not line.startswith(prefix):
+                break
+            yield line
+            offset = end + 1
+
+    def has_prefix(self, prefix):
+        """Function returns True if any line starts with prefix"""
+        for dummy_line in self.iter_prefix(prefix):
+            return True
+        return False
+
+    def has_line(self, line):
+        """Function returns True if index contains exactly line"""
+        offset = self.lower_bound(line)
+        end = offset + len(line)
+        return self.data[offset:end] == line and (end == len(self.data) or self.data[end:end + 1] == b'\n')
+
+
+_indexes = {}
+# connection to preup.fact_server, False if the server is not available
+_server = None
+
+
+def query_server(operation, log_file, argument):
+    """
+    Function returns lines answering request to fact server
+    or None if the request can not be served by the server.
+
+    See preup.fact_server for the protocol.
+    """
+    global _server
+    if _server is False:
+        return None
+    if _server is None:
+        _server = False
+        report_dir = os.environ.get('XCCDF_VALUE_REPORT_DIR')
+        if not report_dir:
+            return None
+        socket_path = os.path.join(report_dir, settings.fact_socket_name)
+        if not os.path.exists(socket_path):
+            return None
+        import socket
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(socket_path)
+        except (IOError, OSError):
+            return None
+        _server = sock.makefile('rwb')
+        sock.close()
+    try:
+        _server.write(b'\t'.join([operation, log_file.encode(settings.defenc), argument]) + b'\n')
+        _server.flush()
+        count = int(_server.readline())
+        if count < 0:
+            return None
+        return [_server.readline().rstrip(b'\n') for dummy in range(count)]
+    except (IOError, OSError, ValueError):
+        _server = False
+        return None
+
+
+def get_index(log_file, build=True):
+    """
+    Function returns SortedIndex of log_file or None
+
+    Missing or outdated index is built if build is True
+    and the directory is writable.
+    """
+    if log_file in _indexes:
+        return _indexes[log_file]
+    index = None
+    if not is_index_valid(log_file) and build and os.path.exists(log_file):
+        try:
+            build_index(log_file)
+        except (IOError, OSError):
+            pass
+    if is_index_valid(log_file):
+        try:
+            index = SortedIndex(get_index_path(log_file))
+        except (IOError, OSError, ValueError):
+            index = None
+    _indexes[log_file] = index
+    return index
+
+
+def has_line_prefix(log_file, prefix):
+    """
+    Function returns True if any line of log_file starts with prefix
+
+    Index is used if possible, otherwise log_file is read.
+    Raises IOError if log_file can not be read.
+    """
+    encoded = prefix.encode(settings.defenc)
+    lines = query_server(b'first', log_file, encoded)
+    if lines is not None:
+        return bool(lines)
+    index = get_index(log_file)
+    if index is not None:
+        return index.has_prefix(encoded)
+    f = open(log_file, 'rb')
+    try:
+        for line in f:
+            if line.startswith(encoded):
+                return True
+    finally:
+        f.close()
+    return False
+
+
+def has_line(log_file, line):
+    """
+    Function returns True if log_file contains exactly line
+
+    Index is used if possible, otherwise log_file is read.
+    Raises IOError if log_file can not be read.
+    """
+    encoded = line.encode(settings.defenc)
+    lines = query_server(b'line', log_file, encoded)
+    if lines is not None:
+        return bool(lines)
+    index = get_index(log_file)
+    if index is not None:
+        return index.has_line(encoded)
+    f = open(log_file, 'rb')
+    try:
+        for log_line in f:
+            if log_line.rstrip(b'\n') == encoded:
+                return True
+    finally:
+        f.close()
+    return False
+
+
+def get_lines_with_prefix(log_file, prefix):
+    """
+    Function returns unicode lines of log_file which start with prefix
+
+    Index is used if possible, otherwise log_file is read.
+    Raises IOError if log_file can not be read.
+    """
+    encoded = prefix.encode(settings.defenc)
+    lines = query_server(b'prefix', log_file, encoded)
+    if lines is None:
+        index = get_index(log_file)
+        if index is not None:
+            lines = index.iter_prefix(encoded)
+        else:
+            f = open(log_file, 'rb')
+            try:
+                lines = [x.rstrip(b'\n') for x in f if x.startswith(encoded)]
+            finally:
+                f.close()
+    return [x.decode(settings.defenc, 'replace') for x in lines]
+
+
+def build_indexes(log_dir):
+    """Function builds indexes of all settings.indexed_logs in log_dir"""
+    for log_name in settings.indexed_logs:
+        log_file = os.path.join(log_dir, log_name)
+        if os.path.exists(log_file) and not is_index_valid(log_file):
+            try:
+                build_index(log_file)
+            except (IOError, OSError):
+                pass
+
+
+def query(operation, log_file, argument):
+    """
+    Function returns unicode lines of log_file answering the request
+    of common.sh, see the module docstring.
+
+    Raises IOError if log_file can not be read.
+    """
+    if operation == 'line':
+        return [argument] if has_line(log_file, argument) else []
+    if operation == 'first':
+        return get_lines_with_prefix(log_file, argument)[:1]
+    if operation == 'prefix':
+        return get_lines_with_prefix(log_file, argument)
+    raise ValueError("Unknown operation: %s" % operation)
+
+
+def main(args):
+    """Function runs 'query' command of common.sh and returns exit code"""
+    if len(args) != 4 or args[0] != 'query':
+        sys.stderr.write("Usage: python -m preup.fact_store query line|first|prefix LOG_FILE ARGUMENT\n")
+        return 2
+    operation, log_file, argument = [x.decode(settings.defenc) if isinstance(x, bytes) else x
+                                      for x in args[1:]]
+    try:
+        lines = query(operation, log_file, argument)
+    except (IOError, ValueError) as err:
+        sys.stderr.write("%s\n" % err)
+        return 2
+    for line in lines:
+        # python 3 writes bytes to sys.stdout.buffer
+        getattr(sys.stdout, 'buffer', sys.stdout).write((line + '\n').encode(settings.defenc))
+    return 0 if lines else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
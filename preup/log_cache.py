@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+The module decides which common log files can be reused.
+
+Logs derived from RPM database like rpm_qa.log are reused from
+the previous assessment while the RPM database is not changed.
+Logs produced by verification of packages like rpm_Va.log are reused
+while neither the RPM database nor the files tracked by RPM are changed.
+
+Log files which were not needed by the last assessment are left in
+common dir, so a later assessment can reuse them. Names of log files
+gathered by the last assessment are stored, see get_gathered_logs.
+"""
+
+from __future__ import unicode_literals
+import os
+import json
+import threading
+import rpm
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
+
+from preup import settings
+from preup.utils import get_file_content, write_to_file
+from preup.logger import log_message, logging
+
+
+def get_rpmdb_fingerprint():
+    """
+    Function returns fingerprint of RPM database
+
+    Fingerprint covers size and mtime of database files
+    and number of installed headers.
+    """
+    hasher = sha1()
+    db_path = rpm.expandMacro('%{_dbpath}')
+    try:
+        file_names = sorted(os.listdir(db_path))
+    except OSError:
+        file_names = []
+    for file_name in file_names:
+        # __db.* files are environment of Berkeley DB which change by every query
+        if file_name.startswith('__db'):
+            continue
+        try:
+            stat = os.stat(os.path.join(db_path, file_name))
+        except OSError:
+            continue
+        hasher.update(("%s %d %d\n" % (file_name, stat.st_size, int(stat.st_mtime))).encode(settings.defenc))
+    ts = rpm.TransactionSet()
+    hasher.update(("headers %d\n" % ts.dbMatch().count()).encode(settings.defenc))
+    return hasher.hexdigest()
+
+
+def get_rpm_files_fingerprint():
+    """
+    Function returns fingerprint of all files tracked by RPM
+
+    Fingerprint covers size, mtime, mode and owner of each file,
+    so it is much cheaper than verification of file digests.
+    """
+    hasher = sha1()
+    ts = rpm.TransactionSet()
+    for hdr in ts.dbMatch():
+        for file_name in hdr['filenames'] or []:
+            try:
+                stat = os.lstat(file_name)
+            except OSError:
+                hasher.update(b'missing ')
+            else:
+                hasher.update(("%d %d %o %d %d " % (stat.st_size,
+                                                    int(stat.st_mtime),
+                                                    stat.st_mode,
+                                                    stat.st_uid,
+                                                    stat.st_gid)).encode(settings.defenc))
+            if isinstance(file_name, bytes):
+                hasher.update(file_name + b'\n')
+            else:
+                hasher.update((file_name + '\n').encode(settings.defenc))
+    return hasher.hexdigest()
+
+
+def write_gathered_logs(common_dir, log_files):
+    """Function stores names of log files gathered by the current assessment"""
+    path = os.path.join(common_dir, settings.gathered_logs_name)
+    try:
+        write_to_file(path, 'wb', json.dumps(sorted(log_files)))
+    except IOError:
+        log_message("List of gathered logs %s could not be updated" % path,
+                    print_output=0, level=logging.WARNING)
+
+
+def get_gathered_logs(common_dir):
+    """
+    Function returns set of log files gathered by the last assessment
+    or None if it is not known. Other log files in common_dir are
+    left from older assessments and they are outdated.
+    """
+    try:
+        return set(json.loads(get_file_content(os.path.join(common_dir, settings.gathered_logs_name), 'rb')))
+    except (IOError, ValueError, TypeError):
+        return None
+
+
+class LogCache(object):
+
+    """Class stores fingerprints of inputs of common log files"""
+
+    def __init__(self, common_dir):
+        """common_dir is a directory where common log files are stored"""
+        self.common_dir = common_dir
+        self.path = os.path.join(common_dir, settings.log_cache_name)
+        self.fingerprints = {}
+        self._inputs = {}
+        # fingerprints of logs gathered with --no-cache are computed by workers
+        self._lock = threading.Lock()
+        try:
+            self.stored = json.loads(get_file_content(self.path, 'rb'))
+        except (IOError, ValueError):
+            self.stored = {}
+
+    def get_input(self, name, function):
+        """Function returns fingerprint of input computed only once per assessment"""
+        self._lock.acquire()
+        try:
+            if name not in self._inputs:
+                try:
+                    self._inputs[name] = function()
+                except (rpm.error, OSError, KeyError) as err:
+                    log_message("Fingerprint of %s could not be computed: %s" % (name, err),
+                                print_output=0, level=logging.WARNING)
+                    self._inputs[name] = None
+            return self._inputs[name]
+        finally:
+            self._lock.release()
+
+    def get_fingerprint(self, step):
+        """
+        Function returns fingerprint of inputs of common log file
+        or None if log file is not cached.
+
+        step is a dictionary returned by parse_script_line
+        """
+        log_file = step['log_file']
+        inputs = []
+        if log_file in settings.rpmdb_logs or log_file in settings.rpm_verify_logs:
+            inputs.append(self.get_input('rpmdb', get_rpmdb_fingerprint))
+        if log_file in settings.rpm_verify_logs:
+            inputs.append(self.get_input('rpm_files', get_rpm_files_fingerprint))
+        if not inputs or None in inputs:
+            return None
+        hasher = sha1()
+        hasher.update(step['cmd'].encode(settings.defenc))
+        for fingerprint in inputs:
+            hasher.update(fingerprint.encode(settings.defenc))
+        return hasher.hexdigest()
+
+    def set_fingerprint(self, step):
+        """Function computes fingerprint of log file which is stored by update"""
+        fingerprint = self.get_fingerprint(step)
+        self.fingerprints[step['log_file']] = fingerprint
+        return fingerprint
+
+    def is_valid(self, step):
+        """Function returns True if log file can be reused"""
+        fingerprint = self.set_fingerprint(step)
+        if fingerprint is None:
+            return False
+        if not os.path.exists(os.path.join(self.common_dir, step['log_file'])):
+            return False
+        return self.stored.get(step['log_file']) == fingerprint
+
+    def update(self, log_file):
+        """Function marks log file as gathered with current inputs"""
+        fingerprint = self.fingerprints.get(log_file)
+        if fingerprint is None:
+            self.stored.pop(log_file, None)
+        else:
+            self.stored[log_file] = fingerprint
+
+    def store(self):
+        """Function stores fingerprints of gathered log files"""
+        try:
+            write_to_file(self.path, 'wb', json.dumps(self.stored, indent=4, sort_keys=True))
+        except IOError:
+            log_message("Log cache %s could not be updated" % self.path,
+                        print_output=0, level=logging.WARNING)
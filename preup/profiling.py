@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+The module measures wall time, CPU time and peak RSS of each check.
+
+oscap executes checks one after another and reports each finished rule
+on its progress output. The time between two progress lines is the
+wall time of the rule. CPU time is taken from /proc/<oscap>/stat which
+accumulates time of all finished SCE scripts.
+
+Peak RSS is measured only if it is requested (--profile-checks), because
+descendants of oscap have to be sampled. VmHWM of each descendant
+is sampled and peaks of processes which exited before the rule was
+reported belong to that rule. Peak RSS of a rule is None if none of its
+processes was sampled.
+"""
+
+from __future__ import unicode_literals
+import os
+import json
+import time
+import threading
+
+from preup.utils import write_to_file
+
+try:
+    CLOCK_TICKS = float(os.sysconf(str('SC_CLK_TCK')))
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100.0
+
+SAMPLE_INTERVAL = 0.1
+
+
+def read_proc_stat(pid):
+    """
+    Function returns fields of /proc/<pid>/stat after command name
+
+    The first returned field is the process state.
+    """
+    try:
+        f = open('/proc/%d/stat' % pid, 'rb')
+        try:
+            data = f.read().decode('ascii', 'replace')
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return None
+    return data[data.rfind(')') + 2:].split()
+
+
+def get_cpu_time(pid):
+    """Function returns CPU time of process pid and its finished children"""
+    fields = read_proc_stat(pid)
+    if not fields:
+        return 0.0
+    return sum([int(x) for x in fields[11:15]]) / CLOCK_TICKS
+
+
+def read_children(pid):
+    """
+    Function returns pids of children of pid or None
+    if the kernel does not provide /proc/<pid>/task/<tid>/children
+    """
+    try:
+        tasks = os.listdir('/proc/%d/task' % pid)
+    except OSError:
+        return []
+    children = []
+    for tid in tasks:
+        try:
+            f = open('/proc/%d/task/%s/children' % (pid, tid), 'rb')
+        except IOError:
+            if os.path.exists('/proc/%d/task/%s' % (pid, tid)):
+                return None
+            continue
+        try:
+            children.extend([int(x) for x in f.read().split()])
+        finally:
+            f.close()
+    return children
+
+
+def get_descendants(pid):
+    """Function returns pids of all descendants of pid"""
+    descendants = []
+    stack = [pid]
+    while stack:
+        children = read_children(stack.pop())
+        if children is None:
+            break
+        descendants.extend(children)
+        stack.extend(children)
+    else:
+        return descendants
+    # children are found by parent pids of all processes then
+    parents = {}
+    try:
+        pids = [int(x) for x in os.listdir('/proc') if x.isdigit()]
+    except OSError:
+        return []
+    for proc_pid in pids:
+        fields = read_proc_stat(proc_pid)
+        if fields:
+            parents.setdefault(int(fields[1]), []).append(proc_pid)
+    descendants = []
+    stack = list(parents.get(pid, []))
+    while stack:
+        child = stack.pop()
+        descendants.append(child)
+        stack.extend(parents.get(child, []))
+    return descendants
+
+
+def get_peak_rss(pid):
+    """Function returns peak RSS (VmHWM) of process pid in kB or 0"""
+    try:
+        f = open('/proc/%d/status' % pid, 'rb')
+        try:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1])
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class ProcessProfile(object):
+
+    """Class profiles checks executed by one oscap process"""
+
+    def __init__(self, profiler, function=None):
+        self.profiler = profiler
+        self.function = function
+        self.process = None
+        self.last_time = time.time()
+        self.last_cpu = 0.0
+        # peak RSS of sampled descendants by their pids
+        self.peaks = {}
+        self.lock = threading.Lock()
+
+    def start(self, process):
+        """Function is called by run_subprocess once oscap is started"""
+        self.process = process
+        self.last_time = time.time()
+        self.last_cpu = get_cpu_time(process.pid)
+        if self.profiler.sample_rss:
+            sampler = threading.Thread(target=self.sample_rss)
+            sampler.setDaemon(True)
+            sampler.start()
+
+    def sample_rss(self):
+        """Function samples peak RSS of checks while oscap is running"""
+        while self.process.poll() is None:
+            peaks = []
+            for pid in get_descendants(self.process.pid):
+                peaks.append((pid, get_peak_rss(pid)))
+            self.lock.acquire()
+            try:
+                for pid, peak in peaks:
+                    if peak:
+                        self.peaks[pid] = max(self.peaks.get(pid, 0), peak)
+            finally:
+                self.lock.release()
+            time.sleep(SAMPLE_INTERVAL)
+
+    def pop_peak_rss(self):
+        """
+        Function returns peak RSS of sampled processes which exited
+        or None if there is no such process
+
+        oscap reports a rule after its SCE script exited, so running
+        processes belong to the next rule.
+        """
+        self.lock.acquire()
+        try:
+            finished = [x for x in self.peaks if not os.path.exists('/proc/%d' % x)]
+            if not finished:
+                return None
+            return sum([self.peaks.pop(x) for x in finished])
+        finally:
+            self.lock.release()
+
+    def progress(self, stdout_data):
+        """Function records timing of rule reported by oscap progress line"""
+        try:
+            rule_id, result = stdout_data.strip().split(':')
+        except ValueError:
+            rule_id = None
+        if rule_id and self.process is not None:
+            now = time.time()
+            cpu = get_cpu_time(self.process.pid)
+            self.profiler.add_timing(rule_id,
+                                     result,
+                                     now - self.last_time,
+                                     max(cpu - self.last_cpu, 0.0),
+                                     self.pop_peak_rss())
+            self.last_time = now
+            self.last_cpu = cpu
+        if self.function is not None:
+            self.function(stdout_data)
+
+
+class CheckProfiler(object):
+
+    """Class collects timings of all checks executed during assessment"""
+
+    def __init__(self, names=None, sample_rss=False):
+        """
+        names is dictionary with rule ids and their titles
+        peak RSS of checks is sampled if sample_rss is True
+        """
+        self.names = names or {}
+        self.sample_rss = sample_rss
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def get_process_profile(self, function=None):
+        """Function returns profile for one oscap process"""
+        return ProcessProfile(self, function)
+
+    def add_timing(self, rule_id, result, wall_time, cpu_time, peak_rss):
+        self.lock.acquire()
+        try:
+            self.timings[rule_id] = {'title': self.names.get(rule_id, rule_id),
+                                     'result': result,
+                                     'wall_time': round(wall_time, 3),
+                                     'cpu_time': round(cpu_time, 3),
+                                     'peak_rss': peak_rss,
+                                     }
+        finally:
+            self.lock.release()
+
+    def get_timings(self):
+        """
+        Function returns timings of all executed rules
+
+        Format is: {rule_id: {'title': .., 'result': .., 'wall_time': ..,
+                              'cpu_time': .., 'peak_rss': ..}}
+        wall_time and cpu_time are in seconds, peak_rss is in kB
+        or None if it was not measured
+        """
+        return self.timings
+
+    def write_timings(self, path):
+        """Function stores timings into JSON file"""
+        write_to_file(path, 'wb', json.dumps(self.timings, indent=4, sort_keys=True))
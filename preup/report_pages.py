@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+The module writes index of split HTML report.
+
+Split report consists of an index page with summary of results
+of each top-level group and a page of each group. Pages are generated
+from partial XML reports like other HTML reports, see
+Application.write_report_pages, so a page of one group can be
+regenerated without the others.
+"""
+
+from __future__ import unicode_literals
+import os
+
+from preup.utils import write_to_file
+from preup.xml_manager import html_escape_string
+
+GROUP_PREFIX = 'xccdf_preupg_group_'
+# order of results in the index, other results follow sorted
+RESULT_ORDER = ['fail', 'needs_action', 'needs_inspection', 'error', 'unknown',
+                'fixed', 'informational', 'pass', 'notapplicable', 'notchecked', 'notselected']
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8"/>
+<title>%(title)s</title>
+<style>
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: left; }
+td.count { text-align: right; }
+</style>
+</head>
+<body>
+<h1>%(title)s</h1>
+<table>
+<tr><th>Group</th>%(header)s</tr>
+%(rows)s</table>
+</body>
+</html>
+"""
+
+
+def get_page_name(prefix, group_id):
+    """Function returns base name of page of group_id without extension"""
+    return prefix + group_id.replace(GROUP_PREFIX, '')
+
+
+def get_results(groups):
+    """Function returns results occurring in groups in index order"""
+    results = set()
+    for dummy_group_id, dummy_title, counts in groups:
+        results.update(counts.keys())
+    ordered = [x for x in RESULT_ORDER if x in results]
+    return ordered + sorted(results - set(ordered))
+
+
+def write_index(path, title, groups, prefix):
+    """
+    Function writes index page of split report
+
+    :param groups: list of (group id, title, {result: count})
+                   returned by ReportParser.get_group_results
+    :param prefix: prefix of base names of group pages
+    """
+    results = get_results(groups)
+    header = ''.join(['<th>%s</th>' % html_escape_string(x) for x in results])
+    rows = []
+    for group_id, group_title, counts in groups:
+        cells = ''.join(['<td class="count">%s</td>' % (counts.get(x) or '') for x in results])
+        page = os.path.basename(get_page_name(prefix, group_id)) + '.html'
+        rows.append('<tr><td><a href="%s">%s</a></td>%s</tr>\n' % (html_escape_string(page),
+                                                                  html_escape_string(group_title or group_id),
+                                                                  cells))
+    write_to_file(path, 'wb', INDEX_TEMPLATE % {'title': html_escape_string(title),
+                                                'header': header,
+                                                'rows': ''.join(rows)})
@@ -1,6 +1,7 @@
 from __future__ import print_function, unicode_literals
 import re
 import os
+import copy
 import shutil
 import six
 
@@ -10,6 +11,12 @@ from preup import settings
 from xml.etree import ElementTree
 from preuputils import xml_tags
 
+try:
+    ElementTree.register_namespace('preupg-profiling', settings.profiling_ns)
+except AttributeError:
+    # Python 2.6 ElementTree uses generated ns0 prefix
+    pass
+
 
 def get_node(tree, tag, name_space='', prefix=''):
     return tree.find(prefix + name_space + tag)
@@ -37,6 +44,10 @@ def upd_extreme(rule):
     return None, "fail"
 
 
+# Results which are not counted into a score of TestResult
+UNSCORED_RESULTS = ['notselected', 'notapplicable', 'informational', 'notchecked']
+
+
 class ReportParser(object):
 
     """Class manipulates with XML files created by oscap"""
@@ -44,6 +55,8 @@ class ReportParser(object):
     def __init__(self, report_path):
         self.path = report_path
         self.element_prefix = "{http://checklists.nist.gov/xccdf/1.2}"
+        self._index = None
+        self._risks = None
         try:
             # ElementTree.fromstring can't parse safely unicode string
             content = get_file_content(report_path, 'rb', False, False)
@@ -116,14 +129,75 @@ class ReportParser(object):
     def _get_all_rules(self):
         return self.get_nodes(self.target_tree, "Rule", prefix=".//")
 
+    def _get_index(self):
+        """
+        Function returns dictionaries of Rule, select and rule-result
+        nodes by their id. They are built once for each parsed tree.
+        """
+        if self._index is None or self._index[0] is not self.target_tree:
+            rules = {}
+            for rule in self._get_all_rules():
+                rules.setdefault(rule.get('id', ''), rule)
+            selects = {}
+            for select in self.get_select_rules():
+                selects.setdefault(select.get('idref', ''), select)
+            rule_results = {}
+            for rule in self.get_all_result_rules():
+                rule_results.setdefault(rule.get('idref', ''), rule)
+            self._index = (self.target_tree, rules, selects, rule_results)
+        return self._index
+
+    def get_rule(self, rule_id):
+        """Function returns Rule node with rule_id or None"""
+        return self._get_index()[1].get(rule_id)
+
+    def get_select(self, rule_id):
+        """Function returns select node of rule_id in Profile or None"""
+        return self._get_index()[2].get(rule_id)
+
+    def get_rule_result(self, rule_id):
+        """Function returns rule-result node of rule_id in TestResult or None"""
+        return self._get_index()[3].get(rule_id)
+
+    def get_risks(self):
+        """
+        Function returns list of [idref, [[level, message], ...]]
+        with inplace risks of each rule-result which reports any.
+        Risks are extracted once for each parsed tree.
+        """
+        if self._risks is None or self._risks[0] is not self.target_tree:
+            risks = []
+            for rule in self.get_all_result_rules():
+                rule_risks = xccdf.get_rule_risks(rule)
+                if rule_risks:
+                    risks.append([rule.get('idref', ''), rule_risks])
+            self._risks = (self.target_tree, risks, dict(risks))
+        return self._risks[1]
+
+    def get_rule_risks(self, rule_id):
+        """Function returns list of [level, message] risks of rule_id"""
+        self.get_risks()
+        return self._risks[2].get(rule_id, [])
+
+    def write_risks(self):
+        """
+        Function stores risks of rules and their summary next to the report
+
+        Tags like [link: ...] in risks are formatted by XmlManager.update_html
+        in the report file only, the file is parsed again if any risk has a tag.
+        """
+        risks = self.get_risks()
+        if [x for dummy_idref, rule_risks in risks for dummy_level, x in rule_risks if '[' in x]:
+            risks = ReportParser(self.path).get_risks()
+        xccdf.write_risks(self.path, risks)
+        xccdf.write_risk_summary(self.path, risks)
+
     def get_name_of_checks(self):
         """Function returns a names of rules"""
         list_names = {}
-        rule_nodes = self._get_all_rules()
         for select in self.get_allowed_selected_rules():
             id_ref = select.get('idref', '')
-            rule = [x for x in rule_nodes if x.get('id', '') == id_ref]
-            list_names[id_ref] = self.get_nodes_text(rule[0], "title")
+            list_names[id_ref] = self.get_nodes_text(self.get_rule(id_ref), "title")
         return list_names
 
     def get_all_result_rules(self):
@@ -154,13 +228,21 @@ class ReportParser(object):
                 dict_solution[value_id] = value.text
         return dict_solution
 
-    def write_xml(self):
-        """Function writes XML document to file"""
+    def write_xml(self, path=None, reload=True):
+        """
+        Function writes XML document to file
+
+        :param path: file where document is written, self.path by default
+        :param reload: document is parsed again from the written file
+        """
+        if path is None:
+            path = self.path
         self.target_tree.set('xmlns:xhtml', 'http://www.w3.org/1999/xhtml/')
         # we really must set encoding here! and suppress it in write_to_file
         data = ElementTree.tostring(self.target_tree, "utf-8")
-        write_to_file(self.path, 'wb', data, False)
-        self.target_tree = ElementTree.parse(self.path).getroot()
+        write_to_file(path, 'wb', data, False)
+        if reload:
+            self.target_tree = ElementTree.parse(path).getroot()
 
     def modify_result_path(self, result_dir, scenario, mode):
         """Function modifies result path in XML file"""
@@ -182,23 +264,21 @@ class ReportParser(object):
 
     def update_inplace_risk(self, scanning_progress, rule, res):
         """Function updates inplace risk"""
-        inplace_risk = xccdf.get_check_import_inplace_risk(rule)
+        inplace_risk = xccdf.get_risk_lines(self.get_rule_risks(rule.get('idref')))
         if inplace_risk:
             return_value = xccdf.get_and_print_inplace_risk(0, inplace_risk)
             if int(return_value) < 3:
                 res.text = utils.get_needs_inspection()
             elif int(return_value) == 3:
                 res.text = utils.get_needs_action()
-            for index, row in enumerate(scanning_progress.output_data):
-                if self.get_nodes_text(rule, "title") in row:
-                    scanning_progress.output_data[index] = "{0}:{1}".format(
-                        self.get_nodes_text(rule, "title"),
-                        res.text)
+            scanning_progress.update_result(rule.get('idref'), res.text)
 
-    def replace_inplace_risk(self, scanning_results=None):
+    def replace_inplace_risk(self, scanning_results=None, write=True):
         """
         This function has aim to replace FAILED to
         NEEDS_INSPECTION in case that risks are NONE or SLIGHT
+
+        If write is False, only the document in memory is updated.
         """
         #Filter all rule-result in TestResult
         changed_fields = []
@@ -214,7 +294,7 @@ class ReportParser(object):
             result = [x for x in self.get_nodes(rule, "result") if x.text == "fail"]
             # Get all affected rules and taken their names
             for res in result:
-                inplace_risk = xccdf.get_check_import_inplace_risk(rule)
+                inplace_risk = xccdf.get_risk_lines(self.get_rule_risks(rule.get('idref')))
                 # In case that report has state fail and
                 # no log_risk than it should be needs_inspection
                 if not inplace_risk:
@@ -228,7 +308,8 @@ class ReportParser(object):
         if scanning_results:
             scanning_results.update_data(changed_fields)
 
-        self.write_xml()
+        if write:
+            self.write_xml()
 
     def remove_empty_check_import(self):
         """This function remove check_import tag which are empty"""
@@ -241,8 +322,12 @@ class ReportParser(object):
                     for res in result:
                         remove_node(check, res)
 
-    def remove_debug_info(self):
-        """Function removes debug information from report"""
+    def remove_debug_info(self, write=True):
+        """
+        Function removes debug information from report
+
+        If write is False, only the document in memory is updated.
+        """
         re_expr = r'^DEBUG.*'
         for rule in self.get_all_result_rules():
             for check_import in self.filter_grandchildren(rule,
@@ -255,13 +340,17 @@ class ReportParser(object):
                         if not matched:
                             new_check.append(check)
                     check_import.text = '\n'.join(new_check)
-        self.write_xml()
+        if write:
+            self.write_xml()
 
     @staticmethod
-    def write_xccdf_version(file_name, direction=False):
+    def write_xccdf_version(file_name, direction=False, target=None):
         """
         Function updates XCCDF version because
         of separate HTML generation and our own XSL stylesheet
+
+        If target is set, updated content is written there
+        and file_name is left unchanged.
         """
         namespace_1 = 'http://checklists.nist.gov/xccdf/1.1'
         namespace_2 = 'http://checklists.nist.gov/xccdf/1.2'
@@ -270,9 +359,15 @@ class ReportParser(object):
             content = re.sub(namespace_2, namespace_1, content)
         else:
             content = re.sub(namespace_1, namespace_2, content)
-        write_to_file(file_name, 'wb', content)
+        write_to_file(target or file_name, 'wb', content)
+
+    def update_check_description(self, write=True):
+        """
+        Function marks Details and Expected results sections
+        in descriptions of rules
 
-    def update_check_description(self):
+        If write is False, only the document in memory is updated.
+        """
         for rule in self._get_all_rules():
             for description in self.filter_children(rule, 'description'):
                 lines = description.text.split('\n')
@@ -295,7 +390,8 @@ class ReportParser(object):
                 if found == 1:
                     lines.append('</ns0:' + tag_exp_results + '>')
                     description.text = '\n'.join(lines)
-        self.write_xml()
+        if write:
+            self.write_xml()
 
     def select_rules(self, list_rules):
         """
@@ -303,6 +399,7 @@ class ReportParser(object):
 
         :return:
         """
+        list_rules = set(list_rules)
         for select in self.get_select_rules():
             idref = select.get('idref', None)
             if idref in list_rules:
@@ -311,6 +408,200 @@ class ReportParser(object):
                 select.set('selected', 'false')
         self.write_xml()
 
+    def write_shard_content(self, list_rules, path):
+        """
+        Function writes a copy of the content to path where only
+        rules from list_rules are selected.
+
+        The original tree is left untouched so the same parser
+        can produce all shards. oscap looks for check scripts relative
+        to the content so their paths are made relative to path.
+        """
+        shard_tree = copy.deepcopy(self.target_tree)
+        content_dir = os.path.dirname(os.path.abspath(self.path))
+        shard_dir = os.path.dirname(os.path.abspath(path))
+        if content_dir != shard_dir:
+            for check_ref in self.get_nodes(shard_tree, "check-content-ref", prefix=".//"):
+                check_path = os.path.join(content_dir, check_ref.get('href', ''))
+                check_ref.set('href', os.path.relpath(check_path, shard_dir))
+        shard_rules = set(list_rules)
+        for profile in self.get_nodes(shard_tree, self.profile):
+            known_rules = set()
+            for select in self.get_nodes(profile, "select"):
+                idref = select.get('idref', None)
+                known_rules.add(idref)
+                select.set('selected', 'true' if idref in shard_rules else 'false')
+            # Rules selected by default have to be deselected explicitly
+            for rule in self.get_nodes(shard_tree, "Rule", prefix=".//"):
+                rule_id = rule.get('id', '')
+                if rule_id in known_rules:
+                    continue
+                ElementTree.SubElement(profile, self.element_prefix + 'select',
+                                       {'idref': rule_id,
+                                        'selected': 'true' if rule_id in shard_rules else 'false'})
+        data = ElementTree.tostring(shard_tree, "utf-8")
+        write_to_file(path, 'wb', data, False)
+
+    def update_rule_results(self, rule_results, list_rules):
+        """
+        Function replaces rule-result nodes in TestResult node
+        by rule_results and marks rules from list_rules as selected.
+
+        rule_results is a list of rule-result nodes taken over
+        from another report (shard result or rule cache)
+        """
+        test_result = self.get_child(self.target_tree, "TestResult")
+        positions = {}
+        for index, rule in enumerate(test_result):
+            if rule.tag == self.element_prefix + 'rule-result':
+                positions[rule.get('idref')] = index
+        for rule in rule_results:
+            try:
+                test_result[positions[rule.get('idref')]] = rule
+            except KeyError:
+                test_result.append(rule)
+        selected_rules = set(list_rules)
+        for select in self.get_select_rules():
+            idref = select.get('idref', None)
+            select.set('selected', 'true' if idref in selected_rules else 'false')
+        # rule-result nodes were replaced
+        self._index = None
+        self._risks = None
+
+    def merge_test_results(self, result_files, list_rules, result_path):
+        """
+        Function merges rule-result nodes from result files of sharded
+        scans into the TestResult node of this report.
+
+        Only the rules really assessed by a shard are taken over,
+        selection of rules is restored by list_rules and
+        merged report is stored to result_path.
+        """
+        test_result = self.get_child(self.target_tree, "TestResult")
+        rule_results = []
+        for result_file in result_files:
+            content = get_file_content(result_file, 'rb', False, False)
+            shard_result = self.get_child(ElementTree.fromstring(content), "TestResult")
+            if shard_result is None:
+                continue
+            for rule in self.get_nodes(shard_result, 'rule-result'):
+                if self.get_nodes_text(rule, 'result') != 'notselected':
+                    rule_results.append(rule)
+            end_time = shard_result.get('end-time')
+            if end_time and end_time > test_result.get('end-time', ''):
+                test_result.set('end-time', end_time)
+        self.update_rule_results(rule_results, list_rules)
+        self.update_scores()
+        self.path = result_path
+        self.write_xml()
+
+    def _get_item_score(self, item, results):
+        """
+        Function returns a tuple (score, count) of Group or Rule node
+        computed by XCCDF default scoring model.
+
+        Rules with a result from UNSCORED_RESULTS and groups without
+        any scored rule have count 0 and are not taken into account.
+        """
+        if item.tag == self.element_prefix + 'Rule':
+            result = results.get(item.get('id'))
+            if result is None or result in UNSCORED_RESULTS:
+                return 0.0, 0
+            return (100.0 if result in ['pass', 'fixed'] else 0.0), 1
+        score = 0.0
+        accumulator = 0.0
+        count = 0
+        for child in item:
+            if child.tag not in [self.element_prefix + 'Group', self.element_prefix + 'Rule']:
+                continue
+            child_score, child_count = self._get_item_score(child, results)
+            if not child_count:
+                continue
+            weight = float(child.get('weight', '1'))
+            score += child_score * weight
+            accumulator += weight
+            count += 1
+        if accumulator:
+            score /= accumulator
+        return score, count
+
+    def update_scores(self):
+        """
+        Function computes score nodes of TestResult again
+        from its rule-result nodes the same way as oscap does.
+
+        Scores of unknown scoring systems are removed.
+        """
+        test_result = self.get_child(self.target_tree, "TestResult")
+        results = {}
+        for rule in self.get_nodes(test_result, 'rule-result'):
+            results[rule.get('idref')] = self.get_nodes_text(rule, 'result')
+        weights = {}
+        for rule in self._get_all_rules():
+            result = results.get(rule.get('id'))
+            if result is not None and result not in UNSCORED_RESULTS:
+                weights[rule.get('id')] = (float(rule.get('weight', '1')),
+                                           result in ['pass', 'fixed'])
+        for score in self.get_nodes(test_result, 'score'):
+            system = score.get('system', 'urn:xccdf:scoring:default')
+            if system == 'urn:xccdf:scoring:default':
+                value = self._get_item_score(self.target_tree, results)[0]
+                maximum = 100.0
+            elif system == 'urn:xccdf:scoring:flat':
+                value = sum([w for w, passed in weights.values() if passed])
+                maximum = sum([w for w, passed in weights.values()])
+            elif system == 'urn:xccdf:scoring:flat-unweighted':
+                value = float(len([w for w, passed in weights.values() if passed]))
+                maximum = float(len(weights))
+            elif system == 'urn:xccdf:scoring:absolute':
+                maximum = 1.0
+                value = 1.0 if weights and all([passed for w, passed in weights.values()]) else 0.0
+            else:
+                test_result.remove(score)
+                continue
+            score.set('maximum', '%f' % maximum)
+            score.text = '%f' % value
+
+    def add_rule_timings(self, timings, write=True):
+        """
+        Function stores timings of executed rules as attributes
+        of rule-result nodes in TestResult node.
+
+        timings are in format returned by CheckProfiler.get_timings
+        """
+        name_space = '{' + settings.profiling_ns + '}'
+        for rule in self.filter_grandchildren(self.target_tree, "TestResult", "rule-result"):
+            timing = timings.get(rule.get('idref'))
+            if timing is None:
+                continue
+            rule.set(name_space + 'wall-time', six.text_type(timing['wall_time']))
+            rule.set(name_space + 'cpu-time', six.text_type(timing['cpu_time']))
+            if timing['peak_rss'] is not None:
+                rule.set(name_space + 'peak-rss', six.text_type(timing['peak_rss']))
+        if write:
+            self.write_xml()
+
+    def get_required_logs(self, list_rules):
+        """
+        Function returns a set of common log files needed by rules
+        from list_rules or None if any of them needs all common log files.
+
+        Rules declare log files by common_logs tag in INI file.
+        """
+        values = {}
+        for value in self.get_nodes(self.target_tree, "Value", prefix='.//'):
+            value_id = value.get('id', '')
+            if value_id.endswith('_state_common_logs'):
+                values[value_id] = ''.join([x.text or '' for x in self.get_nodes(value, "value")])
+        required = set()
+        for rule_id in list_rules:
+            value_id = rule_id.replace(settings.xccdf_tag, xml_tags.TAG_VALUE) + '_state_common_logs'
+            logs = values.get(value_id)
+            if logs is None or logs.strip() == 'all':
+                return None
+            required.update([x.strip() for x in logs.split(',') if x.strip()])
+        return required
+
     def check_rules(self, list_rules):
         """
         Function checks if rules exists
@@ -318,8 +609,12 @@ class ReportParser(object):
         :return: List of rules which does not exist
         """
         unknown_rules = []
+        selects = self._get_index()[2]
         for select in list_rules:
-            found = [i for i in self.get_select_rules() if select in i.get('idref')]
+            if select in selects:
+                continue
+            # Rules can be specified by a part of their id
+            found = [i for i in selects if select in i]
             if not found:
                 unknown_rules.append(select)
         return unknown_rules
@@ -332,57 +627,150 @@ class ReportParser(object):
                 list_rules.append(idref)
         return list_rules
 
-    def get_report_type(self, report_type):
+    def get_result_parts(self):
         """
-        Function returns all reports for selected report_type
-
-        :param type: specify report_type like 'admin' or 'user'
-        :return: a set of content
+        Function returns dictionary with rule ids without prefix
+        and report types (result_part values) of the rules
         """
-        if not os.path.exists(self.path):
-            return None
-        orig_name = self.path
-        new_report_name = os.path.join(os.path.dirname(self.path),
-                                       settings.result_name + '-' + report_type + '.xml')
-        shutil.copyfile(self.path, new_report_name)
-        self.reload_xml(new_report_name)
-        list_dict = {}
+        result_parts = {}
         for values in self.get_nodes(self.target_tree, "Value", prefix='.//'):
             values_id = values.get('id')
             if not values_id.endswith('_state_result_part'):
                 continue
+            rule_id = values_id.replace('_state_result_part', '').replace('xccdf_preupg_value_', '')
             for value in self.get_nodes(values, "value"):
-                if value.text == report_type:
-                    values_id = values_id.replace('_state_result_part', '').replace('xccdf_preupg_value_', '')
-                    group_id = '_'.join(values_id.split('_')[:-1])
-                    list_dict[group_id] = values_id
-
-        if not list_dict:
-            self.reload_xml(orig_name)
-            os.unlink(new_report_name)
-            return None
-        # Remove all reports from main Group node
-        search = '%sRule' % self.element_prefix
-        search_group = './/%sGroup' % self.element_prefix
-        """for parent in self.target_tree.findall(search_group):
-            for rule in parent.findall(search):
-                rule_id = rule.get('id').replace('xccdf_preupg_rule_', '')
-                parent_id = parent.get('id').replace('xccdf_preupg_group_', '')
-                if parent_id not in list_dict.keys():
-                    parent.remove(rule)
-        """
-
-        # Remove all reports from TestResult node
+                result_parts[rule_id] = value.text
+        return result_parts
+
+    def get_report_types(self, report_types):
+        """
+        Function writes a report for each of report_types
+        with results of rules of that type only
+
+        Rule results are classified by their result_part in one pass
+        and every report is serialized from the document in memory,
+        which is left unchanged.
+
+        :param report_types: list of report types like ['admin', 'user']
+        :return: list of paths to the new reports, report types
+                 without any rule are skipped
+        """
+        if not os.path.exists(self.path):
+            return []
+        result_parts = self.get_result_parts()
+        available_types = set(result_parts.values())
+        report_types = [x for x in report_types if x in available_types]
+        if not report_types:
+            return []
+        # children of TestResult nodes for every report type
+        test_results = []
         for test_result in self.get_nodes(self.target_tree, 'TestResult'):
-            for rule in self.get_nodes(test_result, 'rule-result'):
-                idref = rule.get('idref').replace('xccdf_preupg_rule_', '')
-                if idref not in list_dict.values():
-                    test_result.remove(rule)
+            children = list(test_result)
+            type_children = dict([(x, []) for x in report_types])
+            for child in children:
+                if child.tag == self.element_prefix + 'rule-result':
+                    report_type = result_parts.get(child.get('idref').replace('xccdf_preupg_rule_', ''))
+                    if report_type in type_children:
+                        type_children[report_type].append(child)
+                    continue
+                for type_list in type_children.values():
+                    type_list.append(child)
+            test_results.append((test_result, children, type_children))
 
-        self.write_xml()
+        reports = []
+        try:
+            for report_type in report_types:
+                for test_result, dummy_children, type_children in test_results:
+                    test_result[:] = type_children[report_type]
+                new_report_name = os.path.join(os.path.dirname(self.path),
+                                               settings.result_name + '-' + report_type + '.xml')
+                self.write_xml(path=new_report_name, reload=False)
+                reports.append(new_report_name)
+        finally:
+            for test_result, children, dummy_type_children in test_results:
+                test_result[:] = children
+        return reports
 
-        self.reload_xml(orig_name)
-        return new_report_name
+    def get_report_type(self, report_type):
+        """
+        Function writes a report with results of report_type rules only
+
+        :param type: specify report_type like 'admin' or 'user'
+        :return: path to the new report or None if no rule has report_type
+        """
+        reports = self.get_report_types([report_type])
+        if not reports:
+            return None
+        return reports[0]
+
+    def get_top_groups(self):
+        """Function returns top-level Group nodes of Benchmark"""
+        return self.filter_children(self.target_tree, 'Group')
+
+    def _get_rule_groups(self):
+        """Function returns dictionary of rule ids and ids of their top-level groups"""
+        rule_groups = {}
+        for group in self.get_top_groups():
+            for rule in self.get_nodes(group, 'Rule', prefix='.//'):
+                rule_groups[rule.get('id', '')] = group.get('id')
+        return rule_groups
+
+    def get_group_results(self):
+        """
+        Function returns list of (group id, title, {result: count})
+        of top-level groups in document order
+        """
+        rule_groups = self._get_rule_groups()
+        counts = {}
+        for rule in self.get_all_result_rules():
+            group_id = rule_groups.get(rule.get('idref', ''))
+            if group_id is None:
+                continue
+            result = self.get_nodes_text(rule, 'result')
+            group_counts = counts.setdefault(group_id, {})
+            group_counts[result] = group_counts.get(result, 0) + 1
+        return [(x.get('id'), self.get_nodes_text(x, 'title'), counts.get(x.get('id'), {}))
+                for x in self.get_top_groups()]
+
+    def write_group_reports(self, reports):
+        """
+        Function writes a report for top-level groups, which contains
+        the group and results of its rules only
+
+        Rule results are classified in one pass, the document
+        in memory is left unchanged.
+
+        :param reports: list of (group id, path to the new report)
+        """
+        rule_groups = self._get_rule_groups()
+        group_ids = set([group_id for group_id, dummy_path in reports])
+        benchmark_children = list(self.target_tree)
+        # children of TestResult nodes for every group
+        test_results = []
+        for test_result in self.get_nodes(self.target_tree, 'TestResult'):
+            children = list(test_result)
+            group_children = dict([(x, []) for x in group_ids])
+            for child in children:
+                if child.tag == self.element_prefix + 'rule-result':
+                    group_id = rule_groups.get(child.get('idref'))
+                    if group_id in group_children:
+                        group_children[group_id].append(child)
+                    continue
+                for group_list in group_children.values():
+                    group_list.append(child)
+            test_results.append((test_result, children, group_children))
+
+        try:
+            for group_id, path in reports:
+                self.target_tree[:] = [x for x in benchmark_children
+                                       if x.tag != self.element_prefix + 'Group' or x.get('id') == group_id]
+                for test_result, dummy_children, group_children in test_results:
+                    test_result[:] = group_children[group_id]
+                self.write_xml(path=path, reload=False)
+        finally:
+            self.target_tree[:] = benchmark_children
+            for test_result, children, dummy_group_children in test_results:
+                test_result[:] = children
 
     def get_path(self):
         """Function return path to report"""
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+The module verifies installed packages like 'rpm -Va' does.
+
+File metadata are taken from RPM database by python rpm bindings
+and files of packages are verified by a pool of processes.
+Output has the same format as output of 'rpm -Va', so it can be used
+for rpm_Va.log common file.
+
+Dependencies of packages and %verifyscript scriptlets are not verified
+and file capabilities are not compared, so lines about unsatisfied
+dependencies are missing and the 'P' column is always '.'.
+
+The verifier forks a pool of processes, so it has to be started
+in a process without threads:
+
+python -m preup.rpm_verify rpm_Va.log
+"""
+
+from __future__ import unicode_literals
+import os
+import sys
+import pwd
+import grp
+import stat
+import hashlib
+import subprocess
+import multiprocessing
+import rpm
+
+from preup import settings
+
+# Values of rpmVerifyAttrs_e
+VERIFY_DIGEST = 1 << 0
+VERIFY_SIZE = 1 << 1
+VERIFY_LINKTO = 1 << 2
+VERIFY_USER = 1 << 3
+VERIFY_GROUP = 1 << 4
+VERIFY_MTIME = 1 << 5
+VERIFY_MODE = 1 << 6
+VERIFY_RDEV = 1 << 7
+
+# Values of rpmfileAttrs_e
+FILE_CONFIG = 1 << 0
+FILE_DOC = 1 << 1
+FILE_MISSINGOK = 1 << 3
+FILE_GHOST = 1 << 6
+FILE_LICENSE = 1 << 7
+FILE_README = 1 << 8
+FILE_PUBKEY = 1 << 11
+
+FILE_STATE_NORMAL = 0
+
+# Values of pgpHashAlgo_e
+DIGEST_ALGOS = {1: 'md5',
+                2: 'sha1',
+                8: 'sha256',
+                9: 'sha384',
+                10: 'sha512',
+                11: 'sha224',
+                }
+
+PRELINK = '/usr/sbin/prelink'
+
+_users = {}
+_groups = {}
+
+
+def get_user_name(uid):
+    """Function returns user name of uid or None"""
+    if uid not in _users:
+        try:
+            _users[uid] = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            _users[uid] = None
+    return _users[uid]
+
+
+def get_group_name(gid):
+    """Function returns group name of gid or None"""
+    if gid not in _groups:
+        try:
+            _groups[gid] = grp.getgrgid(gid).gr_name
+        except KeyError:
+            _groups[gid] = None
+    return _groups[gid]
+
+
+def to_text(value):
+    """Function returns header value as unicode string"""
+    if isinstance(value, bytes):
+        return value.decode(settings.defenc, 'replace')
+    return value
+
+
+def get_file_digest(file_name, algo, prelinked=False):
+    """
+    Function returns hex digest of file or None if file can not be read
+
+    Prelinked binaries are verified with digest of the original file
+    like rpm does.
+    """
+    hasher = hashlib.new(algo)
+    try:
+        if prelinked:
+            sp = subprocess.Popen([PRELINK, '-y', file_name],
+                                  stdout=subprocess.PIPE,
+                                  stderr=open(os.devnull, 'wb'))
+            f = sp.stdout
+        else:
+            f = open(file_name, 'rb')
+        try:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        finally:
+            f.close()
+        if prelinked and sp.wait() != 0:
+            return None
+    except (IOError, OSError):
+        return None
+    return hasher.hexdigest()
+
+
+def is_elf(file_name):
+    """Function returns True if file is ELF binary"""
+    try:
+        f = open(file_name, 'rb')
+        try:
+            return f.read(4) == b'\x7fELF'
+        finally:
+            f.close()
+    except IOError:
+        return False
+
+
+def get_packages():
+    """
+    Function returns file metadata of installed packages from RPM database
+
+    Each package is a tuple (digest algorithm, list of files).
+    Each file is a tuple (name, attributes, verify flags, mode, size,
+    mtime, digest, user, group, link, rdev, state).
+    """
+    ts = rpm.TransactionSet()
+    for hdr in ts.dbMatch():
+        names = hdr['filenames'] or []
+        if not names:
+            continue
+        try:
+            algo = DIGEST_ALGOS.get(hdr['filedigestalgo'] or 1, 'md5')
+            digests = hdr['filedigests']
+        except (KeyError, ValueError):
+            # rpm < 4.6 knows only MD5 digests
+            algo = 'md5'
+            digests = hdr['filemd5s']
+        files = list(zip([to_text(x) for x in names],
+                         hdr['fileflags'],
+                         hdr['fileverifyflags'],
+                         hdr['filemodes'],
+                         hdr['filesizes'],
+                         hdr['filemtimes'],
+                         [to_text(x) for x in digests],
+                         [to_text(x) for x in hdr['fileusername']],
+                         [to_text(x) for x in hdr['filegroupname']],
+                         [to_text(x) for x in hdr['filelinktos']],
+                         hdr['filerdevs'],
+                         hdr['filestates']))
+        yield (algo, files)
+
+
+def get_attr_char(attrs):
+    """Function returns a character describing file attributes"""
+    for flag, char in [(FILE_CONFIG, 'c'),
+                       (FILE_DOC, 'd'),
+                       (FILE_GHOST, 'g'),
+                       (FILE_LICENSE, 'l'),
+                       (FILE_PUBKEY, 'P'),
+                       (FILE_README, 'r')]:
+        if attrs & flag:
+            return char
+    return ' '
+
+
+def verify_file(algo, file_info):
+    """
+    Function verifies one file and returns line of 'rpm -Va' output
+    or None if the file is not changed.
+    """
+    name, attrs, flags, mode, size, mtime, digest, user, group, link, rdev, state = file_info
+    if state != FILE_STATE_NORMAL:
+        return None
+    attr_char = get_attr_char(attrs)
+    try:
+        st = os.lstat(name)
+    except OSError:
+        if attrs & (FILE_MISSINGOK | FILE_GHOST):
+            return None
+        return "missing   %s %s" % (attr_char, name)
+    mode &= 0xffff
+    # like rpm, checks are chosen by type of the file on disk
+    if stat.S_ISDIR(st.st_mode):
+        flags &= ~(VERIFY_DIGEST | VERIFY_SIZE | VERIFY_MTIME | VERIFY_LINKTO)
+    elif stat.S_ISLNK(st.st_mode):
+        flags &= ~(VERIFY_DIGEST | VERIFY_SIZE | VERIFY_MTIME | VERIFY_MODE)
+    elif not stat.S_ISREG(st.st_mode):
+        flags &= ~(VERIFY_DIGEST | VERIFY_SIZE | VERIFY_MTIME | VERIFY_LINKTO)
+    else:
+        flags &= ~VERIFY_LINKTO
+    if attrs & FILE_GHOST:
+        flags &= ~(VERIFY_DIGEST | VERIFY_SIZE | VERIFY_MTIME | VERIFY_LINKTO)
+
+    result = {}
+    if flags & VERIFY_SIZE:
+        result['S'] = st.st_size != size
+    if flags & VERIFY_MODE:
+        file_mode = st.st_mode
+        if attrs & FILE_GHOST:
+            # type of %ghost file is not known in advance
+            file_mode &= ~stat.S_IFMT(file_mode)
+            mode &= ~stat.S_IFMT(mode)
+        result['M'] = file_mode != mode
+    if flags & VERIFY_DIGEST and digest:
+        file_digest = get_file_digest(name, algo)
+        if file_digest is not None and file_digest != digest \
+                and os.path.exists(PRELINK) and is_elf(name):
+            file_digest = get_file_digest(name, algo, prelinked=True)
+        result['5'] = '?' if file_digest is None else file_digest != digest
+    if flags & VERIFY_RDEV:
+        if stat.S_ISCHR(st.st_mode) != stat.S_ISCHR(mode) or stat.S_ISBLK(st.st_mode) != stat.S_ISBLK(mode):
+            result['D'] = True
+        elif stat.S_ISCHR(mode) or stat.S_ISBLK(mode):
+            result['D'] = (st.st_rdev & 0xffff) != (rdev & 0xffff)
+    if flags & VERIFY_LINKTO:
+        try:
+            result['L'] = os.readlink(name) != link
+        except OSError:
+            result['L'] = '?'
+    if flags & VERIFY_USER:
+        result['U'] = get_user_name(st.st_uid) != user
+    if flags & VERIFY_GROUP:
+        result['G'] = get_group_name(st.st_gid) != group
+    if flags & VERIFY_MTIME:
+        result['T'] = int(st.st_mtime) != mtime
+
+    if not [x for x in result.values() if x]:
+        return None
+    verify_format = ''
+    for char in 'SM5DLUGTP':
+        value = result.get(char, False)
+        if value == '?':
+            verify_format += '?'
+        elif value:
+            verify_format += char
+        else:
+            verify_format += '.'
+    return "%s  %s %s" % (verify_format, attr_char, name)
+
+
+def verify_package(package):
+    """Function returns list of 'rpm -Va' lines for one package"""
+    algo, files = package
+    lines = []
+    for file_info in files:
+        line = verify_file(algo, file_info)
+        if line is not None:
+            lines.append(line)
+    return lines
+
+
+def write_verify_log(path, workers=None):
+    """
+    Function verifies all installed packages by workers processes
+    and writes the result to path in format of 'rpm -Va' output.
+
+    Returns number of written lines.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers)
+    count = 0
+    f = open(path, 'wb')
+    try:
+        for lines in pool.imap(verify_package, get_packages(), 16):
+            for line in lines:
+                f.write((line + '\n').encode(settings.defenc))
+                count += 1
+    finally:
+        f.close()
+        pool.close()
+        pool.join()
+    return count
+
+
+def get_verify_command(path):
+    """Function returns command which writes verify log to path by a new process"""
+    return [sys.executable, '-m', 'preup.rpm_verify', path]
+
+
+if __name__ == '__main__':
+    write_verify_log(sys.argv[1])
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+The module handles a persistent cache of rule results.
+
+Rules whose check script, XML definition and common log files
+did not change since the previous assessment are not executed again.
+Their rule-result is replayed from the cache instead.
+"""
+
+from __future__ import unicode_literals
+import os
+import json
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
+
+from xml.etree import ElementTree
+
+from preup import settings
+from preup.utils import get_file_content, write_to_file, check_or_create_temp_dir
+from preup.logger import log_message, logging
+from preup.log_cache import get_gathered_logs
+from preup.version import VERSION
+
+# Results which depend on the moment of execution are never cached
+NOT_CACHED_RESULTS = ['error', 'unknown', 'notchecked', 'notselected']
+
+
+def get_file_hash(file_name):
+    """Function returns sha1 hash of file content or empty string"""
+    hasher = sha1()
+    try:
+        f = open(file_name, 'rb')
+    except IOError:
+        return ''
+    try:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    finally:
+        f.close()
+    return hasher.hexdigest()
+
+
+class RuleCache(object):
+
+    """Class stores and replays rule-result nodes of unchanged rules"""
+
+    def __init__(self, cache_dir, common_dir, report_parser, prefix=""):
+        """
+        cache_dir is a directory where cached rules are stored
+        common_dir contains common log files used by check scripts
+        report_parser is ReportParser object with loaded content
+        prefix distinguishes 3rdparty contents
+        """
+        self.cache_dir = cache_dir
+        self.common_dir = common_dir
+        self.report_parser = report_parser
+        self.prefix = prefix
+        self.content_dir = os.path.dirname(report_parser.get_path())
+        self.keys = {}
+        self._log_hashes = {}
+        self._values = None
+        self._gathered = get_gathered_logs(common_dir)
+
+    def get_log_hash(self, file_name):
+        """Function returns sha1 hash of common log file, each log is hashed once"""
+        if file_name not in self._log_hashes:
+            self._log_hashes[file_name] = get_file_hash(os.path.join(self.common_dir, file_name))
+        return self._log_hashes[file_name]
+
+    def get_log_names(self, rule_id):
+        """
+        Function returns sorted common log files declared by rule_id
+        in common_logs or all common log files if it declares all of them.
+        Log files which were not gathered by the last assessment are skipped.
+        """
+        value_id = rule_id.replace(settings.xccdf_tag, 'xccdf_preupg_value_') + '_state_common_logs'
+        logs = self.get_values().get(value_id)
+        if logs is not None and logs.strip() != 'all':
+            return sorted(set([x.strip() for x in logs.split(',') if x.strip()]))
+        if not os.path.isdir(self.common_dir):
+            return []
+        return sorted([x for x in os.listdir(self.common_dir)
+                       if x.endswith('.log') and (self._gathered is None or x in self._gathered)])
+
+    def get_common_fingerprint(self, rule_id):
+        """Function returns fingerprint of common log files read by rule_id"""
+        hasher = sha1()
+        for file_name in self.get_log_names(rule_id):
+            hasher.update((file_name + self.get_log_hash(file_name)).encode(settings.defenc))
+        return hasher.hexdigest()
+
+    def get_values(self):
+        """Function returns dictionary with Value id and its text"""
+        if self._values is None:
+            self._values = {}
+            rp = self.report_parser
+            for values in rp.get_nodes(rp.target_tree, "Value", prefix='.//'):
+                self._values[values.get('id')] = ''.join([x.text or '' for x in rp.get_nodes(values, "value")])
+        return self._values
+
+    def get_key(self, rule):
+        """
+        Function returns cache key of Rule node
+
+        Key covers check script, Rule definition together with Values
+        exported to the check script and common log files declared
+        by the rule.
+        """
+        rp = self.report_parser
+        hasher = sha1()
+        hasher.update(VERSION.encode(settings.defenc))
+        hasher.update(ElementTree.tostring(rule, "utf-8"))
+        values = self.get_values()
+        for check in rp.get_nodes(rule, "check"):
+            for export in rp.get_nodes(check, "check-export"):
+                value_id = export.get('value-id', '')
+                hasher.update((value_id + values.get(value_id, '')).encode(settings.defenc))
+        for script in self.get_scripts(rule):
+            hasher.update(get_file_hash(script).encode(settings.defenc))
+        hasher.update(self.get_common_fingerprint(rule.get('id', '')).encode(settings.defenc))
+        return hasher.hexdigest()
+
+    def get_scripts(self, rule):
+        """Function returns paths to check scripts of Rule node"""
+        rp = self.report_parser
+        scripts = []
+        for check in rp.get_nodes(rule, "check"):
+            for ref in rp.get_nodes(check, "check-content-ref"):
+                scripts.append(os.path.join(self.content_dir, ref.get('href', '')))
+        return scripts
+
+    def has_side_effects(self, rule):
+        """
+        Function returns True if check scripts of Rule node may write
+        postupgrade.d scripts, kickstart files or other files under
+        VALUE_TMP_PREUPGRADE (like backup_config_file does), which are
+        removed with the previous assessment and can't be replayed
+        """
+        for script in self.get_scripts(rule):
+            try:
+                content = get_file_content(script, 'rb', decode_flag=False).lower()
+            except IOError:
+                return True
+            for side_effect in settings.rule_cache_side_effects:
+                if side_effect in content:
+                    return True
+        return False
+
+    def get_cache_file(self, rule_id):
+        return os.path.join(self.cache_dir, self.prefix + rule_id + '.json')
+
+    def get_solution_file(self, rule_id):
+        """Function returns full path to solution file of rule"""
+        values = self.get_values()
+        value_id = rule_id.replace(settings.xccdf_tag, 'xccdf_preupg_value_')
+        current_dir = values.get(value_id + '_state_current_directory')
+        solution = values.get(value_id + '_state_solution_file')
+        if not current_dir or not solution:
+            return None
+        return os.path.join(current_dir, solution)
+
+    def get_cached_results(self, list_rules):
+        """
+        Function returns cached entries for rules from list_rules
+        whose key did not change since they were stored.
+
+        Rules with side effects are never cached, see has_side_effects.
+        Format is: {rule_id: {'key': ..., 'rule_result': ..., 'solution': ...}}
+        """
+        cached = {}
+        for rule_id in list_rules:
+            rule = self.report_parser.get_rule(rule_id)
+            if rule is None or self.has_side_effects(rule):
+                continue
+            self.keys[rule_id] = self.get_key(rule)
+            try:
+                entry = json.loads(get_file_content(self.get_cache_file(rule_id), 'rb'))
+            except (IOError, ValueError):
+                continue
+            if entry.get('key') == self.keys[rule_id]:
+                cached[rule_id] = entry
+        return cached
+
+    def replay(self, cached):
+        """
+        Function restores solution files of cached rules and returns
+        their rule-result nodes
+        """
+        rule_results = []
+        for rule_id, entry in cached.items():
+            solution_file = self.get_solution_file(rule_id)
+            if solution_file and entry.get('solution') is not None:
+                try:
+                    write_to_file(solution_file, 'wb', entry['solution'])
+                except IOError:
+                    pass
+            rule_results.append(ElementTree.fromstring(entry['rule_result'].encode(settings.defenc)))
+        return rule_results
+
+    def store_results(self, tree):
+        """
+        Function stores rule-result nodes of executed rules
+        from tree, the root of XML result document
+        """
+        try:
+            check_or_create_temp_dir(self.cache_dir)
+        except (IOError, OSError):
+            log_message("Rule cache %s could not be updated" % self.cache_dir,
+                        print_output=0, level=logging.WARNING)
+            return
+        rp = self.report_parser
+        for rule in rp.filter_grandchildren(tree, "TestResult", "rule-result"):
+            rule_id = rule.get('idref')
+            if rule_id not in self.keys:
+                continue
+            if rp.get_nodes_text(rule, 'result') in NOT_CACHED_RESULTS:
+                continue
+            solution = None
+            solution_file = self.get_solution_file(rule_id)
+            if solution_file and os.path.exists(solution_file):
+                solution = get_file_content(solution_file, 'rb')
+            # tail belongs to the document, it is not stored
+            tail, rule.tail = rule.tail, None
+            entry = {'key': self.keys[rule_id],
+                     'rule_result': ElementTree.tostring(rule, "utf-8").decode(settings.defenc),
+                     'solution': solution,
+                     }
+            rule.tail = tail
+            write_to_file(self.get_cache_file(rule_id), 'wb', json.dumps(entry))
@@ -16,7 +16,7 @@ def compare_data(row):
                   'notapplicable': '08',
                   'notchecked': '09'}
     try:
-        dummy_title, dummy_rule_id, result = row.split(':')
+        dummy_title, dummy_rule_id, result = row.split(':')[:3]
     except ValueError:
         return '99'
     else:
@@ -33,18 +33,61 @@ def format_rules_to_table(output_data, content):
         return
     max_title_length = max(x for x in [len(l.split(':')[0]) for l in output_data]) + 5
     max_result_length = max(x for x in [len(l.split(':')[2]) for l in output_data]) + 2
+    # Rows can contain a state of the rule like executed or reused from cache
+    states = [l.split(':')[3] for l in output_data if len(l.split(':')) == 4]
+    max_state_length = 0
+    if states:
+        max_state_length = max(len(x) for x in states) + 2
     log_message(settings.result_text.format(content))
     message = '-' * (max_title_length + max_result_length + 4)
+    if max_state_length:
+        message += '-' * (max_state_length + 1)
     log_message(message)
     for data in sorted(output_data, key=compare_data, reverse=True):
         try:
-            title, dummy_rule_id, result = data.split(':')
+            fields = data.split(':')
+            title, dummy_rule_id, result = fields[:3]
+            if len(fields) > 4:
+                raise ValueError
         except ValueError:
             # data is not an information about processed test; let's log it as an error
             log_message(data, level=logging.ERROR)
         else:
-            log_message(u"|%s |%s|" % (title.ljust(max_title_length),
-                                      result.strip().ljust(max_result_length)))
+            row = u"|%s |%s|" % (title.ljust(max_title_length),
+                                 result.strip().ljust(max_result_length))
+            if max_state_length:
+                state = fields[3] if len(fields) == 4 else ''
+                row += u"%s|" % state.ljust(max_state_length)
+            log_message(row)
+    log_message(message)
+
+
+def format_timings_to_table(timings, count, content):
+    """
+    Function prints count of the slowest checks from timings to table
+
+    timings are in format returned by CheckProfiler.get_timings
+    """
+    if not timings or count < 1:
+        return
+    slowest = sorted(timings, key=lambda x: timings[x]['wall_time'], reverse=True)[:count]
+    max_title_length = max(len(timings[x]['title']) for x in slowest) + 5
+    header = u"|%s |%s|%s|%s|" % ('Check'.ljust(max_title_length),
+                                  'Wall [s]'.rjust(10),
+                                  'CPU [s]'.rjust(10),
+                                  'RSS [kB]'.rjust(10))
+    message = '-' * len(header)
+    log_message(settings.timings_text.format(content))
+    log_message(message)
+    log_message(header)
+    log_message(message)
+    for rule_id in slowest:
+        timing = timings[rule_id]
+        peak_rss = timing['peak_rss']
+        log_message(u"|%s |%10.3f|%10.3f|%10s|" % (timing['title'].ljust(max_title_length),
+                                                   timing['wall_time'],
+                                                   timing['cpu_time'],
+                                                   '-' if peak_rss is None else peak_rss))
     log_message(message)
 
 
@@ -54,6 +97,8 @@ class ScanProgress(object):
         self.total_count = total_count
         self.current_count = 0
         self.output_data = []
+        # index of row in output_data by rule id
+        self.rows = {}
         self.debug = debug
         self.names = {}
         self.list_names = []
@@ -88,6 +133,7 @@ class ScanProgress(object):
         except IndexError:
             self.width_size = 80
         xccdf_rule, dummy_result = stdout_data.strip().split(':')
+        self.rows[xccdf_rule] = len(self.output_data)
         self.output_data.append(u'{0}:{1}'.format(self.names[xccdf_rule],
                                                  stdout_data.strip()))
         self.current_count += 1
@@ -125,16 +171,38 @@ class ScanProgress(object):
         """Function gets an output data from oscap"""
         return self.output_data
 
-    def update_data(self, changed_fields):
-        """Function updates a data"""
+    def add_data(self, rule_id, result, state=None):
+        """Function adds a row for rule which was not reported by oscap"""
+        row = u'{0}:{1}:{2}'.format(self.names.get(rule_id, rule_id), rule_id, result)
+        if state:
+            row += u':' + state
+        self.rows[rule_id] = len(self.output_data)
+        self.output_data.append(row)
+
+    def mark_data(self, state):
+        """Function sets state to all rows without state"""
         for index, row in enumerate(self.output_data):
-            try:
-                title, rule_id, dummy_result = row.split(':')
-            except ValueError:
-                continue
-            else:
-                result_list = [x for x in changed_fields if rule_id in x]
-                if result_list:
-                    self.output_data[index] = u"%s:%s:%s" % (title,
-                                                            rule_id,
-                                                            result_list[0].split(':')[1])
+            if len(row.split(':')) == 3:
+                self.output_data[index] = u'{0}:{1}'.format(row.strip(), state)
+
+    def update_result(self, rule_id, result):
+        """Function changes result in a row of rule_id"""
+        try:
+            index = self.rows[rule_id]
+        except KeyError:
+            return
+        fields = self.output_data[index].split(':')
+        if len(fields) < 3:
+            return
+        fields[2] = result
+        self.output_data[index] = u":".join(fields)
+
+    def update_data(self, changed_fields):
+        """
+        Function updates a data
+
+        changed_fields is a list of 'rule_id:result' strings
+        """
+        for changed in changed_fields:
+            rule_id, result = changed.split(':')[:2]
+            self.update_result(rule_id, result)
@@ -24,17 +24,17 @@ These functions are available:
 * get_dest_dir -- get dir for storing configuration files
 * set_component -- set component's name (for logging purposes)
 * exit_* -- terminate execution with appropriate exit code
+
+The module is imported by every python check, so only os, sys and re
+are imported eagerly and only environment variables are read on import.
+Other modules and the configuration file are loaded on first use,
+see get_pa_configuration().
 """
 
 from __future__ import unicode_literals, print_function
 import os
 import sys
 import re
-import shutil
-import ConfigParser
-
-from preup import utils, settings
-from preup.utils import get_file_content, write_to_file
 
 __all__ = (
     'log_debug',
@@ -64,8 +64,13 @@ __all__ = (
     'solution_file',
     'switch_to_content',
     'service_is_enabled',
+    'is_file_rpm_tracked',
+    'is_executable_tracked',
+    'files_under',
     'is_dist_native',
     'get_dist_native_list',
+    'classify_dist_native',
+    'get_pa_configuration',
 
     'PREUPGRADE_CACHE',
     'VALUE_RPM_QA',
@@ -95,7 +100,6 @@ __all__ = (
 
 CACHE = "/var/cache/preupgrade"
 PREUPGRADE_CACHE = os.path.join(CACHE, "common")
-PREUPGRADE_CONFIG = settings.PREUPG_CONFIG_FILE
 VALUE_RPM_QA = os.path.join(PREUPGRADE_CACHE, "rpm_qa.log")
 VALUE_ALLCHANGED = os.path.join(PREUPGRADE_CACHE, "rpm_Va.log")
 VALUE_CONFIGCHANGED = os.path.join(PREUPGRADE_CACHE, "rpm_etc_Va.log")
@@ -129,14 +133,28 @@ KICKSTART_README = os.path.join(KICKSTART_DIR, "README")
 COMMON_DIR = os.path.join(os.environ['XCCDF_VALUE_REPORT_DIR'], "common")
 
 
+# filled from the configuration file by get_pa_configuration()
 HOME_DIRECTORY_FILE = ""
 USER_CONFIG_FILE = 0
+_pa_configuration = None
 
 PREUPG_API_VERSION=1
 
 component = "unknown"
 
 
+def get_file_content(path, perms, method=False, decode_flag=True):
+    """shortcut for preup.utils.get_file_content imported on first use"""
+    from preup.utils import get_file_content as utils_get_file_content
+    return utils_get_file_content(path, perms, method, decode_flag)
+
+
+def write_to_file(path, perms, data, encode_flag=True):
+    """shortcut for preup.utils.write_to_file imported on first use"""
+    from preup.utils import write_to_file as utils_write_to_file
+    return utils_write_to_file(path, perms, data, encode_flag)
+
+
 ################
 # RISK LOGGING #
 ################
@@ -145,6 +163,7 @@ def log_risk(severity, message):
     """
     log risk level to stderr
     """
+    from preup import settings
     print("INPLACERISK: %s: %s\n" % (severity, message.encode(settings.defenc)), end="", file=sys.stderr)
 
 
@@ -193,6 +212,7 @@ def log(severity, message, component_arg=None):
     """log message to stdout"""
     global component
     comp_show = component_arg or component
+    from preup import settings
     print("%s %s: %s\n" % (severity, comp_show, message.encode(settings.defenc)), end="", file=sys.stdout)
 
 
@@ -334,22 +354,44 @@ def switch_to_content():
 
 
 def is_pkg_installed(pkg_name):
-    lines = get_file_content(VALUE_RPM_QA, "rb", True)
-    found = [x for x in lines if x.startswith(pkg_name)]
-    if found:
-        return True
-    else:
-        return False
+    from preup import fact_store
+    return fact_store.has_line_prefix(VALUE_RPM_QA, pkg_name)
+
+
+def is_pkg_name_installed(pkg_name):
+    """Returns True if package with exactly given name is installed"""
+    from preup import fact_store
+    return fact_store.has_line_prefix(VALUE_RPM_QA, pkg_name + '\t')
+
+
+def is_file_rpm_tracked(file_name):
+    """Returns True if file_name is owned by any installed package"""
+    from preup import fact_store
+    return fact_store.has_line(VALUE_RPMTRACKEDFILES, file_name)
+
+
+def is_executable_tracked(file_name):
+    """Returns True if file_name is listed in VALUE_EXECUTABLES"""
+    from preup import fact_store
+    return fact_store.has_line(VALUE_EXECUTABLES, file_name)
+
+
+def files_under(directory, log_file=VALUE_ALLMYFILES):
+    """
+    Returns list of files from log_file (VALUE_ALLMYFILES by default)
+    which are stored under directory
+    """
+    from preup import fact_store
+    prefix = directory.rstrip('/') + '/'
+    return fact_store.get_lines_with_prefix(log_file, prefix)
 
 
 def check_applies_to(check_applies=""):
     not_applicable = 0
     if check_applies != "":
         rpms = check_applies.split(',')
-        lines = get_file_content(VALUE_RPM_QA, "rb", True)
         for rpm in rpms:
-            lst = filter(lambda x: rpm == x.split('\t')[0], lines)
-            if not lst:
+            if not is_pkg_name_installed(rpm):
                 log_info("Package %s is not installed" % rpm)
                 not_applicable = 1
     if not_applicable:
@@ -361,14 +403,13 @@ def check_rpm_to(check_rpm="", check_bin=""):
 
     if check_rpm != "":
         rpms = check_rpm.split(',')
-        lines = get_file_content(VALUE_RPM_QA, "rb", True)
         for rpm in rpms:
-            lst = filter(lambda x: rpm == x.split('\t')[0], lines)
-            if not lst:
+            if not is_pkg_name_installed(rpm):
                 log_info("Package %s is not installed" % rpm)
                 not_applicable = 1
 
     if check_bin != "":
+        from preup import utils
         binaries = check_bin.split(',')
         for binary in binaries:
             cmd = "which %s" % binary
@@ -380,12 +421,26 @@ def check_rpm_to(check_rpm="", check_bin=""):
 
 
 def solution_file(message):
-    write_to_file(os.path.join(os.environ['CURRENT_DIRECTORY'], SOLUTION_FILE), "a+b", message)
+    f = open(os.path.join(os.environ['CURRENT_DIRECTORY'], SOLUTION_FILE), "a+b")
+    try:
+        if not isinstance(message, bytes):
+            from preup import settings
+            message = message.encode(settings.defenc)
+        f.write(message)
+    finally:
+        f.close()
 
 
 def service_is_enabled(service_name):
     """Returns true if given service is enabled on any runlevel"""
     return_value = False
+    if not re.search(r'[][.^$*+?{}\\|()]', service_name):
+        # service name is not a regular expression so index can be used
+        from preup import fact_store
+        for line in fact_store.get_lines_with_prefix(VALUE_CHKCONFIG, service_name):
+            if ':on' in line[len(service_name):]:
+                return True
+        return return_value
     lines = get_file_content(VALUE_CHKCONFIG, "rb", True)
     for line in lines:
         if re.match('^%s.*:on' % service_name, line):
@@ -416,6 +471,7 @@ def config_file_changed(config_file_name):
 
 def backup_config_file(config_file_name):
     """Copies specified file into VALUE_TMP_PREUPGRADE, keeping file structure"""
+    import shutil
     try:
         # report error if file doesn't exist
         if not os.path.isfile(config_file_name):
@@ -444,61 +500,128 @@ def is_dist_native(pkg):
     DIST_NATIVE = path_to_file: return True if package is in file else return False
     """
 
-    rpm_qa = get_file_content(VALUE_RPM_QA, "rb", True)
-    found = [x for x in rpm_qa if x.startswith(pkg)]
-    if not found:
+    from preup import fact_store
+    if not is_pkg_installed(pkg):
         log_warning("Package %s is not installed on Red Hat Enterprise Linux system.")
         return False
 
-    rpm_signed = get_file_content(VALUE_RPM_RHSIGNED, "rb", True)
     if int(DEVEL_MODE) == 0:
-        found = [x for x in rpm_signed if x.startswith(pkg)]
-        if found:
-            return True
-        else:
-            return False
+        return fact_store.has_line_prefix(VALUE_RPM_RHSIGNED, pkg)
     else:
         if DIST_NATIVE == "all":
             return True
         if DIST_NATIVE == "sign":
-            found = [x for x in rpm_signed if x.startswith(pkg)]
-            if found:
-                return True
-            else:
-                return False
+            return fact_store.has_line_prefix(VALUE_RPM_RHSIGNED, pkg)
         if os.path.exists(DIST_NATIVE):
-            list_native = get_file_content(DIST_NATIVE)
+            list_native = get_file_content(DIST_NATIVE, "rb")
             if pkg in list_native:
                 return True
         return False
 
 
+def get_dist_native_mode():
+    """
+    returns DIST_NATIVE mode used by is_dist_native:
+    'sign', 'all' or 'list' (DIST_NATIVE is path to file)
+    """
+    if int(DEVEL_MODE) == 0 or DIST_NATIVE == "sign":
+        return "sign"
+    if DIST_NATIVE == "all":
+        return "all"
+    return "list"
+
+
+def _get_file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_size, int(stat.st_mtime)]
+
+
+_dist_native = None
+
+
+def classify_dist_native():
+    """
+    returns dictionary with all installed packages and their classification
+    under all DIST_NATIVE modes, e.g.
+    {'bash': {'sign': True, 'all': True, 'list': False}}
+
+    Classification is computed in one pass over rpm_qa.log and
+    rpm_rhsigned.log and it is stored in cache directory, so other
+    checks in the same assessment reuse it.
+    """
+    import json
+    import bisect
+    global _dist_native
+    if _dist_native is not None:
+        return _dist_native
+    signature = [_get_file_signature(VALUE_RPM_QA),
+                 _get_file_signature(VALUE_RPM_RHSIGNED),
+                 DIST_NATIVE,
+                 _get_file_signature(DIST_NATIVE)]
+    from preup import settings
+    cache_file = os.path.join(PREUPGRADE_CACHE, settings.dist_native_name)
+    try:
+        cached = json.loads(get_file_content(cache_file, "rb"))
+        if cached['signature'] == signature:
+            _dist_native = cached['packages']
+            return _dist_native
+    except (IOError, ValueError, KeyError, TypeError):
+        pass
+
+    pkgs = [i.split("\t")[0] for i in get_file_content(VALUE_RPM_QA, "rb", True)]
+    rpm_signed = sorted(get_file_content(VALUE_RPM_RHSIGNED, "rb", True))
+    list_native = None
+    if DIST_NATIVE not in ("sign", "all") and os.path.exists(DIST_NATIVE):
+        list_native = get_file_content(DIST_NATIVE, "rb")
+    _dist_native = {}
+    for pkg in pkgs:
+        # the first signed line not lower than pkg starts with pkg if any does
+        position = bisect.bisect_left(rpm_signed, pkg)
+        signed = position < len(rpm_signed) and rpm_signed[position].startswith(pkg)
+        _dist_native[pkg] = {'sign': signed,
+                             'all': True,
+                             'list': list_native is not None and pkg in list_native,
+                             }
+    try:
+        write_to_file(cache_file, "wb", json.dumps({'signature': signature,
+                                                    'packages': _dist_native}))
+    except IOError:
+        pass
+    return _dist_native
+
+
 def get_dist_native_list():
     """
     returns list of all installed native packages
     """
 
     native_pkgs = []
-    tmp = get_file_content(VALUE_RPM_QA, "rb", True)
-    pkgs = [i.split("\t")[0] for i in tmp]
+    mode = get_dist_native_mode()
+    classification = classify_dist_native()
+    pkgs = [i.split("\t")[0] for i in get_file_content(VALUE_RPM_QA, "rb", True)]
     for pkg in pkgs:
-        if(is_dist_native(pkg) is True):
+        if classification[pkg][mode]:
             native_pkgs.append(pkg)
     return native_pkgs
 
 
 def load_pa_configuration():
     """ Loads preupgrade-assistant configuration file """
+    import ConfigParser
+    from preup import settings
     global HOME_DIRECTORY_FILE
     global USER_CONFIG_FILE
-    global RH_SIGNED_PKGS
+    global _pa_configuration
 
-    if not os.path.exists(PREUPGRADE_CONFIG):
+    if not os.path.exists(settings.PREUPG_CONFIG_FILE):
         log_error("Configuration file $PREUPGRADE_CONFIG is missing or is not readable!")
         exit_error()
 
     config = ConfigParser.RawConfigParser(allow_no_value=True)
-    config.read(PREUPGRADE_CONFIG)
+    config.read(settings.PREUPG_CONFIG_FILE)
     section = 'preupgrade-assistant'
     home_option = 'home_directory_file'
     user_file = 'user_config_file'
@@ -507,21 +630,37 @@ def load_pa_configuration():
             HOME_DIRECTORY_FILE = config.get(section, home_option)
         if config.has_option(section, user_file):
             USER_CONFIG_FILE = config.get(section, user_file)
+    _pa_configuration = {'home_directory_file': HOME_DIRECTORY_FILE,
+                         'user_config_file': USER_CONFIG_FILE,
+                         }
+
+
+def get_pa_configuration():
+    """
+    get_pa_configuration() -> dict
+
+    returns options home_directory_file and user_config_file
+    of preupgrade-assistant configuration file, which is read
+    on the first call only
+    """
+    if _pa_configuration is None:
+        load_pa_configuration()
+    return _pa_configuration
 
 
 def print_home_dirs(user_name=""):
     """ Loads preupgrade-assistant configuration file """
-    if not os.path.exists(PREUPGRADE_CONFIG):
-        log_error("Configuration file $PREUPGRADE_CONFIG is missing or is not readable!")
-        exit_error()
+    import ConfigParser
+    from preup import settings
+    configuration = get_pa_configuration()
 
     config = ConfigParser.RawConfigParser(allow_no_value=True)
     home_option = 'home-dirs'
     try:
-        if USER_CONFIG_FILE == 'enabled' and user_name == "":
-            config.read(PREUPGRADE_CONFIG)
+        if configuration['user_config_file'] == 'enabled' and user_name == "":
+            config.read(settings.PREUPG_CONFIG_FILE)
             return config.options(home_option)
-        user_home_dir = os.path.join('/home', user_name, HOME_DIRECTORY_FILE)
+        user_home_dir = os.path.join('/home', user_name, configuration['home_directory_file'])
         if not os.path.exists(user_home_dir):
             return 0
         config.read(user_home_dir)
@@ -532,6 +671,4 @@ def print_home_dirs(user_name=""):
         pass
 
 
-load_pa_configuration()
-
 shorten_envs()
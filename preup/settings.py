@@ -28,6 +28,21 @@ tarball_name = tarball_prefix + tarball_base + "-{0}"
 
 xml_result_name = result_name + '.xml'
 html_result_name = result_name + '.html'
+# split report layout, index page and a page of each top-level group
+report_index_name = result_name + '-index.html'
+report_group_prefix = result_name + '-group-'
+
+# number of output lines of a command kept in memory for error reporting
+subprocess_tail = 20
+
+# file with wall time, CPU time and peak RSS of each check
+timings_name = "timings.json"
+# file with inplace risks of each check extracted from XML result
+risks_name = "risks.json"
+# file with the highest inplace risk used by risk check of upgrade tool
+risk_summary_name = "risk_summary"
+# namespace of timing attributes stored in rule-result nodes of XML result
+profiling_ns = "http://preupgrade-assistant.org/profiling"
 
 # base name of custom xsl stylesheet
 xsl_sheet = "preup.xsl"
@@ -39,6 +54,14 @@ source_dir = os.path.join(share_dir, prefix)
 # dir where the cached logs are stored
 cache_dir = "/var/cache/preupgrade"
 
+# name of dir under cache_dir where results of unchanged rules are stored
+rule_cache_name = "rules"
+# check scripts mentioning these directories or functions are never cached,
+# files they write (postupgrade.d scripts, kickstart files, backed up
+# configuration under VALUE_TMP_PREUPGRADE) are not part of cached results
+rule_cache_side_effects = [b'postupgrade', b'kickstart', b'tmp_preupgrade', b'/root/preupgrade',
+                           b'backup_config_file', b'cleanconf', b'dirtyconf']
+
 # file where the lock file stored
 lock_file = "/var/run/preupgrade.pid"
 
@@ -72,6 +95,45 @@ common_dir = os.path.join(share_dir, prefix, common_name)
 # path to file with definitions of common scripts
 common_script = os.path.join(common_dir, "scripts.txt")
 
+# prefix of field in scripts.txt with log files the command depends on
+common_depends = "depends:"
+
+# number of common scripts executed in parallel
+common_workers = 4
+
+# number of HTML reports generated in parallel
+generate_workers = 4
+
+# command from scripts.txt which is replaced by preup.rpm_verify
+# if native_rpm_verify is enabled in PREUPG_CONFIG_FILE
+rpm_verify_command = "rpm -Va"
+
+# suffix of sorted index of common log file, see preup.fact_store
+index_suffix = ".sorted"
+
+# Unix socket of preup.fact_server in result directory
+fact_socket_name = "facts.sock"
+
+# common logs which are indexed for lookups from script_api
+indexed_logs = ['rpm_qa.log', 'rpm_rhsigned.log', 'chkconfig.log',
+                'allmyfiles.log', 'rpmtrackedfiles.log', 'executable.log']
+
+# file in common dir with classification of native packages, see script_api
+dist_native_name = "dist_native.json"
+
+# file in common dir with fingerprints of inputs of gathered log files
+log_cache_name = "fingerprints.json"
+
+# file in common dir with log files gathered by the last assessment
+gathered_logs_name = "gathered.json"
+
+# common logs which are reused while RPM database is not changed
+rpmdb_logs = ['rpm_qa.log', 'rpm_rhsigned.log', 'rpmtrackedfiles.log']
+
+# common logs which are reused while neither RPM database
+# nor files tracked by RPM are changed
+rpm_verify_logs = ['rpm_Va.log', 'rpm_etc_Va.log']
+
 # Addons dir for 3rdparty contents
 add_ons = "3rdparty"
 
@@ -130,9 +192,9 @@ warning_text = "The Preupgrade Assistant is a diagnostics tool \n" \
                "and does not perform the actual upgrade.\n"
 assessment_text = "Assessment of the system, running checks / SCE scripts"
 result_text = "Result table with checks and their results for {0}:"
+timings_text = "The slowest checks for {0}:"
 message = "We found some potential in-place upgrade risks.\n" \
           "Read the full report file {0} for more details."
-converter_message = "At least one of these converters ({0}) needs to be installed."
 kickstart_text = "The Preupgrade Assistant generates a kickstart file in %s.\n" \
                  "The Kickstart file contains:\n" \
                  "- users with UID/GID which you should create on Red Hat Enterprise Linux 7 system.\n" \
@@ -144,10 +206,6 @@ kickstart_text = "The Preupgrade Assistant generates a kickstart file in %s.\n"
 options_not_allowed = "Options --mode and --select-rules are not allowed together.\n"
 list_rules = "List of all available rules:\n%s\n"
 unknown_rules = "These rules does not exist:\n%s\n"
-text_converters = {'w3m': '{0} -T text/html -dump {1} > {2}',
-                   'lynx': '{0} -nonumbers -nolist -force_html -dump -nolist -width=255 {1} > {2}',
-                   'elinks': '{0} --no-references -dump-width 255 --no-numbering -dump {1} > {2}',
-                   }
 
 ui_command = "preupg -u http://127.0.0.1:8099/submit/ -r {0}"
 openssl_command = "openssl x509 -text -in {0} | grep -A1 1.3.6.1.4.1.2312.9.1"
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+The module writes text form of assessment reports.
+
+Text is rendered from the result document of ReportParser in memory,
+so no HTML report and no text browser like w3m or lynx are needed.
+All report variants are written in one pass over rule results.
+"""
+
+from __future__ import unicode_literals
+import re
+
+from preup import settings
+from preup.xml_manager import MARKER_RE
+
+RULE_PREFIX = 'xccdf_preupg_rule_'
+# markup which is left in descriptions by ReportParser.update_check_description
+TAG_RE = re.compile(r'<[^>]+>')
+WIDTH = 79
+
+
+def get_element_text(element):
+    """Function returns text of element including texts of its children"""
+    texts = [element.text or '']
+    for child in element:
+        texts.append(get_element_text(child))
+        texts.append(child.tail or '')
+    return ''.join(texts)
+
+
+def get_text_lines(text, indent='    ', strip_tags=True):
+    """Function returns stripped non-empty lines of text, indented by indent"""
+    if strip_tags:
+        text = TAG_RE.sub('', text)
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            lines.append(indent + line)
+    return lines
+
+
+def get_solution_lines(fixtext, solution_texts):
+    """
+    Function returns lines of solution, markers in fixtext
+    are replaced by texts of solution files
+
+    :param solution_texts: dictionary of solution_text markers
+                           and lines of solution files
+    """
+    lines = []
+    for line in fixtext.splitlines():
+        markers = MARKER_RE.findall(line)
+        if not markers:
+            lines.extend(get_text_lines(line))
+            continue
+        for marker in markers:
+            # solution_text marker is a suffix of marker in content
+            suffixes = [marker[index:] for index, char in enumerate(marker) if char == '_'] + ['']
+            for suffix in suffixes:
+                if suffix + '_SOLUTION_MSG' in solution_texts:
+                    lines.extend(get_text_lines(''.join(solution_texts[suffix + '_SOLUTION_MSG']),
+                                                strip_tags=False))
+                    break
+    return lines
+
+
+def get_title(text, underline):
+    """Function returns title underlined by underline character"""
+    return [text, underline * len(text)]
+
+
+def get_rule_title(report_parser, rule_id):
+    """Function returns title of rule_id or rule_id without prefix"""
+    rule = report_parser.get_rule(rule_id)
+    if rule is not None:
+        title = report_parser.get_nodes_text(rule, 'title')
+        if title:
+            return title
+    return rule_id.replace(RULE_PREFIX, '')
+
+
+def get_rule_lines(report_parser, rule_result, solution_texts):
+    """Function returns lines of rule_result section in text report"""
+    rule_id = rule_result.get('idref', '')
+    rule = report_parser.get_rule(rule_id)
+    lines = get_title(get_rule_title(report_parser, rule_id), '-')
+    lines.append('Rule:   %s' % rule_id.replace(RULE_PREFIX, ''))
+    lines.append('Result: %s' % report_parser.get_nodes_text(rule_result, 'result'))
+    risks = report_parser.get_rule_risks(rule_id)
+    if risks:
+        lines.append('Risks:')
+        lines.extend(['    %s: %s' % (level, message) for level, message in risks])
+    if rule is not None:
+        description = report_parser.get_child(rule, 'description')
+        if description is not None:
+            description_lines = get_text_lines(get_element_text(description))
+            if description_lines:
+                lines.append('Description:')
+                lines.extend(description_lines)
+        fixtext = report_parser.get_child(rule, 'fixtext')
+        if fixtext is not None:
+            solution_lines = get_solution_lines(get_element_text(fixtext), solution_texts)
+            if solution_lines:
+                lines.append('Solution:')
+                lines.extend(solution_lines)
+    lines.append('')
+    return lines
+
+
+def write_text_reports(report_parser, text_reports, solution_texts=None):
+    """
+    Function writes text reports of the document in report_parser
+
+    :param text_reports: list of (path, report_type), report with
+                         report_type None contains all assessed rules,
+                         otherwise only rules of that result_part
+    :param solution_texts: list of (solution_text marker, lines of solution file)
+                           returned by XmlManager.get_solution_texts
+    """
+    solution_texts = dict(solution_texts or [])
+    result_parts = report_parser.get_result_parts()
+    rule_results = []
+    for rule_result in report_parser.get_all_result_rules():
+        # rules which were not selected are not part of the assessment
+        if report_parser.get_nodes_text(rule_result, 'result') == 'notselected':
+            continue
+        rule_id = rule_result.get('idref', '')
+        rule_results.append((rule_result, result_parts.get(rule_id.replace(RULE_PREFIX, ''))))
+
+    outputs = []
+    try:
+        for path, report_type in text_reports:
+            outputs.append((open(path, 'wb'), report_type))
+
+        def write(lines, rule_type=None, all_reports=False):
+            data = ''.join([line + '\n' for line in lines]).encode(settings.defenc)
+            for output, report_type in outputs:
+                if all_reports or report_type is None or report_type == rule_type:
+                    output.write(data)
+
+        header = get_title('Preupgrade Assistant', '=')
+        header.append(report_parser.get_nodes_text(report_parser.target_tree, 'title'))
+        for test_result in report_parser.get_nodes(report_parser.target_tree, 'TestResult'):
+            target = report_parser.get_nodes_text(test_result, 'target')
+            if target:
+                header.append('Target: %s' % target)
+            for attr, label in [('start-time', 'Start'), ('end-time', 'End')]:
+                if test_result.get(attr):
+                    header.append('%s: %s' % (label, test_result.get(attr)))
+        header.append('')
+        header.extend(get_title('Rule results', '='))
+        write(header, all_reports=True)
+        for rule_result, rule_type in rule_results:
+            title = get_rule_title(report_parser, rule_result.get('idref', ''))
+            result = report_parser.get_nodes_text(rule_result, 'result')
+            write([('%-18s %s' % (result, title))[:WIDTH]], rule_type)
+        write([''], all_reports=True)
+        for rule_result, rule_type in rule_results:
+            write(get_rule_lines(report_parser, rule_result, solution_texts), rule_type)
+    finally:
+        for output, dummy_report_type in outputs:
+            output.close()
@@ -2,6 +2,7 @@
 from __future__ import print_function, unicode_literals
 import six
 import datetime
+import collections
 import re
 import subprocess
 import fnmatch
@@ -10,7 +11,7 @@ import sys
 import shutil
 import ConfigParser
 
-from preup import settings
+from preup import settings, fact_store
 from preup.logger import log_message, logging
 
 from os import path, access, W_OK, R_OK, X_OK
@@ -123,31 +124,61 @@ def print_error_msg(title="", msg="", level=' ERROR '):
     print (title, ''.join(msg))
 
 
-def run_subprocess(cmd, output=None, print_output=False, shell=False, function=None):
-    """wrapper for Popen"""
-    sp = subprocess.Popen(cmd,
-                          stdout=subprocess.PIPE,
-                          stderr=subprocess.STDOUT,
-                          shell=shell,
-                          bufsize=1)
-    stdout = six.binary_type() # FIXME should't be this bytes()?
-    for stdout_data in iter(sp.stdout.readline, b''):
-        # communicate() method buffers everything in memory, we will read stdout directly
-        stdout += stdout_data
-        if function is None:
-            if print_output:
-                print (stdout_data, end="")
-        else:
-            # I don't know what functions can come here, however
-            # it's not common so put only unicode data here again.
-            # Should be always raw data so we don't need test stdout_data
-            # on type
-            function(stdout_data.decode(settings.defenc))
-    sp.communicate()
-
+def run_subprocess(cmd, output=None, print_output=False, shell=False, function=None,
+                   process_function=None, stderr_output=None):
+    """
+    wrapper for Popen
+
+    Output of the command is written to output file as it arrives.
+    Only last settings.subprocess_tail lines are kept in memory
+    and logged in case the command fails.
+    stderr of the command is written to stderr_output file if it is set,
+    otherwise it is mixed with stdout.
+    process_function is called with Popen object once the command is started
+    """
+    stdout_file = None
+    stderr_file = None
     if output is not None:
-        # raw data, so without encoding
-        write_to_file(output, "wb", stdout, False)
+        stdout_file = open(output, 'wb')
+    try:
+        if stderr_output is not None:
+            stderr_file = open(stderr_output, 'wb')
+        sp = subprocess.Popen(cmd,
+                              stdout=subprocess.PIPE,
+                              stderr=stderr_file or subprocess.STDOUT,
+                              shell=shell,
+                              bufsize=1)
+        if process_function is not None:
+            process_function(sp)
+        tail = collections.deque(maxlen=settings.subprocess_tail)
+        for stdout_data in iter(sp.stdout.readline, b''):
+            # communicate() method buffers everything in memory, we will read stdout directly
+            tail.append(stdout_data)
+            if stdout_file is not None:
+                # raw data, so without encoding
+                stdout_file.write(stdout_data)
+            if function is None:
+                if print_output:
+                    print (stdout_data, end="")
+            else:
+                # I don't know what functions can come here, however
+                # it's not common so put only unicode data here again.
+                # Should be always raw data so we don't need test stdout_data
+                # on type
+                function(stdout_data.decode(settings.defenc))
+        sp.communicate()
+    finally:
+        for file_object in (stdout_file, stderr_file):
+            if file_object is not None:
+                file_object.close()
+
+    if sp.returncode != 0 and tail:
+        log_message("Command '%s' returned %d, the last lines of its output:\n%s" % (
+                    cmd if isinstance(cmd, six.string_types) else ' '.join(cmd),
+                    sp.returncode,
+                    b''.join(tail).decode(settings.defenc, 'replace')),
+                    print_output=0,
+                    level=logging.DEBUG)
     return sp.returncode
 
 
@@ -375,11 +406,6 @@ def get_needs_action():
     return settings.needs_action
 
 
-def get_convertors():
-    """Function returns list of supported convertors"""
-    return settings.text_converters.keys()
-
-
 def get_variant():
     """Function return a variant"""
     redhat_release = get_file_content("/etc/redhat-release", "rb")
@@ -448,6 +474,9 @@ def remove_home_issues():
             lines = get_file_content(f, 'rb', method=True)
             lines = [l for l in lines if not l.startswith('/home')]
             write_to_file(f, 'wb', lines)
+            # mtime of the log may stay the same, so index is rebuilt explicitly
+            if os.path.exists(fact_store.get_index_path(f)):
+                fact_store.build_index(f)
         except IOError:
             pass
 
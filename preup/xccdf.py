@@ -1,15 +1,26 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import unicode_literals
+import os
 import re
 import six
+import json
 from operator import itemgetter
 from xml.etree import ElementTree
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
 
-from preup import utils
+from preup import settings
 from preup.logger import log_message
+from preup.utils import get_file_content, write_to_file
 
 XMLNS = "{http://checklists.nist.gov/xccdf/1.2}"
+RISK_REGEX = re.compile(r"INPLACERISK: (?P<level>\w+): (?P<message>.+)")
+RISK_LEVELS = ['NONE', 'SLIGHT', 'MEDIUM', 'HIGH', 'EXTREME']
+# keys of risk summary file in the order they are written
+RISK_SUMMARY_KEYS = ['risk'] + [x.lower() for x in RISK_LEVELS] + ['mtime', 'size', 'sha1']
 
 
 def list_groups(xccdf_file):
@@ -55,45 +66,221 @@ def get_check_import_inplace_risk(tree):
     Function returns implace risks
     """
     inplace_risk = []
-    risk_regex = "INPLACERISK: (?P<level>\w+): (?P<message>.+)"
     for check in tree.findall(".//" + XMLNS + "check-import"):
         if not check.text:
             continue
         lines = check.text.strip().split('\n')
         for line in lines:
-            match = re.match(risk_regex, line)
-            if match:
+            if RISK_REGEX.match(line):
                 inplace_risk.append(line)
     return inplace_risk
 
 
+def get_rule_risks(rule):
+    """Function returns list of [level, message] of inplace risks in rule"""
+    return [list(RISK_REGEX.match(line).groups()) for line in get_check_import_inplace_risk(rule)]
+
+
+def get_risk_lines(risks):
+    """Function returns INPLACERISK lines of [level, message] risks"""
+    return ['INPLACERISK: %s: %s' % (level, message) for level, message in risks]
+
+
+def get_result_file_path(xccdf_file, name):
+    """
+    Function returns path to file name which belongs to xccdf_file,
+    e.g. risks.json for result.xml and 3rdparty_risks.json
+    for 3rdparty_result.xml
+    """
+    dir_name, file_name = os.path.split(xccdf_file)
+    if file_name.endswith(settings.xml_result_name):
+        file_name = file_name[:-len(settings.xml_result_name)]
+    else:
+        file_name = os.path.splitext(file_name)[0] + '_'
+    return os.path.join(dir_name, file_name + name)
+
+
+def get_risks_path(xccdf_file):
+    """Function returns path to file with risks of xccdf_file"""
+    return get_result_file_path(xccdf_file, settings.risks_name)
+
+
+def get_risk_summary_path(xccdf_file):
+    """Function returns path to file with risk summary of xccdf_file"""
+    return get_result_file_path(xccdf_file, settings.risk_summary_name)
+
+
+def get_file_hash(file_name):
+    """Function returns SHA1 of file_name content"""
+    hasher = sha1()
+    f = open(file_name, 'rb')
+    try:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    finally:
+        f.close()
+    return hasher.hexdigest()
+
+
+def write_risks(xccdf_file, risks):
+    """
+    Function stores risks of xccdf_file into JSON file next to it
+
+    risks is a list of [idref of rule-result, [[level, message], ...]]
+    """
+    write_to_file(get_risks_path(xccdf_file), 'wb', json.dumps(risks))
+
+
+def load_risks(xccdf_file):
+    """
+    Function returns risks stored by write_risks or None
+    if they are missing or older than xccdf_file
+    """
+    risks_path = get_risks_path(xccdf_file)
+    try:
+        if os.stat(risks_path).st_mtime < os.stat(xccdf_file).st_mtime:
+            return None
+        return json.loads(get_file_content(risks_path, 'rb'))
+    except (OSError, IOError, ValueError):
+        return None
+
+
+def write_risk_summary(xccdf_file, risks):
+    """
+    Function stores summary of risks of xccdf_file next to it
+
+    Summary contains one key=value per line in order of RISK_SUMMARY_KEYS:
+    the highest risk level (-1 for no risk), number of risks of each level
+    and mtime, size and SHA1 of xccdf_file.
+    """
+    lines = []
+    counts = dict([(x, 0) for x in RISK_LEVELS])
+    for dummy_idref, rule_risks in risks:
+        lines.extend(get_risk_lines(rule_risks))
+        for level, dummy_message in rule_risks:
+            if level in counts:
+                counts[level] += 1
+    stat = os.stat(xccdf_file)
+    summary = {'risk': get_and_print_inplace_risk(0, lines),
+               'mtime': repr(stat.st_mtime),
+               'size': stat.st_size,
+               'sha1': get_file_hash(xccdf_file)}
+    for level in RISK_LEVELS:
+        summary[level.lower()] = counts[level]
+    write_to_file(get_risk_summary_path(xccdf_file), 'wb',
+                  ['%s=%s\n' % (key, summary[key]) for key in RISK_SUMMARY_KEYS])
+
+
+def read_risk_summary(xccdf_file):
+    """
+    Function returns the highest risk level stored by write_risk_summary
+    or None if the summary is missing or does not belong to xccdf_file
+
+    Only stat of xccdf_file is needed if it was not touched since
+    the summary was written. Otherwise the summary is used only
+    if SHA1 of xccdf_file is unchanged.
+    """
+    summary = {}
+    try:
+        for line in get_file_content(get_risk_summary_path(xccdf_file), 'rb', method=True):
+            key, dummy_sep, value = line.strip().partition('=')
+            summary[key] = value
+        stat = os.stat(xccdf_file)
+        if int(summary['size']) != stat.st_size:
+            return None
+        if float(summary['mtime']) != stat.st_mtime and get_file_hash(xccdf_file) != summary['sha1']:
+            return None
+        return int(summary['risk'])
+    except (IOError, OSError, KeyError, ValueError):
+        return None
+
+
+def get_risk_code(result):
+    """
+    Function returns return code of risk check for the highest risk level,
+    0 for none, slight and medium risks, 1 for high and 2 for extreme risk.
+    -1 is returned if there is no risk at all.
+    """
+    # different behaviour of division between py2 & 3
+    if(result == -1):
+        return -1
+    elif(result < 2):
+        return 0
+    elif(result < 4):
+        return 1
+    else:
+        return 2
+
+
+def iter_rule_results(xccdf_file):
+    """
+    Function yields pairs (TestResult, rule-result) from xccdf_file
+
+    The file is parsed incrementally. Every rule-result is cleared
+    and removed from the tree after it is processed and top level
+    nodes outside of TestResult are dropped, so memory is bounded
+    by one rule-result instead of the whole document.
+    Attributes of TestResult are available, its children are not.
+    """
+    root = None
+    test_result = None
+    depth = 0
+    for event, elem in ElementTree.iterparse(xccdf_file, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+            elif depth == 2 and elem.tag == XMLNS + "TestResult":
+                test_result = elem
+            continue
+        depth -= 1
+        if test_result is not None and elem.tag == XMLNS + "rule-result":
+            yield test_result, elem
+            elem.clear()
+            test_result.remove(elem)
+        elif depth == 1:
+            if elem is test_result:
+                test_result = None
+            elem.clear()
+            root.remove(elem)
+
+
 def check_inplace_risk(xccdf_file, verbose):
     """
     The function read the content of the file
     and finds out all INPLACERISK rows in TestResult tree.
+    Risk summary or risks stored next to the file by write_risk_summary
+    and write_risks are used if they are up to date, so the file
+    is not parsed at all. Summary is used only if verbose is 0
+    because it does not contain risk messages.
     return value is get from function get_and_print_inplace_risk
     """
     try:
-        content = utils.get_file_content(xccdf_file, 'rb', False, False)
-        if not content:
+        if not os.path.getsize(xccdf_file):
             # WE NEED TO RETURN -1 FOR RED-HAT-UPGRADE-TOOL
             return -1
-    except IOError:
+    except OSError:
         # WE NEED TO RETURN -1 FOR RED-HAT-UPGRADE-TOOL
         return -1
 
+    if int(verbose) == 0:
+        result = read_risk_summary(xccdf_file)
+        if result is not None:
+            return get_risk_code(result)
+
     inplace_risk = []
-    target_tree = ElementTree.fromstring(content)
-    for profile in target_tree.findall(XMLNS + "TestResult"):
-        inplace_risk = get_check_import_inplace_risk(profile)
+    risks = load_risks(xccdf_file)
+    if risks is not None:
+        for dummy_idref, rule_risks in risks:
+            inplace_risk.extend(get_risk_lines(rule_risks))
+    else:
+        profile = None
+        # only risks of the last TestResult are taken into account
+        for test_result, rule in iter_rule_results(xccdf_file):
+            if test_result is not profile:
+                profile = test_result
+                inplace_risk = []
+            inplace_risk.extend(get_check_import_inplace_risk(rule))
 
     result = get_and_print_inplace_risk(verbose, inplace_risk)
-    # different behaviour of division between py2 & 3
-    if(result == -1):
-        return -1
-    elif(result < 2):
-        return 0
-    elif(result < 4):
-        return 1
-    else:
-        return 2
+    return get_risk_code(result)
@@ -4,10 +4,27 @@ from __future__ import unicode_literals, print_function
 import os
 import re
 import rpm
+import stat
+import bisect
+import tempfile
 import six
 from preup.utils import get_file_content, write_to_file
 from preup import settings
 
+# solution text marker in content, e.g. _system_foo_SOLUTION_MSG_TEXT
+MARKER_RE = re.compile(r'([^\s<>"\']*)_SOLUTION_MSG')
+
+# lines of HTML report introduction which are removed by clean_html,
+# the lines after <h2>Introduction</h2> up to the end of test results table
+INTRO_START_RE = re.compile(br'<div id="intro">[\t ]*\n$')
+INTRO_TITLE_RE = re.compile(br'[\t ]*<h2>Introduction</h2>[\t ]*\n')
+INTRO_END_RES = [re.compile(br'</table>[\t ]*\n$'),
+                 re.compile(br'[\t ]*</div>[\t ]*\n$'),
+                 re.compile(br'[\t ]*</div>[\t ]*\n$')]
+# Details section of rule, removed in non-verbose mode
+DETAILS_START = b'<br /><br /><strong class="bold">Details:</strong><br />'
+DETAILS_END_RE = re.compile(br'[\t ]*<div class="xccdf-fixtext">')
+
 
 def html_escape_string(pattern):
     """
@@ -164,28 +181,85 @@ def add_preupg_scanner_info():
     return template % data
 
 
-def clean_html(report_path):
-    """
-    Function cleans a report
-    """
-    file_content = get_file_content(report_path, 'rb')
-
-    s_testres = ('[\t ]*<div id="intro">[\t ]*\n[\t ]*<h2>Introduction</h2>[\t ]*\n', False)
-    e_testres = ('[\t ]*</table>[\t ]*\n[\t ]*</div>[\t ]*\n[\t ]*</div>[\t ]*\n', False)
+def is_intro_end(lines):
+    """Function returns True if lines end with the end of introduction"""
+    if len(lines) < len(INTRO_END_RES):
+        return False
+    lines = lines[-len(INTRO_END_RES):]
+    for index, regex in enumerate(INTRO_END_RES):
+        match = regex.search(lines[index]) if index == 0 else regex.match(lines[index])
+        if not match:
+            return False
+    return True
 
-    s_score = ('[\t ]*<div>[\t ]*\n[\t ]*<h3>Score</h3>\s*', True)
-    e_score = ('[\t ]*</div>[\t ]*\n[\t ]*<div id="results-overview">[\t ]*\n', False)
 
-    # remove test results
-    nl = remove_lines(file_content, s_testres, e_testres)
-    # remove score table
-    #nl = remove_lines(nl, s_score, e_score)
-    # sed XCCDF test results
-    nl = re.sub('XCCDF test result', 'Preupgrade Assistant', nl)
-    # add preupg nvr
-    nl = re.sub('[\t ]*<h2>Introduction</h2>[\t ]*\n', add_preupg_scanner_info(), nl)
+def clean_html(report_path, clean=True, remove_details=False):
+    """
+    Function cleans a report
 
-    write_to_file(report_path, 'wb', nl)
+    If clean is True, test results in introduction are removed,
+    'XCCDF test result' is replaced and info about scanner is added.
+    If remove_details is True, Details sections of rules are removed.
+    The report is filtered line by line in one pass and written once
+    to a temporary file, which replaces it.
+    """
+    scanner_info = []
+    # skipped lines of introduction, they are written back
+    # if the end of introduction is not found
+    intro = None
+    intro_done = not clean
+    in_details = False
+    previous = b''
+
+    def update_line(line):
+        if clean:
+            line = line.replace(b'XCCDF test result', b'Preupgrade Assistant')
+            if INTRO_TITLE_RE.search(line):
+                # packages are looked up only once
+                if not scanner_info:
+                    scanner_info.append(add_preupg_scanner_info().encode(settings.defenc))
+                line = INTRO_TITLE_RE.sub(scanner_info[0], line)
+        return line
+
+    mode = stat.S_IMODE(os.stat(report_path).st_mode)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(report_path))
+    try:
+        output = os.fdopen(fd, 'wb')
+        try:
+            f = open(report_path, 'rb')
+            try:
+                for line in f:
+                    if remove_details:
+                        if DETAILS_START in line:
+                            in_details = True
+                            continue
+                        if in_details and DETAILS_END_RE.search(line):
+                            in_details = False
+                        if in_details:
+                            continue
+                    if not intro_done:
+                        if intro is not None:
+                            intro.append(line)
+                            if is_intro_end(intro):
+                                intro = None
+                                intro_done = True
+                            continue
+                        if INTRO_START_RE.search(previous) and INTRO_TITLE_RE.match(line):
+                            intro = []
+                        previous = line
+                    output.write(update_line(line))
+            finally:
+                f.close()
+            for line in intro or []:
+                output.write(update_line(line))
+        finally:
+            output.close()
+        os.chmod(temp_path, mode)
+        os.rename(temp_path, report_path)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
 
 
 class XmlManager(object):
@@ -201,6 +275,10 @@ class XmlManager(object):
         self.result_base = result_base
         self.scenario = scenario
         self.xml_solution_files = {}
+        # sorted keys of xml_solution_files
+        self._solution_keys = []
+        # (solution_files, texts) returned by get_solution_texts
+        self._solution_texts = None
 
     def get_updated_text(self, solution_text, text, line, extension):
         """Function updates a text in XML file"""
@@ -230,14 +308,19 @@ class XmlManager(object):
         based on section and list of txt files from content
         directory
         """
-        found = False
+        # section is in format _<path_content>
+        section_name = section[1:] + "_"
+        # keys of rules in the directory itself start with section_name
+        index = bisect.bisect_left(self._solution_keys, section_name)
+        for key in self._solution_keys[index:]:
+            if not key.startswith(section_name):
+                break
+            if self.xml_solution_files[key] in files:
+                return self.xml_solution_files[key]
         file_name = None
         for key, value in self.xml_solution_files.items():
-            # section is in format _<path_content>
-            section_name = section[1:] + "_"
             if section_name not in key:
                 continue
-            found = True
             # This will return only
             try:
                 file_name = [txt for txt in files if txt == value][0]
@@ -246,39 +329,68 @@ class XmlManager(object):
                 pass
         return file_name
 
+    def get_solution_texts(self, solution_files):
+        """
+        Function returns list of (solution_text marker, lines of solution file)
+        for directories with text files from solution_files
+
+        Texts are read once and shared by HTML and XML updates of all reports.
+        """
+        if self._solution_texts is not None and self._solution_texts[0] == solution_files:
+            return self._solution_texts[1]
+        self._solution_keys = sorted(self.xml_solution_files)
+        solution_texts = []
+        for dir_name, files in six.iteritems(solution_files):
+            section = dir_name.replace(os.path.join(self.dirname, self.scenario),
+                                       "").replace("/", "_")
+            file_name = self._return_correct_text_file(section, files)
+            if not file_name:
+                continue
+            text = get_file_content(os.path.join(dir_name, file_name),
+                                    "rb",
+                                    method=True)
+            solution_texts.append((section + "_SOLUTION_MSG", text))
+        self._solution_texts = (solution_files, solution_texts)
+        return solution_texts
+
     def update_html(self, result_name, solution_files, extension="html"):
         """
          Function updates a XML or HTML file with relevant solution
          texts
+
+         Lines with solution markers are indexed in one pass, then only
+         these lines are updated.
         """
         orig_file = os.path.join(self.dirname,
                                  result_name + "." + extension)
         lines = get_file_content(orig_file, "rb", method=True)
-        for dir_name, files in six.iteritems(solution_files):
-            section = dir_name.replace(os.path.join(self.dirname, self.scenario),
-                                       "").replace("/", "_")
-            solution_text = section + "_SOLUTION_MSG"
-
-            file_name = self._return_correct_text_file(section, files)
-            if not file_name or file_name is None:
-                continue
-            else:
-                text = get_file_content(os.path.join(dir_name, file_name),
-                                        "rb",
-                                        method=True)
-            for cnt, line in enumerate(lines):
-                # If in INPLACERISK: is a [link] then update them
-                # to /root/pre{migrate,upgrade}/...
-                if 'INPLACERISK:' in line.strip():
+        solution_texts = self.get_solution_texts(solution_files)
+        # Every suffix of marker starting by '_' is indexed,
+        # because solution_text is searched as a substring of line
+        markers = {}
+        for cnt, line in enumerate(lines):
+            # If in INPLACERISK: is a [link] then update them
+            # to /root/pre{migrate,upgrade}/...
+            if 'INPLACERISK:' in line:
+                if solution_texts:
                     lines[cnt] = tag_formating([line], extension)[0]
-                    continue
+                continue
+            suffixes = set()
+            for marker in MARKER_RE.findall(line):
+                suffixes.update([marker[index:] for index, char in enumerate(marker) if char == '_'])
+                suffixes.add('')
+            for suffix in suffixes:
+                markers.setdefault(suffix + "_SOLUTION_MSG", []).append(cnt)
+
+        for solution_text, text in solution_texts:
+            for cnt in markers.get(solution_text, []):
                 # Find correct block
-                if solution_text not in line.strip():
+                if solution_text not in lines[cnt]:
                     continue
                 # Get updated text if it is HTML or TEXT
                 lines[cnt] = self.get_updated_text(solution_text,
-                                                   text,
-                                                   line,
+                                                   list(text),
+                                                   lines[cnt],
                                                    extension)
 
         if extension == 'xml':
@@ -288,36 +400,36 @@ class XmlManager(object):
 
         write_to_file(orig_file, "wb", lines)
 
-    def find_solution_files(self, result_name, xml_solution_files):
+    def find_text_files(self):
         """
-        Function finds all text files in conten
-        and updates XML and HTML results
+        Function returns dictionary of directories in result
+        and text files in them
         """
         solution_files = {}
-        self.xml_solution_files = xml_solution_files
         for dir_name, sub_dir, file_name in os.walk(self.dirname):
             files = [x for x in file_name if x.endswith(".txt")]
             if files:
                 solution_files[dir_name] = files
+        return solution_files
+
+    def find_solution_files(self, result_name, xml_solution_files, remove_details=False):
+        """
+        Function finds all text files in conten
+        and updates XML and HTML results
+
+        HTML result is cleaned by clean_html, Details sections
+        are removed from it if remove_details is True.
+        """
+        if xml_solution_files != self.xml_solution_files:
+            self._solution_texts = None
+        self.xml_solution_files = xml_solution_files
+        solution_files = self.find_text_files()
         self.update_html(result_name, solution_files)
         self.update_html(result_name, solution_files, extension="xml")
-        clean_html(os.path.join(self.dirname, result_name + ".html"))
+        clean_html(os.path.join(self.dirname, result_name + ".html"),
+                   remove_details=remove_details)
 
     def remove_html_information(self):
+        """Function removes Details sections from HTML report"""
         report_path = os.path.join(self.dirname, self.result_base + ".html")
-        file_content = get_file_content(report_path, 'rb', method=True)
-        detail_start = '<br /><br /><strong class="bold">Details:</strong><br />'
-        detail_end = '[\t ]*<div class="xccdf-fixtext">'
-
-        new_content = []
-        found_section = False
-        for line in file_content:
-            if detail_start in line:
-                found_section = True
-                continue
-            if detail_end in line:
-                found_section = False
-            if not found_section:
-                new_content.append(line)
-
-        write_to_file(report_path, 'wb', new_content)
+        clean_html(report_path, clean=False, remove_details=True)
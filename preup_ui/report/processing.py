@@ -11,6 +11,8 @@ import re
 
 from xml.etree import ElementTree
 
+from preup import xccdf
+
 logger = logging.getLogger('preup_ui')
 
 
@@ -72,6 +74,20 @@ def set_if_true(d, key, value):
         d[key] = value
 
 
+def load_risks(report_path):
+    """
+    load risks stored by preupg next to the report (see preup.xccdf.get_risks_path)
+    as a dictionary; None is returned if they are missing or older than the report
+    """
+    risks = xccdf.load_risks(report_path)
+    if risks is None:
+        return None
+    try:
+        return dict(risks)
+    except (ValueError, TypeError):
+        return None
+
+
 class ReportParser(object):
 
     def __init__(self, report_path):
@@ -90,6 +106,8 @@ class ReportParser(object):
         self.rules = []
         # everyone loves XML
         self.element_prefix = "{http://checklists.nist.gov/xccdf/1.2}"
+        # {'id_ref': [[level, message], ...]} from risks.json
+        self.risks = None
 
     def get_child(self, tree, tag):
         return get_node(tree, tag, self.element_prefix, prefix='./')
@@ -180,12 +198,13 @@ class ReportParser(object):
                 self.parse_groups(group, group_dict['xccdf_id'])
 
 
-    def parse_test_result_logs(self, text):
+    def parse_test_result_logs(self, text, parse_risks=True):
         """
         parse test's logs; result is list of dicts:
         [
             {'level': '', 'date': '', 'component': '', 'message': ''}
         ]
+        risks are parsed only if parse_risks is True
         """
         if not text:
             return None, None
@@ -211,7 +230,7 @@ class ReportParser(object):
                     except ValueError:
                         match_dict['date'] = None
                 logs.append(match_dict)
-            else:
+            elif parse_risks:
                 match = re.match(risk_regex, line)
                 if match:
                     match_dict = match.groupdict()
@@ -234,33 +253,40 @@ class ReportParser(object):
         if not found:
             return None, None
         text = n.text
-        parsed_logs, parsed_risks = self.parse_test_result_logs(text)
+        parsed_logs, parsed_risks = self.parse_test_result_logs(text, self.risks is None)
         return parsed_logs, parsed_risks
 
+    def parse_rule_result(self, result):
+        """ parse info about one test result """
+        result_state = self.get_nodes_text(result, 'result')
+        idref = result.attrib['idref']
+        if result_state in ['error', 'notchecked']:
+            logger.error("Test %s crashed.", idref)
+        if result_state not in ['notselected']:
+            try:
+                test = self.get_test(idref)
+            except IndexError:
+                logger.error("Test %s not found", idref)
+            else:
+                set_if_true(test, 'result', result_state)
+                set_if_true(test, 'time', result.attrib['time'])
+
+                # test logs are in element check/check-import[@import-name=stdout]
+                check_elem = self.get_child(result, 'check')
+                if check_elem is not None:
+                    parsed_logs, parsed_risks = self.get_test_result_logs(check_elem)
+                    set_if_true(test, 'logs', parsed_logs)
+                    set_if_true(test, 'risks', parsed_risks)
+                if self.risks is not None:
+                    set_if_true(test, 'risks', [{'level': level, 'message': message}
+                                                for level, message in self.risks.get(idref, [])])
+
     def parse_rule_results(self, root):
         """ parse info about each test result """
         # element.iter is not on python-2.6
         #for result in root.iter(self.element_prefix + 'rule-result'):
         for result in root.findall('.//' + self.element_prefix + 'rule-result'):
-            result_state = self.get_nodes_text(result, 'result')
-            idref = result.attrib['idref']
-            if result_state in ['error', 'notchecked']:
-                logger.error("Test %s crashed.", idref)
-            if result_state not in ['notselected']:
-                try:
-                    test = self.get_test(idref)
-                except IndexError:
-                    logger.error("Test %s not found", idref)
-                else:
-                    set_if_true(test, 'result', result_state)
-                    set_if_true(test, 'time', result.attrib['time'])
-
-                    # test logs are in element check/check-import[@import-name=stdout]
-                    check_elem = self.get_child(result, 'check')
-                    if check_elem is not None:
-                        parsed_logs, parsed_risks = self.get_test_result_logs(check_elem)
-                        set_if_true(test, 'logs', parsed_logs)
-                        set_if_true(test, 'risks', parsed_risks)
+            self.parse_rule_result(result)
 
     def process_run_info(self, root):
         """ get information about run and info about host """
@@ -268,7 +294,7 @@ class ReportParser(object):
         self.run['host'] = self.get_nodes_text(tr, 'target')
         self.run['identity'] = self.get_nodes_text(tr, 'identity')
         self.run['addresses'] = []
-        if tr:
+        if tr is not None:
             for address in get_nodes(tr, 'target-address', self.element_prefix):
                 self.run['addresses'].append(address.text)
             self.run['started'] = tr.attrib['start-time']
@@ -277,15 +303,39 @@ class ReportParser(object):
         logger.debug("Host: %s, Identity: %s", self.run['host'], self.run['identity'])
 
     def parse_report(self):
-        """ parse XML report """
-        root = ElementTree.parse(self.path).getroot()
-        # rules & groups first
-        self.parse_groups(root)
-        self.parse_rule_results(root)
+        """
+        parse XML report
+
+        The report is parsed incrementally: groups and rules are parsed
+        when TestResult starts, every rule-result is parsed when it ends
+        and dropped afterwards, so logs of all tests are never kept
+        in memory at once.
+        """
+        self.risks = load_risks(self.path)
+        root = None
+        test_result = None
+        groups_parsed = False
+        for event, elem in ElementTree.iterparse(self.path, events=('start', 'end')):
+            if root is None:
+                root = elem
+            if elem.tag == self.element_prefix + 'TestResult':
+                if event == 'start':
+                    if not groups_parsed:
+                        self.parse_groups(root)
+                        groups_parsed = True
+                    test_result = elem
+                else:
+                    test_result = None
+            elif event == 'end' and test_result is not None and \
+                    elem.tag == self.element_prefix + 'rule-result':
+                self.parse_rule_result(elem)
+                elem.clear()
+                test_result.remove(elem)
+        if not groups_parsed:
+            self.parse_groups(root)
         self.process_run_info(root)
         return self.run
 
-
 def parse_report(file_path):
     """ parse XML report """
     r = ReportParser(file_path)
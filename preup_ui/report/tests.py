@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import os
 import shutil
 import unittest
 import tempfile
@@ -8,7 +9,8 @@ import preup
 from xml.etree import ElementTree
 from preup.application import Application
 from preup.conf import DummyConf, Conf
-from report.processing import xml_to_html, stringify_children, parse_report
+from preup import xccdf
+from report.processing import xml_to_html, stringify_children, parse_report, load_risks
 from report.service import extract_tarball
 
 from django.test import TestCase
@@ -57,6 +59,18 @@ Text outside tag <html:div>Text <html:em>inside</html:em> tag</html:div> x <b>y<
         r3 = stringify_children(node3).strip()
         self.assertEqual(r3, 'a <y>t<y2>a</y2>y</y>y')
 
+    def test_load_risks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            report = os.path.join(temp_dir, '3rdparty_result.xml')
+            open(report, 'w').close()
+            self.assertEqual(load_risks(report), None)
+            # risks are read from the path where preupg writes them
+            xccdf.write_risks(report, [['rule_a', [['HIGH', 'Something']]]])
+            self.assertEqual(load_risks(report), {'rule_a': [['HIGH', 'Something']]})
+        finally:
+            shutil.rmtree(temp_dir)
+
 
 # class TestImport(TestCase):
 #     def setUp(self):
@@ -18,6 +18,8 @@ urlpatterns = patterns(
     #url(r'^new-local-run/$', lr(NewLocalRunView.as_view()), name='new-local-run'),
     #url(r'^new-host/$', lr(NewHostView.as_view()), name='new-host'),
     url(r'^(?P<result_id>\d+)/report/$', lr(ReportView.as_view()),  name='show-report'),
+    url(r'^(?P<result_id>\d+)/report/(?P<page>result-group-[\w.-]+\.html)$', lr(ReportView.as_view()),
+        name='show-report-page'),
     url(r'^(?P<result_id>\d+)/file/$', lr(ReportFilesView.as_view()),        name='show-file'),
     url(r'^(?P<result_id>\d+)/ajax/$', lr(ResultViewAjax.as_view()), name='show-result-ajax'),
     url(r'^(?P<result_id>\d+)/delete/$', lr(DeleteRunView.as_view()), name='result-delete'),
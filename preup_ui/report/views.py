@@ -233,10 +233,18 @@ class ReportFilesView(View):
 
 
 class ReportView(View):
-    """ display HTML report """
-    def get(self, request, result_id):
+    """ display HTML report or a page of split report """
+    def get(self, request, result_id, page=None):
         r = get_object_or_404(Result, id=result_id)
         file_path = r.get_file_path()
+        if page is not None:
+            # pages are matched by URL pattern, they can't leave result dir
+            file_path = os.path.join(r.get_result_dir(), page)
+        else:
+            # split report is preferred, whole report can be too large
+            index_path = os.path.join(r.get_result_dir(), 'result-index.html')
+            if os.path.exists(index_path):
+                file_path = index_path
 
         try:
             f = open(file_path, 'r')
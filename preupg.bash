@@ -13,7 +13,7 @@ _preupg() {
     COMPREPLY=()
     cur="${COMP_WORDS[COMP_CWORD]}"
     prev="${COMP_WORDS[COMP_CWORD-1]}"
-    opts="-s --scan -v --verbose -d --debug --skip-common -u --upload -r --results --list-contents-set -c --contents -a --apply --riskcheck --force --text -m --mode --cleanup"
+    opts="-s --scan -v --verbose -d --debug --skip-common -u --upload -r --results --list-contents-set -c --contents -a --apply --riskcheck --force --text -m --mode -j --jobs --no-cache --profile-checks --cleanup"
 
     #echo "SS${COMP_CWORD} and ${COMP_WORDS} and ${prev} and ${cur}SS"
     if [[ ${COMP_CWORD} == 1 && ${COMP_WORDS} == "preupg" ]]; then
@@ -44,7 +44,7 @@ _preupg() {
         prev="${COMP_WORDS[COMP_CWORD-2]}"
         case "${prev}" in
             "-s"|"--scan")
-            opts="-v --verbose -d --debug --skip-common --riskcheck --force --text"
+            opts="-v --verbose -d --debug --skip-common --riskcheck --force --text -j --jobs --no-cache --profile-checks"
             comps="$opts"
             ;;
             "-u"|"--upload")
@@ -39,7 +39,7 @@ class XmlUtils(object):
         test_dict = copy.deepcopy(self.ini_files)
         allowed_tags = ['check_script', 'content_description', 'content_title', 'applies_to',
                         'author', 'binary_req', 'solution', 'bugzilla', 'config_file',
-                        'group_title', 'mode', 'requires', 'solution_type']
+                        'group_title', 'mode', 'requires', 'solution_type', 'common_logs']
         for ini, content in six.iteritems(test_dict):
             content_dict = content[0]
             for tag in allowed_tags:
@@ -340,6 +340,14 @@ class XmlUtils(object):
             else:
                 xml_tags.DIC_VALUES['solution_file'] = 'solution.txt'
 
+            # Common log files needed by the check, all of them if they are not mentioned
+            if 'common_logs' in key:
+                logs = [x.strip() for x in key['common_logs'].split(',') if x.strip()]
+                logs = [x if x.endswith('.log') else x + '.log' for x in logs]
+                xml_tags.DIC_VALUES['common_logs'] = ','.join(logs)
+            else:
+                xml_tags.DIC_VALUES['common_logs'] = 'all'
+
             # Add flag where will be shown content if in admin part or in user part
             if 'result_part' in key:
                 xml_tags.DIC_VALUES['result_part'] = key['result_part']
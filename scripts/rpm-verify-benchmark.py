@@ -0,0 +1,70 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the built-in verifier preup.rpm_verify against 'rpm -Va'
+command from common/scripts.txt.
+
+Both outputs are stored into a temporary directory and lines which
+differ are printed out.
+
+Usage: rpm-verify-benchmark.py [workers]
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from preup import settings, utils, rpm_verify
+from preup.common import parse_script_line
+
+
+def get_rpm_verify_command():
+    """Function returns 'rpm -Va' command used for rpm_Va.log"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common', 'scripts.txt')
+    if not os.path.exists(script):
+        script = settings.common_script
+    for line in utils.get_file_content(script, 'rb', method=True):
+        step = parse_script_line(line)
+        if step is not None and step['log_file'] == 'rpm_Va.log':
+            return step['cmd']
+    return settings.rpm_verify_command
+
+
+def main():
+    workers = None
+    if len(sys.argv) > 1:
+        workers = int(sys.argv[1])
+    temp_dir = tempfile.mkdtemp()
+    try:
+        cmd = get_rpm_verify_command()
+        rpm_log = os.path.join(temp_dir, 'rpm_Va.log')
+        start_time = time.time()
+        utils.run_subprocess(cmd, output=rpm_log, shell=True)
+        rpm_time = time.time() - start_time
+
+        native_log = os.path.join(temp_dir, 'native_Va.log')
+        start_time = time.time()
+        rpm_verify.write_verify_log(native_log, workers)
+        native_time = time.time() - start_time
+
+        rpm_lines = set(utils.get_file_content(rpm_log, 'rb', method=True))
+        native_lines = set(utils.get_file_content(native_log, 'rb', method=True))
+        print("'%s': %.2fs, %d lines" % (cmd, rpm_time, len(rpm_lines)))
+        print("preup.rpm_verify (%s workers): %.2fs, %d lines" % (workers or 'all',
+                                                                  native_time,
+                                                                  len(native_lines)))
+        if native_time:
+            print("Speedup: %.2fx" % (rpm_time / native_time))
+        for line in sorted(rpm_lines - native_lines):
+            print("only in rpm: %s" % line.rstrip())
+        for line in sorted(native_lines - rpm_lines):
+            print("only in native: %s" % line.rstrip())
+    finally:
+        shutil.rmtree(temp_dir)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
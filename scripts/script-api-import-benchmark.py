@@ -0,0 +1,129 @@
+#!/usr/bin/python2 -tt
+# -*- coding: utf-8 -*-
+"""
+Benchmark of start-up overhead of python checks using preup.script_api.
+
+A representative check is executed repeatedly and compared with
+an empty python process. Time of each module imported by
+preup.script_api is printed as well, cumulative including
+modules it imports, indented by nesting level.
+
+Usage: script-api-import-benchmark.py [-n RUNS] [--limit MS]
+Returns 1 if the overhead is bigger than limit.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import optparse
+
+CHECK = """
+from preup.script_api import *
+from preup.script_api import is_pkg_installed
+
+set_component('benchmark')
+try:
+    if is_pkg_installed('bash'):
+        solution_file('Package bash is installed.\\n')
+except IOError:
+    pass
+log_info('Benchmark check finished')
+exit_pass()
+"""
+
+# python 2 has no 'python -X importtime', __import__ is wrapped instead
+IMPORT_TIMER = """
+import sys
+import time
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+original_import = builtins.__import__
+times = []
+depth = [0]
+
+
+def timed_import(name, *args, **kwargs):
+    new = name not in sys.modules
+    start_time = time.time()
+    depth[0] += 1
+    try:
+        return original_import(name, *args, **kwargs)
+    finally:
+        depth[0] -= 1
+        if new and name in sys.modules:
+            times.append((depth[0], name, (time.time() - start_time) * 1000))
+
+builtins.__import__ = timed_import
+import preup.script_api
+builtins.__import__ = original_import
+for level, name, ms in times:
+    print('%8.2fms %s%s' % (ms, '  ' * level, name))
+"""
+
+
+def get_environment(temp_dir):
+    """Function returns environment similar to oscap SCE environment"""
+    env = dict(os.environ)
+    source_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([source_dir, env.get('PYTHONPATH', '')])
+    env['XCCDF_VALUE_TMP_PREUPGRADE'] = temp_dir
+    env['XCCDF_VALUE_REPORT_DIR'] = temp_dir
+    env['XCCDF_VALUE_SOLUTION_FILE'] = 'solution.txt'
+    env['XCCDF_VALUE_CURRENT_DIRECTORY'] = temp_dir
+    env['CURRENT_DIRECTORY'] = temp_dir
+    env['XCCDF_RESULT_PASS'] = '0'
+    return env
+
+
+def measure(cmd, env, runs):
+    """Function returns the best and the average run time of cmd in ms"""
+    times = []
+    devnull = open(os.devnull, 'wb')
+    try:
+        for dummy in range(runs):
+            start_time = time.time()
+            subprocess.call(cmd, env=env, stdout=devnull)
+            times.append((time.time() - start_time) * 1000)
+    finally:
+        devnull.close()
+    return min(times), sum(times) / len(times)
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [-n RUNS] [--limit MS]")
+    parser.add_option("-n", "--runs", type=int, default=50,
+                      help="Number of executions of the check")
+    parser.add_option("--limit", type=float, metavar="MS",
+                      help="Fail if overhead of the check is bigger than MS milliseconds")
+    opts, dummy_args = parser.parse_args()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        check = os.path.join(temp_dir, 'check.py')
+        f = open(check, 'w')
+        f.write(CHECK)
+        f.close()
+        env = get_environment(temp_dir)
+        base_best, base_avg = measure([sys.executable, '-c', 'pass'], env, opts.runs)
+        check_best, check_avg = measure([sys.executable, check], env, opts.runs)
+        overhead = check_best - base_best
+        print("empty python: best %.1fms, average %.1fms" % (base_best, base_avg))
+        print("check:        best %.1fms, average %.1fms" % (check_best, check_avg))
+        print("overhead of script_api check: %.1fms" % overhead)
+        print("imports of preup.script_api:")
+        subprocess.call([sys.executable, '-c', IMPORT_TIMER], env=env)
+    finally:
+        shutil.rmtree(temp_dir)
+    if opts.limit is not None and overhead > opts.limit:
+        print("Overhead is bigger than limit %.1fms" % opts.limit)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
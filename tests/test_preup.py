@@ -3,12 +3,25 @@ import unittest
 import tempfile
 import shutil
 import os
+import sys
+import json
+import subprocess
+import hashlib
+import stat
+import pwd
+import grp
+from six.moves import queue, StringIO
 
 from preup.application import Application
 from preup.conf import Conf, DummyConf
 from preup.cli import CLI
-from preup import settings, remediate, utils, xml_manager
+from preup import settings, remediate, utils, xml_manager, rpm_verify, fact_store, fact_server, xccdf, text_report
 from preup.report_parser import ReportParser
+from preup.rule_cache import RuleCache
+from preup.profiling import CheckProfiler
+from preup.scanning import ScanProgress
+from preup.common import Common, parse_script_line, get_dependencies
+from preup.log_cache import LogCache, get_gathered_logs
 
 import base
 
@@ -119,9 +132,33 @@ class TestPreupg(base.TestCase):
         self.assertEquals(found_upgrade, 1)
 
 
+TEST_CONTENT = "tests/FOOBAR6_7/dummy_preupg/all-xccdf.xml"
+TEST_RULE = "xccdf_preupg_rule_dummy_preupg_dummy_preupg"
+
+
+def get_test_content(profile='', benchmark=''):
+    """
+    Function returns TEST_CONTENT with profile nodes added after Profile
+    and benchmark nodes added to the end of Benchmark
+    """
+    data = utils.get_file_content(TEST_CONTENT, 'rb')
+    return data.replace('</ns0:Profile>', '</ns0:Profile>' + profile).replace(
+        '</ns0:Benchmark>', benchmark + '</ns0:Benchmark>')
+
+
+def write_test_result(path, results=((TEST_RULE, 'pass'),)):
+    """
+    Function writes TEST_CONTENT with TestResult of (rule, result) pairs to path
+    """
+    rule_result = '<ns0:rule-result idref="{0}"><ns0:result>{1}</ns0:result></ns0:rule-result>'
+    test_result = ''.join([rule_result.format(rule, result) for rule, result in results])
+    utils.write_to_file(path, 'wb', get_test_content(
+        benchmark='<ns0:TestResult>' + test_result + '</ns0:TestResult>'))
+
+
 class TestXMLUpdates(base.TestCase):
     def setUp(self):
-        self.content = "tests/FOOBAR6_7/dummy_preupg/all-xccdf.xml"
+        self.content = TEST_CONTENT
         self.test_content = self.content+".test"
 
     def tearDown(self):
@@ -170,6 +207,1066 @@ class TestXMLUpdates(base.TestCase):
         self.assertEquals(found_current, 1)
 
 
+    def test_required_logs(self):
+        rule_id = "xccdf_preupg_rule_dummy_preupg_dummy_preupg"
+        rp = ReportParser(self.content)
+        self.assertEqual(rp.get_required_logs([rule_id]), None)
+        self.assertEqual(rp.get_required_logs([]), set())
+        value = """<ns0:Value id="xccdf_preupg_value_dummy_preupg_dummy_preupg_state_common_logs" type="string">
+        <ns0:value>rpm_qa.log,chkconfig.log</ns0:value></ns0:Value>"""
+        data = utils.get_file_content(self.content, 'rb')
+        utils.write_to_file(self.test_content, 'wb', data.replace('</ns0:Profile>', '</ns0:Profile>' + value))
+        rp = ReportParser(self.test_content)
+        self.assertEqual(rp.get_required_logs([rule_id]), set(['rpm_qa.log', 'chkconfig.log']))
+
+
+    def test_rule_index(self):
+        rule_id = "xccdf_preupg_rule_dummy_preupg_dummy_preupg"
+        select = '<ns0:select idref="%s" selected="true" />' % rule_id
+        data = utils.get_file_content(self.content, 'rb')
+        utils.write_to_file(self.test_content, 'wb', data.replace('</ns0:Profile>', select + '</ns0:Profile>'))
+        rp = ReportParser(self.test_content)
+        self.assertEqual(rp.get_rule(rule_id).get('id'), rule_id)
+        self.assertEqual(rp.get_select(rule_id).get('idref'), rule_id)
+        self.assertEqual(rp.get_rule("unknown"), None)
+        self.assertEqual(rp.check_rules([rule_id, "dummy_preupg", "unknown"]), ["unknown"])
+        self.assertEqual(list(rp.get_name_of_checks().keys()), [rule_id])
+        rp.select_rules([])
+        self.assertEqual(rp.get_select(rule_id).get('selected'), 'false')
+
+
+    def test_report_type(self):
+        value = """<ns0:Value id="xccdf_preupg_value_dummy_preupg_dummy_preupg_state_result_part" type="string">
+        <ns0:value>admin</ns0:value></ns0:Value>"""
+        results = """<ns0:TestResult end-time="2015-01-01T10:00:00">
+        <ns0:rule-result idref="xccdf_preupg_rule_dummy_preupg_dummy_preupg"><ns0:result>pass</ns0:result></ns0:rule-result>
+        <ns0:rule-result idref="xccdf_preupg_rule_other_rule"><ns0:result>fail</ns0:result></ns0:rule-result>
+        </ns0:TestResult>"""
+        utils.write_to_file(self.test_content, 'wb', get_test_content(value, results))
+        rp = ReportParser(self.test_content)
+        self.assertEqual(rp.get_report_type('user'), None)
+        admin_report = rp.get_report_type('admin')
+        try:
+            admin_rp = ReportParser(admin_report)
+            self.assertEqual([x.get('idref') for x in admin_rp.get_all_result_rules()],
+                             ["xccdf_preupg_rule_dummy_preupg_dummy_preupg"])
+            # document in memory is not changed
+            self.assertEqual([x.get('idref') for x in rp.get_all_result_rules()],
+                             ["xccdf_preupg_rule_dummy_preupg_dummy_preupg", "xccdf_preupg_rule_other_rule"])
+        finally:
+            os.remove(admin_report)
+
+    def test_report_types(self):
+        values = ''
+        for rule_id, result_part in [('dummy_preupg_dummy_preupg', 'admin'), ('other_rule', 'user'),
+                                     ('third_rule', 'security')]:
+            values += '<ns0:Value id="xccdf_preupg_value_%s_state_result_part" type="string">' \
+                      '<ns0:value>%s</ns0:value></ns0:Value>' % (rule_id, result_part)
+        results = """<ns0:TestResult end-time="2015-01-01T10:00:00"><ns0:target>host</ns0:target>
+        <ns0:rule-result idref="xccdf_preupg_rule_dummy_preupg_dummy_preupg"><ns0:result>pass</ns0:result></ns0:rule-result>
+        <ns0:rule-result idref="xccdf_preupg_rule_other_rule"><ns0:result>fail</ns0:result></ns0:rule-result>
+        <ns0:rule-result idref="xccdf_preupg_rule_third_rule"><ns0:result>fail</ns0:result></ns0:rule-result>
+        </ns0:TestResult>"""
+        utils.write_to_file(self.test_content, 'wb', get_test_content(values, results))
+        rp = ReportParser(self.test_content)
+        reports = rp.get_report_types(['security', 'missing', 'user'])
+        try:
+            self.assertEqual([os.path.basename(x) for x in reports], ['result-security.xml', 'result-user.xml'])
+            for report, rule_id in zip(reports, ['xccdf_preupg_rule_third_rule', 'xccdf_preupg_rule_other_rule']):
+                report_rp = ReportParser(report)
+                self.assertEqual([x.get('idref') for x in report_rp.get_all_result_rules()], [rule_id])
+                self.assertEqual(len(report_rp.get_nodes(report_rp.target_tree, 'target', prefix='.//')), 1)
+            self.assertEqual(len(rp.get_all_result_rules()), 3)
+        finally:
+            for report in reports:
+                os.remove(report)
+
+    def test_text_reports(self):
+        values = '<ns0:Value id="xccdf_preupg_value_other_rule_state_result_part" type="string">' \
+                 '<ns0:value>user</ns0:value></ns0:Value>'
+        rule = '<ns0:Rule id="xccdf_preupg_rule_other_rule" selected="true"><ns0:title>Other rule</ns0:title>' \
+               '<ns0:description>Other <html:b>rule</html:b>\n  description</ns0:description>' \
+               '<ns0:fixtext>_other_SOLUTION_MSG_TEXT</ns0:fixtext></ns0:Rule>'
+        results = """<ns0:TestResult end-time="2015-01-01T10:00:00"><ns0:target>host</ns0:target>
+        <ns0:rule-result idref="xccdf_preupg_rule_dummy_preupg_dummy_preupg"><ns0:result>pass</ns0:result></ns0:rule-result>
+        <ns0:rule-result idref="xccdf_preupg_rule_other_rule"><ns0:result>fail</ns0:result>
+        <ns0:check system="http://open-scap.org/page/SCE">
+        <ns0:check-import import-name="stdout">INPLACERISK: HIGH: Other risk</ns0:check-import></ns0:check>
+        </ns0:rule-result>
+        </ns0:TestResult>"""
+        utils.write_to_file(self.test_content, 'wb', get_test_content(values + rule, results))
+        rp = ReportParser(self.test_content)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            text_reports = [(os.path.join(temp_dir, 'result.txt'), None),
+                            (os.path.join(temp_dir, 'result-user.txt'), 'user')]
+            text_report.write_text_reports(rp, text_reports, [('_other_SOLUTION_MSG', ['Solution <text>\n'])])
+            text = utils.get_file_content(text_reports[0][0], 'rb')
+            self.assertTrue('pass               dumm_pass\n' in text)
+            self.assertTrue('Target: host\n' in text)
+            other_rule = '\n'.join(['Other rule', '----------', 'Rule:   other_rule', 'Result: fail',
+                                    'Risks:', '    HIGH: Other risk', 'Description:', '    Other rule',
+                                    '    description', 'Solution:', '    Solution <text>', ''])
+            self.assertTrue(other_rule in text)
+            text = utils.get_file_content(text_reports[1][0], 'rb')
+            self.assertTrue(other_rule in text)
+            self.assertFalse('dumm_pass' in text)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_text_reports_partial_selection(self):
+        rule = '<ns0:Rule id="xccdf_preupg_rule_other_rule" selected="true"><ns0:title>Other rule</ns0:title>' \
+               '</ns0:Rule>'
+        results = """<ns0:TestResult end-time="2015-01-01T10:00:00"><ns0:target>host</ns0:target>
+        <ns0:rule-result idref="xccdf_preupg_rule_dummy_preupg_dummy_preupg"><ns0:result>notselected</ns0:result></ns0:rule-result>
+        <ns0:rule-result idref="xccdf_preupg_rule_other_rule"><ns0:result>fail</ns0:result></ns0:rule-result>
+        </ns0:TestResult>"""
+        utils.write_to_file(self.test_content, 'wb', get_test_content(rule, results))
+        rp = ReportParser(self.test_content)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            text_reports = [(os.path.join(temp_dir, 'result.txt'), None)]
+            text_report.write_text_reports(rp, text_reports)
+            text = utils.get_file_content(text_reports[0][0], 'rb')
+            self.assertTrue('fail               Other rule\n' in text)
+            self.assertFalse('dumm_pass' in text)
+            self.assertFalse('notselected' in text)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestHTMLGeneration(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.binary = os.path.join(self.temp_dir, 'oscap')
+        # fake 'oscap xccdf generate report --output HTML XML'
+        utils.write_to_file(self.binary, 'wb', '#!/bin/sh\ncp "$6" "$5"\n')
+        os.chmod(self.binary, 0o755)
+        self.conf = {
+            "contents": TEST_CONTENT,
+            "profile": "xccdf_preupg_profile_default",
+            "result_dir": self.temp_dir,
+            "skip_common": True,
+            "temp_dir": self.temp_dir,
+            "id": None,
+            "debug": True,  # so root check won't fail
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_application(self):
+        a = Application(Conf(DummyConf(**self.conf), settings, CLI(["--contents", TEST_CONTENT])))
+        a.binary = self.binary
+        return a
+
+    def test_generate_reports(self):
+        a = self._get_application()
+        content = utils.get_file_content(TEST_CONTENT, 'rb')
+        reports = []
+        for name in ['result', 'result-admin', 'result-user']:
+            reports.append(os.path.join(self.temp_dir, name + '.xml'))
+            utils.write_to_file(reports[-1], 'wb', content)
+        a.prepare_for_generation(reports)
+        for report in reports:
+            html = utils.get_file_content(report.replace('.xml', '.html'), 'rb')
+            self.assertTrue('http://checklists.nist.gov/xccdf/1.1' in html)
+            self.assertTrue('http://checklists.nist.gov/xccdf/1.2' not in html)
+            # XML report itself is not changed
+            self.assertEqual(utils.get_file_content(report, 'rb'), content)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['oscap', 'result-admin.html', 'result-admin.xml', 'result-user.html',
+                          'result-user.xml', 'result.html', 'result.xml'])
+
+    def test_report_pages(self):
+        a = self._get_application()
+        group = '<ns0:Group id="xccdf_preupg_group_other" selected="true"><ns0:title>Other group</ns0:title>' \
+                '<ns0:Rule id="xccdf_preupg_rule_other_rule" selected="true"><ns0:title>Other rule</ns0:title>' \
+                '</ns0:Rule></ns0:Group>'
+        results = """<ns0:TestResult end-time="2015-01-01T10:00:00"><ns0:target>host</ns0:target>
+        <ns0:rule-result idref="xccdf_preupg_rule_dummy_preupg_dummy_preupg"><ns0:result>pass</ns0:result></ns0:rule-result>
+        <ns0:rule-result idref="xccdf_preupg_rule_other_rule"><ns0:result>fail</ns0:result></ns0:rule-result>
+        </ns0:TestResult>"""
+        report = os.path.join(self.temp_dir, 'result.xml')
+        utils.write_to_file(report, 'wb', get_test_content(benchmark=group + results))
+        a.report_parser = ReportParser(report)
+        a.xml_mgr = xml_manager.XmlManager(self.temp_dir, 'FOOBAR6_7', 'all-xccdf.xml', 'result')
+        a.write_report_pages()
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['oscap', 'result-group-dummy_preupg.html', 'result-group-other.html',
+                          'result-index.html', 'result.xml'])
+        # fake oscap copies XML report into the page
+        page = utils.get_file_content(os.path.join(self.temp_dir, 'result-group-other.html'), 'rb')
+        self.assertTrue('idref="xccdf_preupg_rule_other_rule"' in page)
+        self.assertFalse('xccdf_preupg_group_dummy_preupg' in page)
+        self.assertFalse('idref="xccdf_preupg_rule_dummy_preupg_dummy_preupg"' in page)
+        index = utils.get_file_content(os.path.join(self.temp_dir, 'result-index.html'), 'rb')
+        self.assertTrue('<a href="result-group-other.html">Other group</a>' in index)
+        # the document in memory is not changed
+        self.assertEqual(len(a.report_parser.get_all_result_rules()), 2)
+        self.assertEqual(len(a.report_parser.get_top_groups()), 2)
+
+        # only the page of one group is written again
+        os.remove(os.path.join(self.temp_dir, 'result-group-dummy_preupg.html'))
+        a.write_report_pages(['xccdf_preupg_group_other'])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'result-group-dummy_preupg.html')))
+
+
+class TestScanProgress(base.TestCase):
+    def test_update_data(self):
+        progress = ScanProgress(2, False)
+        progress.set_names({'rule_a': 'Rule A', 'rule_ab': 'Rule AB'})
+        progress.add_data('rule_ab', 'fail')
+        progress.add_data('rule_a', 'fail', state='reused')
+        progress.update_data(['rule_a:needs_inspection'])
+        self.assertEqual(progress.get_output_data(), ['Rule AB:rule_ab:fail',
+                                                      'Rule A:rule_a:needs_inspection:reused'])
+
+
+class TestShardedScan(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.content = TEST_CONTENT
+        self.rule_id = TEST_RULE
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_selected(self, path):
+        rp = ReportParser(path)
+        return [x.get('idref') for x in rp.get_allowed_selected_rules()]
+
+    def _write_result(self, name, results):
+        template = """<ns0:Benchmark xmlns:ns0="http://checklists.nist.gov/xccdf/1.2">
+  <ns0:Profile id="xccdf_preupg_profile_default">
+    <ns0:select idref="rule_a" selected="false" />
+    <ns0:select idref="rule_b" selected="false" />
+  </ns0:Profile>
+  <ns0:Group id="group_a"><ns0:Rule id="rule_a" weight="3" /></ns0:Group>
+  <ns0:Group id="group_b"><ns0:Rule id="rule_b" /></ns0:Group>
+  <ns0:TestResult end-time="{0}">
+{1}
+    <ns0:score system="urn:xccdf:scoring:default" maximum="100.000000">{2}</ns0:score>
+    <ns0:score system="urn:xccdf:scoring:flat" maximum="{3}">{4}</ns0:score>
+  </ns0:TestResult>
+</ns0:Benchmark>"""
+        rule = '<ns0:rule-result idref="{0}"><ns0:result>{1}</ns0:result></ns0:rule-result>'
+        end_time, rules, scores = results
+        data = template.format(end_time, '\n'.join([rule.format(k, v) for k, v in rules]), *scores)
+        path = os.path.join(self.temp_dir, name)
+        utils.write_to_file(path, 'wb', data)
+        return path
+
+    def _get_scores(self, path):
+        rp = ReportParser(path)
+        test_result = rp.get_child(rp.target_tree, "TestResult")
+        return [(x.get('maximum'), x.text) for x in rp.get_nodes(test_result, 'score')]
+
+    def test_shard_content(self):
+        rp = ReportParser(self.content)
+        shard = os.path.join(self.temp_dir, "shard.xml")
+        rp.write_shard_content([self.rule_id], shard)
+        self.assertEqual(self._get_selected(shard), [self.rule_id])
+        rp.write_shard_content([], shard)
+        self.assertEqual(self._get_selected(shard), [])
+        # check scripts are found from the temporary directory
+        shard_rp = ReportParser(shard)
+        href = shard_rp.get_nodes(shard_rp.target_tree, "check-content-ref", prefix=".//")[0].get('href')
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, href)))
+
+    def test_merge_results(self):
+        first = self._write_result("result.shard0.xml",
+                                   ("2015-01-01T10:00:00", [("rule_a", "pass"), ("rule_b", "notselected")],
+                                    ("100.000000", "3.000000", "3.000000")))
+        second = self._write_result("result.shard1.xml",
+                                    ("2015-01-01T10:05:00", [("rule_a", "notselected"), ("rule_b", "fail")],
+                                     ("0.000000", "1.000000", "0.000000")))
+        result = os.path.join(self.temp_dir, "result.xml")
+        rp = ReportParser(first)
+        rp.merge_test_results([second], ["rule_a", "rule_b"], result)
+        rp = ReportParser(result)
+        states = [(x.get('idref'), rp.get_nodes_text(x, 'result')) for x in rp.get_all_result_rules()]
+        self.assertEqual(states, [("rule_a", "pass"), ("rule_b", "fail")])
+        self.assertEqual(rp.get_child(rp.target_tree, "TestResult").get('end-time'), "2015-01-01T10:05:00")
+        self.assertEqual(self._get_selected(result), ["rule_a", "rule_b"])
+
+    def test_merged_score(self):
+        # scores as oscap writes them for a scan without shards
+        single = self._write_result("result-single.xml",
+                                    ("2015-01-01T10:05:00", [("rule_a", "pass"), ("rule_b", "fail")],
+                                     ("50.000000", "4.000000", "3.000000")))
+        first = self._write_result("result.shard0.xml",
+                                   ("2015-01-01T10:00:00", [("rule_a", "pass"), ("rule_b", "notselected")],
+                                    ("100.000000", "3.000000", "3.000000")))
+        second = self._write_result("result.shard1.xml",
+                                    ("2015-01-01T10:05:00", [("rule_a", "notselected"), ("rule_b", "fail")],
+                                     ("0.000000", "1.000000", "0.000000")))
+        result = os.path.join(self.temp_dir, "result.xml")
+        ReportParser(first).merge_test_results([second], ["rule_a", "rule_b"], result)
+        self.assertEqual(self._get_scores(result), self._get_scores(single))
+        rp = ReportParser(single)
+        rp.update_scores()
+        rp.write_xml()
+        self.assertEqual(self._get_scores(single), [("100.000000", "50.000000"), ("4.000000", "3.000000")])
+
+
+class TestRuleCache(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.temp_dir, "dummy_preupg")
+        shutil.copytree(os.path.dirname(TEST_CONTENT), self.content_dir)
+        self.content = os.path.join(self.content_dir, "all-xccdf.xml")
+        self.common_dir = os.path.join(self.temp_dir, "common")
+        os.mkdir(self.common_dir)
+        utils.write_to_file(os.path.join(self.common_dir, "rpm_qa.log"), 'wb', "bash\tRed Hat\n")
+        self.rule_id = TEST_RULE
+        self.result = os.path.join(self.temp_dir, "result.xml")
+        write_test_result(self.result)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_cache(self):
+        return RuleCache(os.path.join(self.temp_dir, "rules"), self.common_dir, ReportParser(self.content))
+
+    def test_replay_unchanged(self):
+        rule_cache = self._get_cache()
+        self.assertEqual(rule_cache.get_cached_results([self.rule_id]), {})
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        rule_cache = self._get_cache()
+        cached = rule_cache.get_cached_results([self.rule_id])
+        self.assertEqual(list(cached.keys()), [self.rule_id])
+        rule_results = rule_cache.replay(cached)
+        self.assertEqual(rule_results[0].get('idref'), self.rule_id)
+
+    def test_changed_common_log(self):
+        rule_cache = self._get_cache()
+        rule_cache.get_cached_results([self.rule_id])
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        utils.write_to_file(os.path.join(self.common_dir, "rpm_qa.log"), 'wb', "zsh\tRed Hat\n")
+        self.assertEqual(self._get_cache().get_cached_results([self.rule_id]), {})
+
+    def test_declared_common_logs(self):
+        value = '<ns0:Value id="xccdf_preupg_value_dummy_preupg_dummy_preupg_state_common_logs" type="string">' \
+                '<ns0:value>rpm_qa.log</ns0:value></ns0:Value>'
+        data = utils.get_file_content(self.content, 'rb')
+        utils.write_to_file(self.content, 'wb', data.replace('</ns0:Profile>', '</ns0:Profile>' + value))
+        rule_cache = self._get_cache()
+        rule_cache.get_cached_results([self.rule_id])
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        # the rule does not read other logs
+        utils.write_to_file(os.path.join(self.common_dir, "passwd.log"), 'wb', "root:x:0:0\n")
+        self.assertEqual(list(self._get_cache().get_cached_results([self.rule_id]).keys()), [self.rule_id])
+        utils.write_to_file(os.path.join(self.common_dir, "rpm_qa.log"), 'wb', "zsh\tRed Hat\n")
+        self.assertEqual(self._get_cache().get_cached_results([self.rule_id]), {})
+
+    def test_stale_common_logs(self):
+        utils.write_to_file(os.path.join(self.common_dir, settings.gathered_logs_name), 'wb', '["rpm_qa.log"]')
+        rule_cache = self._get_cache()
+        rule_cache.get_cached_results([self.rule_id])
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        # passwd.log was not gathered by the last assessment
+        utils.write_to_file(os.path.join(self.common_dir, "passwd.log"), 'wb', "root:x:0:0\n")
+        self.assertEqual(list(self._get_cache().get_cached_results([self.rule_id]).keys()), [self.rule_id])
+        utils.write_to_file(os.path.join(self.common_dir, settings.gathered_logs_name), 'wb',
+                            '["passwd.log", "rpm_qa.log"]')
+        self.assertEqual(self._get_cache().get_cached_results([self.rule_id]), {})
+
+    def test_replay_into_document(self):
+        rule_cache = self._get_cache()
+        rule_cache.get_cached_results([self.rule_id])
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        # oscap did not execute the cached rule
+        write_test_result(self.result, [])
+        content = utils.get_file_content(self.result, 'rb')
+        conf = {
+            "contents": TEST_CONTENT,
+            "result_dir": self.temp_dir,
+            "skip_common": True,
+            "temp_dir": self.temp_dir,
+            "debug": True,
+        }
+        a = Application(Conf(DummyConf(**conf), settings, CLI(["--contents", conf['contents']])))
+        a.report_parser = ReportParser(self.result)
+        a.scanning_progress = ScanProgress(1, False)
+        rule_cache = self._get_cache()
+        a.replay_rule_cache(rule_cache, rule_cache.get_cached_results([self.rule_id]), [self.rule_id])
+        self.assertEqual([x.get('idref') for x in a.report_parser.get_all_result_rules()], [self.rule_id])
+        self.assertTrue(a.scanning_progress.get_output_data()[0].endswith(':pass:reused'))
+        # XML result is written by prepare_xml_for_html only
+        self.assertEqual(utils.get_file_content(self.result, 'rb'), content)
+
+    def test_changed_script(self):
+        rule_cache = self._get_cache()
+        rule_cache.get_cached_results([self.rule_id])
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        utils.write_to_file(os.path.join(self.content_dir, "dummy_preupg.sh"), 'ab', "\n")
+        self.assertEqual(self._get_cache().get_cached_results([self.rule_id]), {})
+
+    def test_side_effects(self):
+        utils.write_to_file(os.path.join(self.content_dir, "dummy_preupg.sh"), 'ab',
+                            "cp fix.sh $POSTUPGRADE_DIR/\n")
+        rule_cache = self._get_cache()
+        self.assertEqual(rule_cache.get_cached_results([self.rule_id]), {})
+        rule_cache.store_results(ReportParser(self.result).target_tree)
+        self.assertFalse(os.path.exists(rule_cache.get_cache_file(self.rule_id)))
+        self.assertEqual(self._get_cache().get_cached_results([self.rule_id]), {})
+
+    def test_config_backup_side_effects(self):
+        script = os.path.join(self.content_dir, "dummy_preupg.sh")
+        data = utils.get_file_content(script, 'rb')
+        for line in ['backup_config_file /etc/ntp.conf',
+                     'cp /etc/ntp.conf $VALUE_TMP_PREUPGRADE/cleanconf/etc/',
+                     'cp /etc/ntp.conf /root/preupgrade/dirtyconf/etc/']:
+            utils.write_to_file(script, 'wb', data + line + '\n')
+            rule_cache = self._get_cache()
+            self.assertEqual(rule_cache.get_cached_results([self.rule_id]), {})
+            rule_cache.store_results(ReportParser(self.result).target_tree)
+            self.assertFalse(os.path.exists(rule_cache.get_cache_file(self.rule_id)))
+
+
+class TestCheckProfiler(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.rule_id = TEST_RULE
+        self.result = os.path.join(self.temp_dir, "result.xml")
+        write_test_result(self.result)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_process_timings(self):
+        profiler = CheckProfiler({self.rule_id: 'Dummy check'})
+        process = subprocess.Popen(['sleep', '0.2'])
+        profile = profiler.get_process_profile()
+        profile.start(process)
+        process.wait()
+        profile.progress(self.rule_id + ':pass\n')
+        timing = profiler.get_timings()[self.rule_id]
+        self.assertEqual(timing['title'], 'Dummy check')
+        self.assertEqual(timing['result'], 'pass')
+        self.assertTrue(timing['wall_time'] > 0.1)
+        # peak RSS is not sampled by default
+        self.assertEqual(timing['peak_rss'], None)
+
+    def test_peak_rss(self):
+        profiler = CheckProfiler(sample_rss=True)
+        # memory is allocated by a grandchild like by SCE script of oscap
+        process = subprocess.Popen(['sh', '-c', '"$0" -c "x = bytearray(64 * 1024 * 1024); '
+                                                'import time; time.sleep(0.5)"; true', sys.executable])
+        profile = profiler.get_process_profile()
+        profile.start(process)
+        process.wait()
+        profile.progress(self.rule_id + ':pass\n')
+        self.assertTrue(profiler.get_timings()[self.rule_id]['peak_rss'] > 60 * 1024)
+
+    def test_timings_in_result(self):
+        profiler = CheckProfiler()
+        profiler.add_timing(self.rule_id, 'pass', 1.5, 0.25, 2048)
+        profiler.write_timings(os.path.join(self.temp_dir, settings.timings_name))
+        report_parser = ReportParser(self.result)
+        report_parser.add_rule_timings(profiler.get_timings())
+        rule = list(report_parser.filter_grandchildren(report_parser.target_tree,
+                                                       "TestResult", "rule-result"))[0]
+        name_space = '{' + settings.profiling_ns + '}'
+        self.assertEqual(rule.get(name_space + 'wall-time'), '1.5')
+        self.assertEqual(rule.get(name_space + 'peak-rss'), '2048')
+        timings = json.loads(utils.get_file_content(os.path.join(self.temp_dir, settings.timings_name), 'rb'))
+        self.assertEqual(timings[self.rule_id]['cpu_time'], 0.25)
+
+
+class TestRunSubprocess(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.temp_dir, "output.log")
+        self.stderr_output = os.path.join(self.temp_dir, "stderr.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_output_file(self):
+        cmd = "seq 1 1000; echo error >&2"
+        self.assertEqual(utils.run_subprocess(cmd, output=self.output, shell=True), 0)
+        lines = utils.get_file_content(self.output, 'rb', method=True)
+        self.assertEqual(len(lines), 1001)
+        self.assertTrue('error\n' in lines)
+
+    def test_separate_stderr(self):
+        cmd = "echo output; echo error >&2; exit 3"
+        self.assertEqual(utils.run_subprocess(cmd,
+                                              output=self.output,
+                                              shell=True,
+                                              stderr_output=self.stderr_output), 3)
+        self.assertEqual(utils.get_file_content(self.output, 'rb'), 'output\n')
+        self.assertEqual(utils.get_file_content(self.stderr_output, 'rb'), 'error\n')
+
+
+class TestCommonLogs(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.scripts = os.path.join(self.temp_dir, "scripts.txt")
+        lines = ['cat first.log second.log=third.log=THIRD=Third=NO\n',
+                 'sleep 0.2; echo first=first.log=FIRST=First=NO\n',
+                 'cat fourth.log=second.log=SECOND=Second=NO=depends:fourth.log\n',
+                 'echo fourth=fourth.log=FOURTH=Fourth=YES=Fourth\n']
+        utils.write_to_file(self.scripts, 'wb', lines)
+        conf = DummyConf(common_script=self.scripts, cache_dir=self.temp_dir)
+        self.common = Common(conf)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_line(self):
+        step = parse_script_line('grep -e "c /" rpm_Va.log=rpm_etc_Va.log=CONFIGCHANGED='
+                                 'Changed config files=YES=Changed_files=depends:rpm_Va.log,rpm_qa.log')
+        self.assertEqual(step['cmd'], 'grep -e "c /" rpm_Va.log')
+        self.assertEqual(step['kickstart_name'], 'Changed_files')
+        self.assertEqual(step['depends'], ['rpm_Va.log', 'rpm_qa.log'])
+        self.assertEqual(parse_script_line('# comment'), None)
+
+    def test_dependencies(self):
+        dependencies = get_dependencies(self.common.get_steps())
+        self.assertEqual(dependencies['third.log'], [])
+        self.assertEqual(dependencies['second.log'], ['fourth.log'])
+        self.assertEqual(dependencies['fourth.log'], [])
+
+    def test_gather_logs(self):
+        self.assertEqual(self.common.common_results(), 1)
+        second = utils.get_file_content(os.path.join(self.temp_dir, settings.common_name, "second.log"), 'rb')
+        self.assertEqual(second, 'fourth\n')
+
+    def test_failed_step(self):
+        commands = []
+
+        def run_subprocess(cmd, *args, **kwargs):
+            commands.append(cmd)
+            raise ValueError("broken package header")
+        self.common.native_verify = True
+        old_run_subprocess = utils.run_subprocess
+        utils.run_subprocess = run_subprocess
+        old_command = settings.rpm_verify_command
+        settings.rpm_verify_command = 'echo fourth'
+        try:
+            # the failure is reported instead of waiting for the step forever
+            self.assertEqual(self.common.common_results(), 0)
+        finally:
+            utils.run_subprocess = old_run_subprocess
+            settings.rpm_verify_command = old_command
+        # the verifier runs in a new process, not in a worker thread
+        log_file = os.path.join(self.temp_dir, settings.common_name, 'fourth.log')
+        self.assertTrue([sys.executable, '-m', 'preup.rpm_verify', log_file] in commands)
+
+    def test_required_logs(self):
+        self.assertEqual(self.common.common_results(required=['second.log', 'unknown.log']), 1)
+        common_dir = os.path.join(self.temp_dir, settings.common_name)
+        self.assertTrue(os.path.exists(os.path.join(common_dir, "second.log")))
+        self.assertTrue(os.path.exists(os.path.join(common_dir, "fourth.log")))
+        self.assertFalse(os.path.exists(os.path.join(common_dir, "first.log")))
+        self.assertFalse(os.path.exists(os.path.join(common_dir, "third.log")))
+
+    def test_stale_logs(self):
+        common_dir = os.path.join(self.temp_dir, settings.common_name)
+        self.assertEqual(self.common.common_results(), 1)
+        self.assertEqual(get_gathered_logs(common_dir),
+                         set(['first.log', 'second.log', 'third.log', 'fourth.log']))
+        self.assertEqual(self.common.common_results(required=['first.log']), 1)
+        self.assertEqual(get_gathered_logs(common_dir), set(['first.log']))
+        # fourth.log is left from the previous assessment
+        self.assertTrue(os.path.exists(os.path.join(common_dir, "fourth.log")))
+        result_dir = os.path.join(self.temp_dir, "result")
+        os.makedirs(os.path.join(result_dir, "kickstart"))
+        common = Common(DummyConf(common_script=self.scripts, cache_dir=self.temp_dir, result_dir=result_dir))
+        self.assertEqual(common.copy_common_files(), 1)
+        self.assertFalse(os.path.exists(os.path.join(result_dir, "kickstart", "Fourth")))
+
+    def test_log_cache(self):
+        common_dir = os.path.join(self.temp_dir, settings.common_name)
+        os.mkdir(common_dir)
+        step = parse_script_line('rpm -qa=rpm_qa.log=RPM_QA=All installed packages=NO')
+        log_cache = LogCache(common_dir)
+        log_cache._inputs['rpmdb'] = 'packages'
+        self.assertFalse(log_cache.is_valid(step))
+        utils.write_to_file(os.path.join(common_dir, "rpm_qa.log"), 'wb', "bash\tRed Hat\n")
+        log_cache.update("rpm_qa.log")
+        log_cache.store()
+        log_cache = LogCache(common_dir)
+        log_cache._inputs['rpmdb'] = 'packages'
+        self.assertTrue(log_cache.is_valid(step))
+        log_cache = LogCache(common_dir)
+        log_cache._inputs['rpmdb'] = 'changed packages'
+        self.assertFalse(log_cache.is_valid(step))
+
+    def test_no_cache(self):
+        common_dir = os.path.join(self.temp_dir, settings.common_name)
+        os.mkdir(common_dir)
+        step = parse_script_line('echo bash=rpm_qa.log=RPM_QA=All installed packages=NO')
+        common = Common(DummyConf(common_script=self.scripts, cache_dir=self.temp_dir, no_cache=True))
+        log_cache = LogCache(common_dir)
+        log_cache._inputs['rpmdb'] = 'packages'
+        self.assertFalse(common.is_reusable(log_cache, step, [], []))
+        self.assertFalse('rpm_qa.log' in log_cache.fingerprints)
+        finished = queue.Queue()
+        common.run_step(step, finished, log_cache)
+        self.assertEqual(finished.get()[2], None)
+        self.assertTrue(log_cache.fingerprints['rpm_qa.log'])
+
+
+class TestRpmVerify(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.temp_dir, "foo.conf")
+        utils.write_to_file(self.file_name, 'wb', "foo=bar\n")
+        st = os.lstat(self.file_name)
+        self.file_info = [self.file_name, rpm_verify.FILE_CONFIG, -1, st.st_mode, st.st_size,
+                          int(st.st_mtime), hashlib.md5(b"foo=bar\n").hexdigest(),
+                          pwd.getpwuid(st.st_uid).pw_name, grp.getgrgid(st.st_gid).gr_name,
+                          '', 0, rpm_verify.FILE_STATE_NORMAL]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_unchanged(self):
+        self.assertEqual(rpm_verify.verify_file('md5', self.file_info), None)
+
+    def test_changed(self):
+        utils.write_to_file(self.file_name, 'wb', "foo=baz\n")
+        os.chmod(self.file_name, 0o600)
+        self.file_info[5] -= 10
+        self.assertEqual(rpm_verify.verify_file('md5', self.file_info),
+                         ".M5....T.  c %s" % self.file_name)
+
+    def test_missing(self):
+        os.unlink(self.file_name)
+        self.assertEqual(rpm_verify.verify_file('md5', self.file_info),
+                         "missing   c %s" % self.file_name)
+
+    def test_ghost(self):
+        self.file_info[1] = rpm_verify.FILE_GHOST
+        # file type and content of %ghost file are not verified
+        self.file_info[3] = stat.S_IFLNK | stat.S_IMODE(self.file_info[3])
+        self.file_info[6] = hashlib.md5(b"other").hexdigest()
+        self.assertEqual(rpm_verify.verify_file('md5', self.file_info), None)
+        os.unlink(self.file_name)
+        self.assertEqual(rpm_verify.verify_file('md5', self.file_info), None)
+
+    def test_replaced_by_directory(self):
+        os.unlink(self.file_name)
+        os.mkdir(self.file_name)
+        self.assertEqual(rpm_verify.verify_file('md5', self.file_info),
+                         ".M.......  c %s" % self.file_name)
+
+
+class TestFactStore(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.rpm_qa = os.path.join(self.temp_dir, "rpm_qa.log")
+        lines = ['zsh\tRed Hat, Inc.\t(none)\n',
+                 'bash-completion\tFedora Project\t(none)\n',
+                 'bash\tRed Hat, Inc.\t(none)\n',
+                 'httpd\tRed Hat, Inc.\t(none)\n']
+        utils.write_to_file(self.rpm_qa, 'wb', lines)
+        fact_store._indexes.clear()
+
+    def tearDown(self):
+        fact_store._indexes.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_lookups(self):
+        self.assertTrue(fact_store.get_index(self.rpm_qa) is not None)
+        self.assertTrue(fact_store.has_line_prefix(self.rpm_qa, 'bash\t'))
+        self.assertTrue(fact_store.has_line_prefix(self.rpm_qa, 'zsh'))
+        self.assertFalse(fact_store.has_line_prefix(self.rpm_qa, 'bash-doc'))
+        self.assertFalse(fact_store.has_line_prefix(self.rpm_qa, 'aaa'))
+        self.assertEqual(fact_store.get_lines_with_prefix(self.rpm_qa, 'bash'),
+                         ['bash\tRed Hat, Inc.\t(none)', 'bash-completion\tFedora Project\t(none)'])
+
+    def test_outdated_index(self):
+        fact_store.build_index(self.rpm_qa)
+        utils.write_to_file(self.rpm_qa, 'wb', 'vim\tRed Hat, Inc.\t(none)\n')
+        os.utime(self.rpm_qa, (0, 0))
+        self.assertFalse(fact_store.is_index_valid(self.rpm_qa))
+        self.assertTrue(fact_store.get_index(self.rpm_qa, build=False) is None)
+        self.assertTrue(fact_store.has_line_prefix(self.rpm_qa, 'vim\t'))
+        self.assertFalse(fact_store.has_line_prefix(self.rpm_qa, 'bash'))
+
+    def test_has_line(self):
+        all_files = os.path.join(self.temp_dir, "allmyfiles.log")
+        utils.write_to_file(all_files, 'wb', ['/usr/bin/bash\n', '/etc/passwd\n',
+                                              '/usr/bin/bashbug\n', '/etc/passwd-\n'])
+        for build in [False, True]:
+            fact_store._indexes.clear()
+            self.assertEqual(fact_store.get_index(all_files, build=build) is not None, build)
+            self.assertTrue(fact_store.has_line(all_files, '/usr/bin/bash'))
+            self.assertTrue(fact_store.has_line(all_files, '/etc/passwd-'))
+            self.assertTrue(fact_store.has_line(all_files, '/etc/passwd'))
+            self.assertFalse(fact_store.has_line(all_files, '/usr/bin/bas'))
+            self.assertFalse(fact_store.has_line(all_files, '/usr/bin'))
+            self.assertFalse(fact_store.has_line(all_files, '/zzz'))
+
+
+class TestFactServer(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.rpm_qa = os.path.join(self.temp_dir, "rpm_qa.log")
+        utils.write_to_file(self.rpm_qa, 'wb', ['zsh\tRed Hat, Inc.\t(none)\n',
+                                                'bash-completion\tFedora Project\t(none)\n',
+                                                'bash\tRed Hat, Inc.\t(none)\n'])
+        self.server = fact_server.start_fact_server(self.temp_dir, self.temp_dir)
+        self.report_dir = os.environ.get('XCCDF_VALUE_REPORT_DIR')
+        os.environ['XCCDF_VALUE_REPORT_DIR'] = self.temp_dir
+        fact_store._server = None
+        fact_store._indexes.clear()
+
+    def tearDown(self):
+        self.server.stop()
+        fact_store._server = None
+        if self.report_dir is None:
+            del os.environ['XCCDF_VALUE_REPORT_DIR']
+        else:
+            os.environ['XCCDF_VALUE_REPORT_DIR'] = self.report_dir
+        shutil.rmtree(self.temp_dir)
+
+    def test_queries(self):
+        self.assertEqual(fact_store.query_server(b'first', self.rpm_qa, b'bash'),
+                         [b'bash\tRed Hat, Inc.\t(none)'])
+        self.assertEqual(fact_store.query_server(b'line', self.rpm_qa, b'bash'), [])
+        self.assertEqual(fact_store.query_server(b'unknown', self.rpm_qa, b'bash'), None)
+        self.assertEqual(fact_store.query_server(b'first', '/etc/passwd', b'root'), None)
+        self.assertTrue(fact_store.has_line_prefix(self.rpm_qa, 'zsh\t'))
+        self.assertFalse(fact_store.has_line(self.rpm_qa, 'zsh'))
+        self.assertEqual(fact_store.get_lines_with_prefix(self.rpm_qa, 'bash'),
+                         ['bash\tRed Hat, Inc.\t(none)', 'bash-completion\tFedora Project\t(none)'])
+        # lookups were served without building an index
+        self.assertFalse(os.path.exists(fact_store.get_index_path(self.rpm_qa)))
+
+    def test_fallback(self):
+        self.server.stop()
+        self.assertEqual(fact_store.query_server(b'first', self.rpm_qa, b'bash'), None)
+        self.assertTrue(fact_store.has_line_prefix(self.rpm_qa, 'bash\t'))
+
+    def _run_query(self, *args):
+        environment = dict(os.environ)
+        environment['PYTHONPATH'] = os.pathsep.join([os.getcwd(), environment.get('PYTHONPATH', '')])
+        proc = subprocess.Popen([sys.executable, '-m', 'preup.fact_store', 'query'] + list(args),
+                                env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, dummy_stderr = proc.communicate()
+        return proc.returncode, stdout
+
+    def test_query_command(self):
+        # common.sh asks the server by the command
+        self.assertEqual(self._run_query('first', self.rpm_qa, 'bash\t'), (0, b'bash\tRed Hat, Inc.\t(none)\n'))
+        self.assertEqual(self._run_query('line', self.rpm_qa, 'bash'), (1, b''))
+        self.assertEqual(self._run_query('prefix', os.path.join(self.temp_dir, 'missing.log'), '/etc/')[0], 2)
+        self.assertEqual(self._run_query('unknown', self.rpm_qa, 'bash')[0], 2)
+        self.assertFalse(os.path.exists(fact_store.get_index_path(self.rpm_qa)))
+
+
+def get_check_environment():
+    """Function returns environment variables which oscap sets for a check"""
+    return {'XCCDF_VALUE_TMP_PREUPGRADE': tempfile.gettempdir(),
+            'XCCDF_VALUE_REPORT_DIR': tempfile.gettempdir(),
+            'XCCDF_VALUE_SOLUTION_FILE': 'solution.txt',
+            }
+
+
+def import_script_api():
+    """Function imports preup.script_api in environment of a check"""
+    environment = dict(os.environ)
+    os.environ.update(get_check_environment())
+    try:
+        from preup import script_api
+    finally:
+        os.environ.clear()
+        os.environ.update(environment)
+    return script_api
+
+
+class TestScriptAPI(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.script_api = import_script_api()
+        self.logs = {}
+        for name, lines in [('rpm_qa.log', ['httpd\tRed Hat, Inc.\t(none)\n',
+                                             'bash-completion\tFedora Project\t(none)\n',
+                                             'zsh\tRed Hat, Inc.\t(none)\n',
+                                             'bash\tRed Hat, Inc.\t(none)\n']),
+                            ('rpm_rhsigned.log', ['zsh\tRed Hat, Inc.\t(none)\n',
+                                                  'bash\tRed Hat, Inc.\t(none)\n']),
+                            ('chkconfig.log', ['sshd           \t0:off\t1:off\t2:on\t3:on\n',
+                                               'httpd          \t0:off\t1:off\t2:off\t3:off\n',
+                                               'atd            \t0:off\t1:off\t2:off\t3:on\n']),
+                            ('allmyfiles.log', ['/etc/httpd/conf/httpd.conf\n',
+                                                '/etc/hosts\n',
+                                                '/etc/httpd.conf.bak\n',
+                                                '/etc/httpd/conf.d/ssl.conf\n',
+                                                '/usr/bin/bash\n']),
+                            ('rpmtrackedfiles.log', ['/usr/bin/bash\n',
+                                                     '/etc/hosts\n'])]:
+            self.logs[name] = os.path.join(self.temp_dir, name)
+            utils.write_to_file(self.logs[name], 'wb', lines)
+        self.dist_native_file = os.path.join(self.temp_dir, "dist_native")
+        utils.write_to_file(self.dist_native_file, 'wb', 'zsh\n')
+        self.patched = {'PREUPGRADE_CACHE': self.temp_dir,
+                        'VALUE_RPM_QA': self.logs['rpm_qa.log'],
+                        'VALUE_RPM_RHSIGNED': self.logs['rpm_rhsigned.log'],
+                        'VALUE_CHKCONFIG': self.logs['chkconfig.log'],
+                        'VALUE_ALLMYFILES': self.logs['allmyfiles.log'],
+                        'VALUE_RPMTRACKEDFILES': self.logs['rpmtrackedfiles.log'],
+                        'DEVEL_MODE': 0,
+                        'DIST_NATIVE': 'sign',
+                        '_dist_native': None,
+                        '_pa_configuration': None,
+                        'HOME_DIRECTORY_FILE': "",
+                        'USER_CONFIG_FILE': 0}
+        self.original = {}
+        for name, value in self.patched.items():
+            self.original[name] = getattr(self.script_api, name)
+            setattr(self.script_api, name, value)
+        self.environment = dict(os.environ)
+        os.environ['XCCDF_RESULT_FAIL'] = '1'
+        os.environ['XCCDF_RESULT_NOT_APPLICABLE'] = '4'
+        self.config_file = settings.PREUPG_CONFIG_FILE
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+        # no fact server runs, lookups use indexes or log files
+        fact_store._server = False
+        fact_store._indexes.clear()
+
+    def tearDown(self):
+        fact_store._server = None
+        fact_store._indexes.clear()
+        sys.stdout = self.stdout
+        settings.PREUPG_CONFIG_FILE = self.config_file
+        os.environ.clear()
+        os.environ.update(self.environment)
+        for name, value in self.original.items():
+            setattr(self.script_api, name, value)
+        shutil.rmtree(self.temp_dir)
+
+    def disable_indexes(self):
+        """Function makes lookups read log files"""
+        fact_store._indexes.clear()
+        for log_file in self.logs.values():
+            if os.path.exists(fact_store.get_index_path(log_file)):
+                os.unlink(fact_store.get_index_path(log_file))
+            fact_store._indexes[log_file] = None
+
+    def get_answers(self):
+        """Function returns answers of lookup functions for the fixtures"""
+        answers = []
+        for pkg in ['bash', 'bash-completion', 'zsh', 'vim', 'http']:
+            answers.append(self.script_api.is_pkg_installed(pkg))
+            answers.append(self.script_api.is_pkg_name_installed(pkg))
+            answers.append(self.script_api.is_dist_native(pkg))
+        for service in ['sshd', 'httpd', 'atd', 'at', 'cups']:
+            answers.append(self.script_api.service_is_enabled(service))
+        for file_name in ['/usr/bin/bash', '/usr/bin', '/etc/hosts', '/etc/passwd']:
+            answers.append(self.script_api.is_file_rpm_tracked(file_name))
+        for directory in ['/etc/httpd', '/etc/', '/usr', '/var']:
+            answers.append(sorted(self.script_api.files_under(directory, self.logs['allmyfiles.log'])))
+        return answers
+
+    def test_packages(self):
+        self.assertTrue(self.script_api.is_pkg_installed('bash'))
+        self.assertTrue(self.script_api.is_pkg_installed('bash-comp'))
+        self.assertFalse(self.script_api.is_pkg_installed('vim'))
+        self.assertTrue(self.script_api.is_pkg_name_installed('bash'))
+        self.assertTrue(self.script_api.is_pkg_name_installed('bash-completion'))
+        self.assertFalse(self.script_api.is_pkg_name_installed('bash-comp'))
+        self.assertFalse(self.script_api.is_pkg_name_installed('http'))
+        self.assertTrue(os.path.exists(fact_store.get_index_path(self.logs['rpm_qa.log'])))
+
+    def test_applies_to(self):
+        self.assertEqual(self.script_api.check_applies_to('bash,httpd'), None)
+        self.assertEqual(self.script_api.check_applies_to(), None)
+        try:
+            self.script_api.check_applies_to('bash,vim')
+        except SystemExit as err:
+            self.assertEqual(err.code, 4)
+        else:
+            self.fail('check_applies_to did not exit')
+        self.assertTrue('Package vim is not installed' in sys.stdout.getvalue())
+        self.assertEqual(self.script_api.check_rpm_to('bash', 'sh'), None)
+        for check_rpm, check_bin in [('bash-comp', ''), ('bash', 'preupg-missing-binary')]:
+            try:
+                self.script_api.check_rpm_to(check_rpm, check_bin)
+            except SystemExit as err:
+                self.assertEqual(err.code, 1)
+            else:
+                self.fail('check_rpm_to did not exit')
+
+    def test_services(self):
+        self.assertTrue(self.script_api.service_is_enabled('sshd'))
+        self.assertTrue(self.script_api.service_is_enabled('atd'))
+        self.assertFalse(self.script_api.service_is_enabled('httpd'))
+        self.assertFalse(self.script_api.service_is_enabled('cups'))
+        self.assertTrue(os.path.exists(fact_store.get_index_path(self.logs['chkconfig.log'])))
+        # regular expressions are matched against the log file
+        self.assertTrue(self.script_api.service_is_enabled('ss.d'))
+        self.assertFalse(self.script_api.service_is_enabled('http.*'))
+
+    def test_files(self):
+        self.assertTrue(self.script_api.is_file_rpm_tracked('/usr/bin/bash'))
+        self.assertFalse(self.script_api.is_file_rpm_tracked('/usr/bin'))
+        self.assertFalse(self.script_api.is_file_rpm_tracked('/etc/passwd'))
+        self.assertEqual(self.script_api.files_under('/etc/httpd/', self.logs['allmyfiles.log']),
+                         ['/etc/httpd/conf.d/ssl.conf', '/etc/httpd/conf/httpd.conf'])
+        self.assertEqual(self.script_api.files_under('/var', self.logs['allmyfiles.log']), [])
+
+    def test_dist_native(self):
+        classification = self.script_api.classify_dist_native()
+        self.assertEqual(classification['bash'], {'sign': True, 'all': True, 'list': False})
+        self.assertEqual(classification['bash-completion'], {'sign': False, 'all': True, 'list': False})
+        self.assertEqual(classification['zsh'], {'sign': True, 'all': True, 'list': False})
+        self.assertEqual(self.script_api.get_dist_native_list(), ['zsh', 'bash'])
+        self.script_api.DEVEL_MODE = 1
+        self.script_api.DIST_NATIVE = 'all'
+        self.assertEqual(self.script_api.get_dist_native_list(), ['httpd', 'bash-completion', 'zsh', 'bash'])
+        for pkg in classification:
+            self.assertEqual(self.script_api.is_dist_native(pkg), True)
+        self.script_api.DIST_NATIVE = self.dist_native_file
+        self.script_api._dist_native = None
+        self.assertEqual(self.script_api.get_dist_native_list(), ['zsh'])
+        for pkg in classification:
+            self.assertEqual(self.script_api.is_dist_native(pkg), pkg == 'zsh')
+
+    def test_dist_native_cache(self):
+        cache_file = os.path.join(self.temp_dir, settings.dist_native_name)
+        self.script_api.classify_dist_native()
+        cached = json.loads(utils.get_file_content(cache_file, 'rb'))
+        # classification of the next check is read from the cache
+        cached['packages']['bash']['sign'] = False
+        utils.write_to_file(cache_file, 'wb', json.dumps(cached))
+        self.script_api._dist_native = None
+        self.assertFalse(self.script_api.classify_dist_native()['bash']['sign'])
+        # cache is not used once rpm_qa.log changes
+        utils.write_to_file(self.logs['rpm_qa.log'], 'a+b', 'vim\tRed Hat, Inc.\t(none)\n')
+        self.script_api._dist_native = None
+        classification = self.script_api.classify_dist_native()
+        self.assertTrue(classification['bash']['sign'])
+        self.assertFalse(classification['vim']['sign'])
+
+    def test_index_and_log_answers(self):
+        answers = self.get_answers()
+        for log_file in self.logs.values():
+            self.assertTrue(fact_store.get_index(log_file) is not None)
+        self.disable_indexes()
+        self.assertEqual(self.get_answers(), answers)
+        for log_file in self.logs.values():
+            self.assertFalse(os.path.exists(fact_store.get_index_path(log_file)))
+
+    def test_lazy_import(self):
+        environment = dict(os.environ)
+        environment.update(get_check_environment())
+        environment['PYTHONPATH'] = os.getcwd()
+        # configuration file does not exist, it is not read on import
+        code = 'import sys; from preup.script_api import *; ' \
+               'print(sorted(set(["ConfigParser", "preup.settings", "preup.utils"]) & set(sys.modules)))'
+        proc = subprocess.Popen([sys.executable, '-c', code], env=environment,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = proc.communicate()
+        self.assertEqual(proc.returncode, 0, stderr)
+        self.assertEqual(stdout.strip(), b'[]')
+
+    def test_pa_configuration(self):
+        config_file = os.path.join(self.temp_dir, 'preupgrade-assistant.conf')
+        utils.write_to_file(config_file, 'wb', '[preupgrade-assistant]\nhome_directory_file=.dirs\n'
+                                               'user_config_file=enabled\n[home-dirs]\nDocuments\n')
+        settings.PREUPG_CONFIG_FILE = config_file
+        self.assertEqual(self.script_api.HOME_DIRECTORY_FILE, "")
+        self.assertEqual(self.script_api.get_pa_configuration(),
+                         {'home_directory_file': '.dirs', 'user_config_file': 'enabled'})
+        self.assertEqual(self.script_api.HOME_DIRECTORY_FILE, '.dirs')
+        self.assertEqual(self.script_api.print_home_dirs(), ['documents'])
+        # the file is read only once
+        os.unlink(config_file)
+        self.assertEqual(self.script_api.get_pa_configuration()['user_config_file'], 'enabled')
+
+
+class TestStreamingResult(base.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.result = os.path.join(self.temp_dir, "result.xml")
+        rule_result = '<rule-result idref="%s" time="t"><result>%s</result><check system="sce">' \
+                      '<check-import import-name="stdout">%s</check-import></check></rule-result>'
+        utils.write_to_file(self.result, 'wb', [
+            '<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2">',
+            '<Group id="group"><Rule id="rule_a" /><Rule id="rule_b" /></Group>',
+            '<TestResult id="test" start-time="s" end-time="e">',
+            rule_result % ('rule_a', 'fail', 'INPLACERISK: HIGH: Something\nINFO rule_a'),
+            rule_result % ('rule_b', 'pass', 'INPLACERISK: SLIGHT: Nothing'),
+            '</TestResult></Benchmark>'])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_iter_rule_results(self):
+        rules = []
+        for test_result, rule in xccdf.iter_rule_results(self.result):
+            self.assertEqual(test_result.get('id'), 'test')
+            rules.append(rule)
+            self.assertEqual(len(xccdf.get_check_import_inplace_risk(rule)), 1)
+        # processed rule-results are cleared and removed from TestResult
+        self.assertEqual(len(list(test_result)), 0)
+        self.assertEqual([rule.get('idref') for rule in rules], [None, None])
+        self.assertEqual([len(rule) for rule in rules], [0, 0])
+
+    def test_check_inplace_risk(self):
+        self.assertEqual(xccdf.check_inplace_risk(self.result, 0), 1)
+        utils.write_to_file(self.result, 'wb', '')
+        self.assertEqual(xccdf.check_inplace_risk(self.result, 0), -1)
+        self.assertEqual(xccdf.check_inplace_risk(os.path.join(self.temp_dir, "missing.xml"), 0), -1)
+
+    def test_risks_file(self):
+        rp = ReportParser(self.result)
+        self.assertEqual(rp.get_risks(), [['rule_a', [['HIGH', 'Something']]],
+                                          ['rule_b', [['SLIGHT', 'Nothing']]]])
+        rp.write_risks()
+        risks_path = os.path.join(self.temp_dir, settings.risks_name)
+        self.assertEqual(xccdf.get_risks_path(self.result), risks_path)
+        self.assertEqual(xccdf.load_risks(self.result), rp.get_risks())
+        # risk check reads risks file instead of XML if there is no summary
+        os.remove(xccdf.get_risk_summary_path(self.result))
+        xccdf.write_risks(self.result, [['rule_a', [['EXTREME', 'Something']]]])
+        self.assertEqual(xccdf.check_inplace_risk(self.result, 0), 2)
+        # outdated risks file is not used
+        os.utime(risks_path, (0, 0))
+        self.assertEqual(xccdf.load_risks(self.result), None)
+        self.assertEqual(xccdf.check_inplace_risk(self.result, 0), 1)
+
+    def test_formatted_risks(self):
+        utils.write_to_file(self.result, 'wb', utils.get_file_content(self.result, 'rb').replace(
+            'Something', 'See [link:risk.txt]'))
+        rp = ReportParser(self.result)
+        # XmlManager.update_html formats tags in XML file
+        lines = [xml_manager.tag_formating([x], 'xml')[0]
+                 for x in utils.get_file_content(self.result, 'rb', method=True)]
+        utils.write_to_file(self.result, 'wb', lines)
+        rp.write_risks()
+        message = 'See %s' % os.path.join('/root', settings.prefix, 'risk.txt')
+        self.assertEqual(xccdf.load_risks(self.result), [['rule_a', [['HIGH', message]]],
+                                                         ['rule_b', [['SLIGHT', 'Nothing']]]])
+        self.assertEqual(xccdf.load_risks(self.result), ReportParser(self.result).get_risks())
+
+    def test_risk_summary(self):
+        ReportParser(self.result).write_risks()
+        summary_path = os.path.join(self.temp_dir, settings.risk_summary_name)
+        lines = utils.get_file_content(summary_path, 'rb', method=True)
+        self.assertEqual([x.split('=')[0] for x in lines], xccdf.RISK_SUMMARY_KEYS)
+        self.assertEqual(lines[:6], ['risk=3\n', 'none=0\n', 'slight=1\n',
+                                     'medium=0\n', 'high=1\n', 'extreme=0\n'])
+        self.assertEqual(xccdf.read_risk_summary(self.result), 3)
+        os.remove(xccdf.get_risks_path(self.result))
+        self.assertEqual(xccdf.check_inplace_risk(self.result, 0), 1)
+        # touched but unchanged file
+        os.utime(self.result, (0, 0))
+        self.assertEqual(xccdf.read_risk_summary(self.result), 3)
+        # changed file
+        utils.write_to_file(self.result, 'wb', utils.get_file_content(self.result, 'rb').replace('HIGH', 'NONE'))
+        self.assertEqual(xccdf.read_risk_summary(self.result), None)
+        self.assertEqual(xccdf.check_inplace_risk(self.result, 0), 0)
+
+
 class TestCLI(base.TestCase):
     def test_opts(self):
         """ basic test of several options """
@@ -261,6 +1358,60 @@ class TestSolutionReplacement(base.TestCase):
         line = xml_manager.tag_formating(solution_text, self.extension)
         self.assertEqual(expected_text, line)
 
+    def test_update_html(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for dir_name, text in [('first', 'First & [bold: one]\n'), ('second', 'Second\n')]:
+                os.makedirs(os.path.join(temp_dir, 'RHEL6_7', 'group', dir_name))
+                utils.write_to_file(os.path.join(temp_dir, 'RHEL6_7', 'group', dir_name, 'solution.txt'), 'wb', text)
+            report = os.path.join(temp_dir, 'result.html')
+            utils.write_to_file(report, 'wb', ['<div>_group_first_SOLUTION_MSG_TEXT</div>\n',
+                                               '<div>INPLACERISK: HIGH: [link: file]</div>\n',
+                                               '<div>_prefix_group_second_SOLUTION_MSG_TEXT</div>\n',
+                                               '<div>_group_third_SOLUTION_MSG_TEXT</div>\n'])
+            xml_mgr = xml_manager.XmlManager(temp_dir, 'RHEL6_7', 'result.xml', 'result')
+            xml_mgr.xml_solution_files = {'group_first_check': 'solution.txt',
+                                          'group_second_check': 'solution.txt'}
+            solution_files = {}
+            for dir_name in ['first', 'second']:
+                solution_files[os.path.join(temp_dir, 'RHEL6_7', 'group', dir_name)] = ['solution.txt']
+            xml_mgr.update_html('result', solution_files)
+            self.assertEqual(utils.get_file_content(report, 'rb', method=True),
+                             ['<div>First &amp; <b> one</b><br/>\n', '</div>\n',
+                              '<div>INPLACERISK: HIGH: /root/%s/file</div>\n' % settings.prefix,
+                              '<div>_prefixSecond<br/>\n', '</div>\n',
+                              '<div>_group_third_SOLUTION_MSG_TEXT</div>\n'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_clean_html(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            report = os.path.join(temp_dir, 'result.html')
+            utils.write_to_file(report, 'wb',
+                                ['<title>XCCDF test result</title>\n',
+                                 '    <div id="intro">\n',
+                                 '      <h2>Introduction</h2>\n',
+                                 '      <table><tr><td>test result</td></tr>\n',
+                                 '      </table>\n',
+                                 '    </div>\n',
+                                 '  </div>\n',
+                                 '<div>description\n',
+                                 '<br /><br /><strong class="bold">Details:</strong><br />\n',
+                                 'details\n',
+                                 '  <div class="xccdf-fixtext">fix</div>\n',
+                                 '</div>\n'])
+            xml_manager.clean_html(report, remove_details=True)
+            content = ['<title>Preupgrade Assistant</title>\n',
+                       '    <div id="intro">\n']
+            content.extend(xml_manager.add_preupg_scanner_info().splitlines(True))
+            content.extend(['<div>description\n',
+                            '  <div class="xccdf-fixtext">fix</div>\n',
+                            '</div>\n'])
+            self.assertEqual(utils.get_file_content(report, 'rb', method=True), content)
+        finally:
+            shutil.rmtree(temp_dir)
+
 
 class TestScenario(base.TestCase):
     def setUp(self):
@@ -369,6 +1520,18 @@ def suite():
     loader = unittest.TestLoader()
     suite = unittest.TestSuite()
     suite.addTest(loader.loadTestsFromTestCase(TestPreupg))
+    suite.addTest(loader.loadTestsFromTestCase(TestHTMLGeneration))
+    suite.addTest(loader.loadTestsFromTestCase(TestScanProgress))
+    suite.addTest(loader.loadTestsFromTestCase(TestShardedScan))
+    suite.addTest(loader.loadTestsFromTestCase(TestRuleCache))
+    suite.addTest(loader.loadTestsFromTestCase(TestCheckProfiler))
+    suite.addTest(loader.loadTestsFromTestCase(TestRunSubprocess))
+    suite.addTest(loader.loadTestsFromTestCase(TestCommonLogs))
+    suite.addTest(loader.loadTestsFromTestCase(TestRpmVerify))
+    suite.addTest(loader.loadTestsFromTestCase(TestFactStore))
+    suite.addTest(loader.loadTestsFromTestCase(TestFactServer))
+    suite.addTest(loader.loadTestsFromTestCase(TestScriptAPI))
+    suite.addTest(loader.loadTestsFromTestCase(TestStreamingResult))
     suite.addTest(loader.loadTestsFromTestCase(TestCLI))
     suite.addTest(loader.loadTestsFromTestCase(TestHashes))
     suite.addTest(loader.loadTestsFromTestCase(TestSolutionReplacement))
@@ -361,6 +361,16 @@ A solution text for test suite"
         check_rpm_to = filter(lambda x: 'check_rpm_to "bash" "sed"' in x, lines)
         self.assertTrue(check_rpm_to)
 
+    def test_values_common_logs(self):
+        self.rule = self.xml_utils.prepare_sections()
+        common_logs = filter(lambda x: '<value>all</value>' in x, self.rule)
+        self.assertTrue(common_logs)
+        self.loaded_ini[self.filename][0]['common_logs'] = "rpm_qa, chkconfig.log"
+        self.xml_utils = XmlUtils(self.dirname, self.loaded_ini)
+        self.rule = self.xml_utils.prepare_sections()
+        common_logs = filter(lambda x: '<value>rpm_qa.log,chkconfig.log</value>' in x, self.rule)
+        self.assertTrue(common_logs)
+
 
 class TestIncorrectINI(base.TestCase):
 